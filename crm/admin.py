@@ -10,7 +10,8 @@ from .models import (
     UserProfile, Organization, Ticket, TicketComment,
     TicketAttachment, ActivityLog, GroupSettings, 
     ViewPermission, GroupViewPermission, UserViewPermission,
-    WorkHours, TicketStatistics, AgentWorkLog, TicketCalendarAssignment, CalendarDuty, TrustedDevice
+    WorkHours, Holiday, TicketStatistics, AgentWorkLog, TicketCalendarAssignment, CalendarDuty, TrustedDevice,
+    ReportJob, OutboundEmail, EmailNotificationSettings
 )
 
 
@@ -528,6 +529,13 @@ class WorkHoursAdmin(admin.ModelAdmin):
     list_filter = ('day_of_week', 'is_working_day')
 
 
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'name')
+    search_fields = ('name',)
+    date_hierarchy = 'date'
+
+
 @admin.register(TicketStatistics)
 class TicketStatisticsAdmin(admin.ModelAdmin):
     list_display = ('period_type', 'period_start', 'period_end', 'organization', 'agent', 
@@ -551,6 +559,31 @@ class AgentWorkLogAdmin(admin.ModelAdmin):
         return super().has_delete_permission(request, obj)
 
 
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'report_type', 'user', 'status', 'filename', 'created_at', 'finished_at', 'expires_at')
+    list_filter = ('report_type', 'status')
+    search_fields = ('user__username', 'filename')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('params_key', 'artifact', 'started_at', 'finished_at')
+
+
+@admin.register(EmailNotificationSettings)
+class EmailNotificationSettingsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'notification_window', 'daily_digest', 'updated_at')
+    list_filter = ('daily_digest',)
+    search_fields = ('user__username', 'user__email')
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'notification_type', 'to_email', 'ticket', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'notification_type', 'domain')
+    search_fields = ('to_email', 'recipient__username')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('claimed_at', 'claimed_by', 'last_error', 'sent_at')
+
+
 @admin.register(TrustedDevice)
 class TrustedDeviceAdmin(admin.ModelAdmin):
     """Admin panel for viewing and managing trusted devices"""
@@ -3,7 +3,10 @@ from django.contrib import messages
 from functools import wraps
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
 from datetime import timedelta
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -122,4 +125,57 @@ def sensitive_view(view_func):
         # User has 2FA disabled or has already verified recently
         return view_func(request, *args, **kwargs)
     
-    return _wrapped_view
\ No newline at end of file
+    return _wrapped_view
+
+def conditional_get(version_func):
+    """
+    Answer repeated GET requests with 304 Not Modified while a view's data is unchanged
+
+    version_func(request, *args, **kwargs) returns a cheap version stamp of the data the
+    view would serve - a (last_modified, fingerprint) tuple, e.g. (max updated_at,
+    row count) of the visible rows - or None to skip conditional handling (invalid
+    parameters, no permission). The ETag combines the stamp with the user and the full
+    path, so every user and filter combination is versioned separately. On a match the
+    view is not called at all.
+
+    Place it below the authentication and permission decorators.
+    """
+    def stamp(request, *args, **kwargs):
+        # Django's condition() asks for the ETag and Last-Modified separately
+        if not hasattr(request, '_version_stamp'):
+            try:
+                request._version_stamp = version_func(request, *args, **kwargs)
+            except Exception as e:
+                # Let the view produce its own error response
+                logger.warning(f"Version stamp for {request.path} failed: {e}")
+                request._version_stamp = None
+        return request._version_stamp
+
+    def etag_func(request, *args, **kwargs):
+        version = stamp(request, *args, **kwargs)
+        if version is None:
+            return None
+        last_modified, fingerprint = version
+        key = f"{request.user.pk}|{request.get_full_path()}|{last_modified}|{fingerprint}"
+        return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        version = stamp(request, *args, **kwargs)
+        return version[0] if version else None
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view_func)
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                # Errors must not be revalidated into a 304
+                response.headers.pop('ETag', None)
+                response.headers.pop('Last-Modified', None)
+            # Per-user data: browsers revalidate every time, shared caches keep out
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return _wrapped_view
+    return decorator
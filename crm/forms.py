@@ -663,10 +663,11 @@ class TicketCalendarAssignmentForm(forms.ModelForm):
         assigned_date = self.cleaned_data.get('assigned_date')
         
         if assigned_date:
-            # Check if it's a weekend (Saturday=5, Sunday=6)
-            if assigned_date.weekday() >= 5:
+            # Weekends and holidays are not business days
+            from .services.business_calendar import get_business_calendar
+            if not get_business_calendar().is_business_day(assigned_date):
                 raise ValidationError(
-                    "Nie można przypisać zgłoszenia na weekend. Wybierz dzień roboczy (poniedziałek-piątek)."
+                    "Nie można przypisać zgłoszenia na weekend ani dzień wolny od pracy. Wybierz dzień roboczy."
                 )
             
             # Check if date is not in the past
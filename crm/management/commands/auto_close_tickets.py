@@ -1,31 +1,38 @@
 """
 Management command to automatically close resolved tickets after 3 business days
 Run this command daily via cron to auto-close tickets that have been resolved for 3+ business days
+Business days follow the WorkHours schedule and skip public holidays and Holiday rows
+
+Tickets are closed in chunks: one UPDATE per chunk (guarded by status='resolved' and the
+cutoff, so tickets reopened meanwhile are left alone), one bulk insert of ActivityLog rows
+and one batch of 'closed' notifications queued in the email outbox.
 """
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta, datetime
 from crm.models import Ticket, ActivityLog
+from crm.services.business_calendar import get_business_calendar
+from crm.services.email.outbox import enqueue_ticket_notifications_bulk
+from crm.services.email.stakeholders import resolve_stakeholders_bulk
+from crm.services.ticket_feed import hub, ticket_event
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Tickets closed per UPDATE / transaction
+CHUNK_SIZE = 500
+
 
 def calculate_business_days_ago(num_days):
     """
-    Calculate the datetime that was num_days business days ago (excluding weekends)
+    Calculate the datetime that was num_days business days ago (excluding weekends and holidays)
     """
-    current_date = timezone.now()
-    business_days_counted = 0
-    
-    while business_days_counted < num_days:
-        current_date -= timedelta(days=1)
-        # Check if it's a weekday (Monday=0, Sunday=6)
-        if current_date.weekday() < 5:  # Monday to Friday
-            business_days_counted += 1
-    
-    return current_date
+    now = timezone.now()
+    today = timezone.localdate(now)
+    target = get_business_calendar().add_business_days(today, -num_days)
+    return now - timedelta(days=(today - target).days)
 
 
 class Command(BaseCommand):
@@ -49,6 +56,17 @@ class Command(BaseCommand):
             default=None,
             help='Number of hours after which resolved tickets should be auto-closed (overrides --business-days)',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Tickets closed per database transaction (default: {CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--no-notifications',
+            action='store_true',
+            help='Do not queue "closed" email notifications',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -77,8 +95,9 @@ class Command(BaseCommand):
             status='resolved',
             resolved_at__lte=cutoff_time
         )
+        ticket_ids = list(tickets_to_close.values_list('id', flat=True))
         
-        count = tickets_to_close.count()
+        count = len(ticket_ids)
         
         if count == 0:
             self.stdout.write(self.style.SUCCESS('✅ No tickets need to be auto-closed'))
@@ -88,41 +107,26 @@ class Command(BaseCommand):
         
         closed_count = 0
         error_count = 0
+        chunk_size = options['chunk_size']
         
-        for ticket in tickets_to_close:
-            age_hours = (timezone.now() - ticket.resolved_at).total_seconds() / 3600
-            age_days = age_hours / 24
+        for start in range(0, count, chunk_size):
+            chunk_ids = ticket_ids[start:start + chunk_size]
+            loaded = Ticket.objects.select_related('assigned_to').in_bulk(chunk_ids)
+            chunk = [loaded[ticket_id] for ticket_id in chunk_ids if ticket_id in loaded]
             
-            self.stdout.write(
-                f'  • Ticket #{ticket.id}: "{ticket.title}" '
-                f'(resolved {age_days:.1f} days ago by {ticket.assigned_to or "unassigned"})'
-            )
+            for ticket in chunk:
+                age_hours = (timezone.now() - ticket.resolved_at).total_seconds() / 3600
+                age_days = age_hours / 24
+                
+                self.stdout.write(
+                    f'  • Ticket #{ticket.id}: "{ticket.title}" '
+                    f'(resolved {age_days:.1f} days ago by {ticket.assigned_to or "unassigned"})'
+                )
             
-            if not dry_run:
-                try:
-                    # Update ticket status
-                    old_status = ticket.status
-                    ticket.status = 'closed'
-                    ticket.closed_at = timezone.now()
-                    ticket.save()
-                    
-                    # Log the activity
-                    ActivityLog.objects.create(
-                        user=None,  # System action
-                        action_type='ticket_closed',
-                        description=f"Automatycznie zamknięto zgłoszenie '{ticket.title}' "
-                                  f"(brak potwierdzenia od klienta przez {time_description})",
-                        ticket=ticket,
-                        ip_address=None
-                    )
-                    
-                    closed_count += 1
-                    self.stdout.write(self.style.SUCCESS(f'    ✅ Closed'))
-                    
-                except Exception as e:
-                    error_count += 1
-                    self.stdout.write(self.style.ERROR(f'    ❌ Error: {str(e)}'))
-                    logger.error(f'Error auto-closing ticket #{ticket.id}: {str(e)}')
+            if not dry_run and chunk:
+                closed, failed = self._close_chunk(chunk, cutoff_time, time_description, options)
+                closed_count += closed
+                error_count += failed
         
         self.stdout.write(f'\n{"=" * 70}')
         
@@ -134,3 +138,69 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f'❌ Errors: {error_count}'))
         
         self.stdout.write(f'{"=" * 70}\n')
+
+    def _close_chunk(self, tickets, cutoff_time, time_description, options):
+        """
+        Close a chunk of listed tickets in one transaction
+        
+        Returns:
+            tuple: (closed, errors) - tickets changed meanwhile (e.g. reopened) are neither
+        """
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                closable = Ticket.objects.filter(
+                    id__in=[ticket.id for ticket in tickets],
+                    status='resolved',
+                    resolved_at__lte=cutoff_time
+                )
+                closed_ids = set(closable.select_for_update().values_list('id', flat=True))
+                if not closed_ids:
+                    return 0, 0
+                
+                Ticket.objects.filter(id__in=closed_ids).update(
+                    status='closed',
+                    closed_at=now,
+                    # Ticket boards and statistics rollups look for changes by updated_at
+                    updated_at=now
+                )
+                
+                closed = []
+                for ticket in tickets:
+                    if ticket.id in closed_ids:
+                        ticket.status = 'closed'
+                        ticket.closed_at = ticket.updated_at = now
+                        closed.append(ticket)
+                
+                # Log the activity
+                ActivityLog.objects.bulk_create([
+                    ActivityLog(
+                        user=None,  # System action
+                        action_type='ticket_closed',
+                        description=f"Automatycznie zamknięto zgłoszenie '{ticket.title}' "
+                                  f"(brak potwierdzenia od klienta przez {time_description})",
+                        ticket=ticket,
+                        ip_address=None
+                    )
+                    for ticket in closed
+                ])
+                
+                if not options['no_notifications']:
+                    recipients, preferences = resolve_stakeholders_bulk('closed', closed)
+                    enqueue_ticket_notifications_bulk(
+                        'closed',
+                        [(ticket, recipients[ticket.id]) for ticket in closed],
+                        recipient_settings=preferences,
+                        old_status='resolved'
+                    )
+                
+                # The UPDATE skips Ticket.save signals - tell live boards directly
+                events = [ticket_event(ticket, 'status') for ticket in closed]
+                transaction.on_commit(lambda: [hub.publish(event) for event in events])
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'    ❌ Error closing {len(tickets)} ticket(s): {str(e)}'))
+            logger.error(f'Error auto-closing tickets #{tickets[0].id}-#{tickets[-1].id}: {str(e)}')
+            return 0, len(tickets)
+        
+        self.stdout.write(self.style.SUCCESS(f'    ✅ Closed {len(closed_ids)} ticket(s)'))
+        return len(closed_ids), 0
@@ -0,0 +1,85 @@
+"""
+Management command to measure the rendering cost of ticket notification emails
+Compares rendering the templates for every recipient with one shared rendering per event
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from crm.models import Ticket
+from crm.services.email.ticket import render_ticket_notification
+import time
+
+
+class Command(BaseCommand):
+    help = 'Measures per-message render cost of a ticket notification sent to many recipients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipients',
+            type=int,
+            default=50,
+            help='Number of recipients of the event (default: 50)',
+        )
+        parser.add_argument(
+            '--type',
+            default='created',
+            help='Notification type (default: created)',
+        )
+        parser.add_argument(
+            '--ticket',
+            type=int,
+            help='Ticket id (default: the newest ticket)',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=5,
+            help='Repetitions; the best round is reported (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        tickets = Ticket.objects.select_related('organization', 'created_by', 'assigned_to')
+        ticket = tickets.filter(id=options['ticket']).first() if options['ticket'] else tickets.order_by('-id').first()
+        if ticket is None:
+            raise CommandError('No ticket to render the notification for')
+
+        notification_type = options['type']
+        # Unsaved users - nothing is written to the database and no email is sent
+        recipients = [
+            User(id=1_000_000 + i, username=f'benchmark{i}', first_name=f'Odbiorca {i}', email=f'benchmark{i}@example.com')
+            for i in range(options['recipients'])
+        ]
+
+        # Only rendering is timed; the preference checks of build_ticket_notification are left out
+        def per_recipient():
+            return [render_ticket_notification(notification_type, ticket).for_recipient(user) for user in recipients]
+
+        def shared():
+            body = render_ticket_notification(notification_type, ticket)
+            return [body.for_recipient(user) for user in recipients]
+
+        # Warm the template cache so both variants use compiled templates
+        expected = per_recipient()
+        if [(m.body, m.alternatives) for m in expected] != [(m.body, m.alternatives) for m in shared()]:
+            self.stdout.write(self.style.ERROR('❌ Shared rendering differs from per-recipient rendering'))
+            return
+
+        self.stdout.write(
+            f'Ticket #{ticket.id}, notification "{notification_type}", {len(recipients)} recipients, '
+            f'best of {options["rounds"]} rounds'
+        )
+        results = {}
+        for name, func in (('Per recipient', per_recipient), ('Shared body', shared)):
+            best = None
+            for _ in range(options['rounds']):
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = best
+            per_message = best / len(recipients) * 1000 if recipients else 0
+            self.stdout.write(f'  {name:<14} {best * 1000:8.2f} ms total, {per_message:6.3f} ms/message')
+
+        if results['Shared body']:
+            speedup = results['Per recipient'] / results['Shared body']
+            self.stdout.write(self.style.SUCCESS(f'✅ Shared rendering is {speedup:.1f}x faster'))
@@ -0,0 +1,119 @@
+"""
+Management command to check which indexes the hot ticket and activity log queries use
+Runs EXPLAIN for the queries behind the ticket list, dashboards, statistics and auto-close
+"""
+
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from crm.models import Ticket, ActivityLog, Organization
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the hot ticket/activity log queries and reports the index each one uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plan',
+            action='store_true',
+            help='Print the full query plan of every query',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Database backend: {connection.vendor}')
+        self.stdout.write('')
+        
+        full_scans = 0
+        for name, queryset in self._hot_queries():
+            try:
+                plan, indexes, full_scan = self._explain(queryset)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'❌ {name}: EXPLAIN failed - {e}'))
+                continue
+            
+            if full_scan:
+                full_scans += 1
+                self.stdout.write(self.style.WARNING(f'⚠️  {name}: full table scan'))
+            elif indexes:
+                self.stdout.write(self.style.SUCCESS(f'✅ {name}: {", ".join(indexes)}'))
+            else:
+                self.stdout.write(f'ℹ️  {name}: no index reported')
+            
+            if options['verbose_plan']:
+                self.stdout.write(plan)
+                self.stdout.write('')
+        
+        self.stdout.write('')
+        if full_scans:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  {full_scans} query(ies) scan a whole table - check that migrations with the indexes are applied'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ All hot queries use an index'))
+
+    def _hot_queries(self):
+        """(name, queryset) pairs mirroring the queries of the busiest code paths"""
+        now = timezone.now()
+        org_ids = list(Organization.objects.values_list('id', flat=True)[:3]) or [1]
+        user_id = User.objects.values_list('id', flat=True).first() or 1
+        month_start = now - timedelta(days=30)
+        
+        return [
+            ('ticket_list (admin, default)',
+             Ticket.objects.exclude(status='closed').order_by('-created_at', '-id')[:21]),
+            ('ticket_list (agent organizations)',
+             Ticket.objects.filter(organization_id__in=org_ids).exclude(status='closed').order_by('-created_at', '-id')[:21]),
+            ('dashboard: status counts',
+             Ticket.objects.filter(status='in_progress').order_by()),
+            ('dashboard: my tickets',
+             Ticket.objects.filter(assigned_to_id=user_id).exclude(status='closed').order_by('-updated_at')[:5]),
+            ('dashboard: organization tickets',
+             Ticket.objects.filter(organization_id__in=org_ids, status='new').order_by()),
+            ('statistics: date range summary',
+             Ticket.objects.filter(created_at__gte=month_start, created_at__lt=now).values('status').annotate(count=Count('id')).order_by()),
+            ('statistics: rollup refresh',
+             Ticket.objects.filter(updated_at__gt=now - timedelta(minutes=20)).values('created_at').order_by()),
+            ('auto-close: resolved before cutoff',
+             Ticket.objects.filter(status='resolved', resolved_at__lte=now - timedelta(days=3)).order_by()),
+            ('activity logs: latest',
+             ActivityLog.objects.order_by('-created_at')[:1000]),
+            ('activity logs: by action',
+             ActivityLog.objects.filter(action_type='login').order_by('-created_at')[:1000]),
+            ('activity logs: by user',
+             ActivityLog.objects.filter(user_id=user_id).order_by('-created_at')[:10]),
+        ]
+
+    def _explain(self, queryset):
+        """Return (plan text, used indexes, full scan flag) for a queryset"""
+        if connection.vendor == 'mysql':
+            plan = queryset.explain(format='json')
+            data = json.loads(plan)
+            indexes = sorted(set(_json_values(data, 'key')))
+            full_scan = 'ALL' in _json_values(data, 'access_type')
+        else:
+            plan = queryset.explain()
+            indexes = sorted(set(re.findall(r'USING (?:COVERING )?INDEX (\w+)', plan)))
+            # "SCAN <table>" without an index means every row is read
+            full_scan = bool(re.search(r'\bSCAN \w+(?! USING)\s*$', plan, re.MULTILINE))
+        return plan, indexes, full_scan
+
+
+def _json_values(data, key):
+    """All values stored under key anywhere in a nested JSON document"""
+    if isinstance(data, dict):
+        for k, v in data.items():
+            if k == key and isinstance(v, str):
+                yield v
+            else:
+                yield from _json_values(v, key)
+    elif isinstance(data, list):
+        for item in data:
+            yield from _json_values(item, key)
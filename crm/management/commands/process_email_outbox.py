@@ -0,0 +1,82 @@
+"""
+Management command to send queued notification emails from the outbox
+Runs from the scheduler every minute; with --loop it works as a standalone worker process
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from crm.services.email.outbox import process_outbox, outbox_stats, cleanup_outbox
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Sends due messages from the email outbox (with retries and per-domain rate limits)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help=f'Messages claimed at a time (default: {settings.EMAIL_OUTBOX_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll the outbox every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=10,
+            help='Seconds between polls with --loop (default: 10)'
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Only show the queue depth'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._print_stats()
+            return
+
+        if not options['loop']:
+            self._process(options['batch_size'])
+            deleted = cleanup_outbox()
+            if deleted:
+                self.stdout.write(f'🗑️  Deleted {deleted} old sent message(s)')
+            self._print_stats()
+            return
+
+        self.stdout.write(f'Email outbox worker started (polling every {options["interval"]}s)...')
+        try:
+            while True:
+                self._process(options['batch_size'], quiet=True)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('✅ Email outbox worker stopped'))
+
+    def _process(self, batch_size, quiet=False):
+        totals = process_outbox(batch_size)
+        if quiet and not any(totals.values()):
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Outbox processed: {totals['sent']} sent, {totals['skipped']} skipped (notifications disabled)"
+        ))
+        if totals['retried']:
+            self.stdout.write(self.style.WARNING(f"⚠️  {totals['retried']} message(s) failed and will be retried"))
+        if totals['failed']:
+            self.stdout.write(self.style.ERROR(f"❌ {totals['failed']} message(s) failed after the last attempt"))
+
+    def _print_stats(self):
+        stats = outbox_stats()
+        self.stdout.write(
+            f"📬 Queue: {stats['queued']} queued ({stats['due']} due), {stats['sending']} sending, "
+            f"{stats['sent']} sent, {stats['failed']} failed"
+        )
+        if stats['oldest_queued']:
+            self.stdout.write(f"   Oldest queued message: {stats['oldest_queued']:%Y-%m-%d %H:%M:%S}")
@@ -0,0 +1,25 @@
+"""
+Management command to maintain background report jobs
+Runs from the scheduler - recovers jobs lost by a restarted process and removes expired report files
+"""
+
+from django.core.management.base import BaseCommand
+from crm.services.reports import recover_report_jobs, cleanup_report_jobs
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Runs report jobs left in the queue, fails interrupted jobs and deletes expired report files'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Processing report jobs...')
+        
+        failed, run = recover_report_jobs()
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠️  Marked {failed} interrupted job(s) as failed'))
+        
+        deleted = cleanup_report_jobs()
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Report jobs processed: {run} run from queue, {deleted} expired job(s) deleted'))
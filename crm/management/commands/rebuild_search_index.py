@@ -0,0 +1,36 @@
+"""
+Management command to (re)build the ticket full-text search index
+Run once after deployment and whenever the index is suspected to be out of sync
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from crm.services.search import get_backend, rebuild_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recreates the full-text search index of ticket titles, descriptions and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Tickets indexed per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not backend:
+            raise CommandError('Full-text search is not available for this database (TICKET_SEARCH_BACKEND)')
+        
+        self.stdout.write(f'Rebuilding search index ({backend.vendor})...')
+        try:
+            indexed = rebuild_index(chunk_size=options['chunk_size'])
+        except Exception as e:
+            logger.error(f"Search index rebuild failed: {e}")
+            raise CommandError(f'Search index rebuild failed: {e}')
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed {indexed} ticket(s)'))
@@ -0,0 +1,222 @@
+"""
+Management command to find (and optionally fix) mis-categorized tickets
+Runs the category suggestion over all tickets in a process pool and reports the tickets
+whose suggested category differs from the current one
+"""
+
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from crm.models import Ticket, ActivityLog
+from crm.utils.category_suggestion import should_suggest_category
+import csv
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger(__name__)
+
+REPORT_COLUMNS = ['ticket_id', 'title', 'category', 'suggested_category', 'confidence', 'keywords', 'applied']
+
+
+def classify_chunk(rows, threshold):
+    """
+    Suggest categories for a chunk of tickets (runs in a worker process, no database access)
+
+    Args:
+        rows: (id, title, description, category) tuples
+        threshold: Minimum confidence of a suggestion
+
+    Returns:
+        list: (id, title, category, suggested_category, confidence, keywords) of the tickets
+              with a different suggested category
+    """
+    suggestions = []
+    for ticket_id, title, description, category in rows:
+        should_suggest, suggested, confidence, match_details = should_suggest_category(
+            category, title, description or '', confidence_threshold=threshold
+        )
+        if should_suggest:
+            keywords = ', '.join(word for word, _ in match_details[suggested])
+            suggestions.append((ticket_id, title, category, suggested, confidence, keywords))
+    return suggestions
+
+
+class Command(BaseCommand):
+    help = 'Reports tickets whose suggested category differs from the current one (--apply changes them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='CSV file for the report of suggested re-categorizations',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.5,
+            help='Minimum confidence of a reported suggestion (default: 0.5)',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Change the category of tickets with a suggestion of at least --apply-threshold confidence',
+        )
+        parser.add_argument(
+            '--apply-threshold',
+            type=float,
+            default=0.9,
+            help='Minimum confidence for --apply (default: 0.9)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Tickets read and classified at a time (default: 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes; 1 classifies in this process (default: number of CPUs)',
+        )
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        apply_threshold = options['apply_threshold']
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+        if options['apply'] and apply_threshold < threshold:
+            raise CommandError('--apply-threshold cannot be lower than --threshold')
+
+        self.stdout.write(self.style.WARNING(f'\n{"=" * 70}'))
+        self.stdout.write(self.style.WARNING('TICKET CATEGORY REVIEW'))
+        self.stdout.write(self.style.WARNING(f'{"=" * 70}\n'))
+        if not options['apply']:
+            self.stdout.write(self.style.NOTICE('🔍 REPORT ONLY - No changes will be made (use --apply)\n'))
+
+        report_file = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else None
+        writer = csv.writer(report_file) if report_file else None
+        if writer:
+            writer.writerow(REPORT_COLUMNS)
+
+        checked = 0
+        changes = Counter()
+        applied = 0
+        try:
+            for rows, suggestions in self._classified_chunks(options):
+                checked += len(rows)
+                to_apply = [s for s in suggestions if s[4] >= apply_threshold] if options['apply'] else []
+                applied_ids = self._apply(to_apply) if to_apply else set()
+                applied += len(applied_ids)
+
+                for ticket_id, title, category, suggested, confidence, keywords in suggestions:
+                    changes[(category, suggested)] += 1
+                    if writer:
+                        writer.writerow([
+                            ticket_id, title, category, suggested, f'{confidence:.3f}', keywords,
+                            'yes' if ticket_id in applied_ids else 'no'
+                        ])
+                    if options['verbosity'] > 1:
+                        self.stdout.write(
+                            f'  • Ticket #{ticket_id}: "{title}" {category} → {suggested} ({confidence:.0%})'
+                        )
+                logger.debug(f'Checked {checked} tickets')
+        finally:
+            if report_file:
+                report_file.close()
+
+        self.stdout.write(f'\nChecked {checked} ticket(s), {sum(changes.values())} suggested re-categorization(s):')
+        for (category, suggested), count in changes.most_common():
+            self.stdout.write(f'  {category:<10} → {suggested:<10} {count}')
+
+        self.stdout.write(f'\n{"=" * 70}')
+        if options['output']:
+            self.stdout.write(f'Report written to {options["output"]}')
+        if options['apply']:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Re-categorized {applied} ticket(s) with confidence ≥ {apply_threshold:.0%}'
+            ))
+        self.stdout.write(f'{"=" * 70}\n')
+
+    def _chunks(self, chunk_size):
+        """Ticket rows in id order, chunk_size at a time"""
+        last_id = 0
+        while True:
+            rows = list(
+                Ticket.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'title', 'description', 'category')[:chunk_size]
+            )
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def _classified_chunks(self, options):
+        """(rows, suggestions) per chunk, in order; at most two chunks per worker in flight"""
+        chunks = self._chunks(options['chunk_size'])
+        threshold = options['threshold']
+        # Forked workers inherit the configured Django; spawned ones would set it up again and
+        # start another scheduler (see CrmConfig.ready), so without fork classify in-process
+        parallel = options['workers'] > 1 and 'fork' in multiprocessing.get_all_start_methods()
+        if not parallel:
+            if options['workers'] > 1:
+                self.stdout.write(self.style.WARNING('⚠️  Process pool not available on this platform - using one process'))
+            for rows in chunks:
+                yield rows, classify_chunk(rows, threshold)
+            return
+
+        # Worker processes must not inherit the open database connection
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('fork')) as pool:
+            pending = deque()
+            for rows in chunks:
+                pending.append((rows, pool.submit(classify_chunk, rows, threshold)))
+                if len(pending) >= options['workers'] * 2:
+                    rows, future = pending.popleft()
+                    yield rows, future.result()
+            while pending:
+                rows, future = pending.popleft()
+                yield rows, future.result()
+
+    def _apply(self, suggestions):
+        """
+        Change the category of the suggested tickets
+
+        Only tickets still in the category they were classified in are changed.
+
+        Returns:
+            set: Ids of the changed tickets
+        """
+        by_change = {}
+        for suggestion in suggestions:
+            by_change.setdefault((suggestion[2], suggestion[3]), []).append(suggestion)
+
+        now = timezone.now()
+        applied_ids = set()
+        logs = []
+        with transaction.atomic():
+            for (category, suggested), group in by_change.items():
+                ids = list(
+                    Ticket.objects.select_for_update()
+                    .filter(id__in=[s[0] for s in group], category=category)
+                    .values_list('id', flat=True)
+                )
+                if not ids:
+                    continue
+                # updated_at moves so statistics rollups and ticket boards pick up the change
+                Ticket.objects.filter(id__in=ids).update(category=suggested, updated_at=now)
+                applied_ids.update(ids)
+                for ticket_id, title, _, _, confidence, _ in group:
+                    if ticket_id in applied_ids:
+                        logs.append(ActivityLog(
+                            user=None,  # System action
+                            action_type='ticket_updated',
+                            description=f"Automatycznie zmieniono kategorię zgłoszenia '{title}' "
+                                        f"z '{category}' na '{suggested}' (pewność {confidence:.0%})",
+                            ticket_id=ticket_id,
+                            ip_address=None
+                        ))
+            ActivityLog.objects.bulk_create(logs)
+        return applied_ids
@@ -0,0 +1,76 @@
+"""
+Management command to re-cost AgentWorkLog working time
+Run after changing WorkHours - recomputes work_time_minutes of finished logs with the current schedule
+"""
+
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from crm.models import AgentWorkLog
+from crm.services.business_calendar import clear_work_schedule_cache
+from crm.services.statistics import recompute_work_log_minutes, refresh_rollups
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recomputes work_time_minutes of finished agent work logs using the current WorkHours'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only logs started on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows processed per batch (default: 2000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many logs would change without saving',
+        )
+        parser.add_argument(
+            '--skip-statistics',
+            action='store_true',
+            help='Do not rebuild TicketStatistics rollups after changes',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        
+        work_logs = AgentWorkLog.objects.all()
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            work_logs = work_logs.filter(start_time__gte=timezone.make_aware(since))
+        
+        if dry_run:
+            self.stdout.write(self.style.WARNING('🔍 DRY RUN MODE - No changes will be made'))
+        
+        # Make sure the latest WorkHours are used
+        clear_work_schedule_cache()
+        
+        checked, changed = recompute_work_log_minutes(
+            work_logs,
+            chunk_size=options['chunk_size'],
+            dry_run=dry_run
+        )
+        
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'✅ {changed} of {checked} work log(s) would be updated'))
+            return
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Updated {changed} of {checked} work log(s)'))
+        
+        # Rollups store average work time and the incremental refresh only follows ticket changes
+        if changed and not options['skip_statistics']:
+            self.stdout.write('Rebuilding ticket statistics rollups...')
+            written = refresh_rollups(full=True)
+            self.stdout.write(self.style.SUCCESS(f'✅ Rollups rebuilt: {written} row(s) written'))
@@ -0,0 +1,31 @@
+"""
+Management command to refresh the TicketStatistics rollups
+Runs incrementally from the scheduler - only periods touched by tickets changed since the last refresh are recomputed
+"""
+
+from django.core.management.base import BaseCommand
+from crm.services.statistics import refresh_rollups
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Refreshes TicketStatistics rollups (day/week/month/year, per organization and per agent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild all periods instead of only those touched by changed tickets',
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        
+        mode = 'full rebuild' if full else 'incremental'
+        self.stdout.write(f'Refreshing ticket statistics rollups ({mode})...')
+        
+        written = refresh_rollups(full=full)
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Rollups refreshed: {written} row(s) written'))
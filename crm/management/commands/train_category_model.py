@@ -0,0 +1,118 @@
+"""
+Management command to train the ticket category classifier
+Learns from the title, description and category of existing tickets and reports the
+accuracy on a holdout set next to the keyword heuristic
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from crm.models import Ticket
+from crm.services.categorization import CategoryModel, model_path, reset_category_model
+from crm.services.categorization.features import DEFAULT_BUCKETS
+from crm.utils.category_suggestion import detect_category
+import os
+import random
+import time
+
+# Fewer tickets than this cannot give a meaningful model
+MIN_TICKETS = 20
+
+
+class Command(BaseCommand):
+    help = 'Trains the category suggestion model on existing tickets and reports holdout accuracy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--holdout',
+            type=float,
+            default=0.2,
+            help='Share of tickets kept out of training for the accuracy check (default: 0.2)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed of the holdout split (default: 42)',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.0,
+            help='Additive smoothing (default: 1.0)',
+        )
+        parser.add_argument(
+            '--buckets',
+            type=int,
+            default=DEFAULT_BUCKETS,
+            help=f'Number of feature hash buckets, a power of two (default: {DEFAULT_BUCKETS})',
+        )
+        parser.add_argument(
+            '--output',
+            help='Model file (default: CATEGORY_MODEL_PATH)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the accuracy, do not write the model file',
+        )
+
+    def handle(self, *args, **options):
+        buckets = options['buckets']
+        if buckets < 2 or buckets & (buckets - 1):
+            raise CommandError('--buckets must be a power of two')
+        if not 0 < options['holdout'] < 1:
+            raise CommandError('--holdout must be between 0 and 1')
+
+        samples = list(Ticket.objects.order_by('id').values_list('title', 'description', 'category'))
+        if len(samples) < MIN_TICKETS:
+            raise CommandError(f'At least {MIN_TICKETS} tickets are needed to train the model (found {len(samples)})')
+
+        random.Random(options['seed']).shuffle(samples)
+        holdout_size = max(1, int(len(samples) * options['holdout']))
+        holdout, training = samples[:holdout_size], samples[holdout_size:]
+
+        self.stdout.write(f'Tickets: {len(samples)} (training {len(training)}, holdout {len(holdout)})')
+        model = CategoryModel.train(training, buckets=buckets, alpha=options['alpha'])
+        self._report(model, holdout)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('⚠️  Dry run - model file not written'))
+            return
+
+        # The saved model learns from every ticket, holdout included
+        model = CategoryModel.train(samples, buckets=buckets, alpha=options['alpha'])
+        path = options['output'] or model_path()
+        model.save(path)
+        reset_category_model()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Model trained on {len(samples)} tickets saved to {path} ({os.path.getsize(path) / 1024:.1f} KB)'
+        ))
+
+    def _report(self, model, holdout):
+        """Print holdout accuracy of the model and of the keyword heuristic"""
+        correct = heuristic_correct = unknown = 0
+        per_category = {}
+        started = time.perf_counter()
+        predictions = [model.predict(title, description) for title, description, _ in holdout]
+        elapsed = time.perf_counter() - started
+
+        for (title, description, category), prediction in zip(holdout, predictions):
+            if prediction is None:
+                # No known feature - the heuristic answers in production
+                unknown += 1
+                predicted = detect_category(title, description)[0]
+            else:
+                predicted = prediction[0]
+            hits, total = per_category.get(category, (0, 0))
+            per_category[category] = (hits + (predicted == category), total + 1)
+            correct += predicted == category
+            heuristic_correct += detect_category(title, description)[0] == category
+
+        self.stdout.write('')
+        self.stdout.write(f'Model accuracy:     {correct / len(holdout):.1%}')
+        self.stdout.write(f'Heuristic accuracy: {heuristic_correct / len(holdout):.1%}')
+        if unknown:
+            self.stdout.write(f'Fallback to heuristic: {unknown} ticket(s) without known words')
+        self.stdout.write(f'Prediction time:    {elapsed / len(holdout) * 1000:.3f} ms/ticket')
+        for category, (hits, total) in sorted(per_category.items()):
+            self.stdout.write(f'  {category:<10} {hits}/{total} ({hits / total:.1%})')
+        self.stdout.write('')
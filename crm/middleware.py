@@ -6,23 +6,39 @@ import logging
 from django.conf import settings
 from datetime import datetime
 from django.utils import timezone
+from .services.access import get_access_snapshot, is_device_trusted
+from .services.device import lazy_device
 
 logger = logging.getLogger(__name__)
 
+class DeviceDetectionMiddleware:
+    """
+    Ustawia request.device - typ urządzenia (mobile/tablet/desktop) wyznaczany z User-Agent przy pierwszym użyciu.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.device = lazy_device(request)
+        return self.get_response(request)
+
 class ViewerRestrictMiddleware:
     """
-    Blokuje użytkownikom z rolą 'viewer' dostęp do wszystkich stron poza ticket_display, get_tickets_update i logout.
+    Blokuje użytkownikom z rolą 'viewer' dostęp do wszystkich stron poza ticket_display, get_tickets_update, get_tickets_delta, ticket_events i logout.
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        if request.user.is_authenticated and hasattr(request.user, 'profile'):
-            if request.user.profile.role == 'viewer':
+        access = get_access_snapshot(request)
+        if access and access.has_profile:
+            if access.role == 'viewer':
                 allowed_urls = [
                     reverse('ticket_display'),
                     reverse('logout'),
                     reverse('get_tickets_update'),
+                    reverse('get_tickets_delta'),
+                    reverse('ticket_events'),
                 ]
                 if request.path not in allowed_urls:
                     return redirect('ticket_display')
@@ -35,16 +51,17 @@ class EmailVerificationMiddleware:
         self.get_response = get_response
         
     def __call__(self, request):
-        if request.user.is_authenticated:
+        access = get_access_snapshot(request)
+        if access:
             # Check if user needs email verification
-            if hasattr(request.user, 'profile') and not request.user.profile.email_verified:
+            if access.has_profile and not access.email_verified:
                 # User needs to verify email
                 if not self._is_exempt_path(request.path):
                     messages.info(request, 'Musisz zweryfikować swój adres email przed kontynuowaniem.')
                     return redirect('verify_email')
             
             # Check if verified but not approved user is trying to access non-exempt pages
-            elif hasattr(request.user, 'profile') and request.user.profile.email_verified and not request.user.profile.is_approved:
+            elif access.has_profile and access.email_verified and not access.is_approved:
                 # User is verified but waiting for admin approval
                 if not self._is_approval_exempt_path(request.path):
                     return redirect('register_pending')
@@ -81,29 +98,18 @@ class TwoFactorMiddleware:
         self.get_response = get_response
         
     def __call__(self, request):
-        if request.user.is_authenticated:
+        access = get_access_snapshot(request)
+        if access:
             # Check if user's group is exempt from 2FA
-            group_exempt = False
-            if hasattr(request.user, 'profile') and request.user.groups.exists():
-                group = request.user.groups.first()
-                if hasattr(group, 'settings'):
-                    group_exempt = group.settings.exempt_from_2fa
-                    
-                    # Save navbar visibility setting in request for use in templates
-                    request.show_navbar = group.settings.show_navbar
-                else:
-                    # Default show navbar if no settings
-                    request.show_navbar = True
-            else:
-                # Default show navbar if no groups
-                request.show_navbar = True
+            group_exempt = access.exempt_from_2fa
+            
+            # Save navbar visibility setting in request for use in templates
+            request.show_navbar = access.show_navbar
             
             # Check if user has profile and is already approved
-            if hasattr(request.user, 'profile') and request.user.profile.is_approved and not group_exempt:
+            if access.has_profile and access.is_approved and not group_exempt:
                 # First case: User has 2FA enabled and needs verification
-                if request.user.profile.ga_enabled:
-                    profile = request.user.profile
-                    
+                if access.ga_enabled:
                     # Get the IP address
                     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
                     if x_forwarded_for:
@@ -114,8 +120,9 @@ class TwoFactorMiddleware:
                     # Get device fingerprint (User-Agent)
                     device_fingerprint = request.META.get('HTTP_USER_AGENT', '')
                     
-                    # Check if verification is needed (now supports multiple trusted devices)
-                    if profile.needs_2fa_verification(request_ip=ip, device_fingerprint=device_fingerprint):
+                    # Check if verification is needed (same check as UserProfile.needs_2fa_verification,
+                    # answered from the cache without loading the profile)
+                    if not ip or not is_device_trusted(request.user.pk, ip, device_fingerprint):
                         # Check if current path is already the 2FA verification path or other exempt path
                         if not self._is_exempt_path(request.path):
                             # Store the original destination if it's not already in session
@@ -126,7 +133,7 @@ class TwoFactorMiddleware:
                             return redirect('verify_2fa')
                 
                 # Second case: Approved user doesn't have 2FA enabled yet - redirect to setup
-                elif not request.user.profile.ga_enabled:
+                else:
                     # Check if current path is already an exempt path (like 2FA setup itself)
                     if not self._is_exempt_path(request.path) and request.path != reverse('setup_2fa'):
                         # If not in a grace period (first login)
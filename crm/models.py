@@ -147,37 +147,16 @@ class UserProfile(models.Model):
         
         # If no IP provided, require verification
         if not request_ip:
-            logger.debug(f"User {self.user.username}: No IP provided, requiring verification")
+            logger.debug(f"User {self.user_id}: No IP provided, requiring verification")
             return True
         
-        # Check if any of the trusted devices matches and is still valid
-        valid_devices = self.user.trusted_devices.filter(
-            trusted_until__gt=timezone.now()
-        )
-        
-        logger.info(f"User {self.user.username}: Found {valid_devices.count()} valid trusted devices")
-        
-        for device in valid_devices:
-            # Match by IP address and fingerprint
-            if device.ip_address == request_ip:
-                # If fingerprint provided, check exact match
-                if device_fingerprint:
-                    if device.device_fingerprint == device_fingerprint:
-                        logger.info(f"User {self.user.username}: Matched trusted device by IP and fingerprint")
-                        # Update last_used timestamp
-                        device.last_used = timezone.now()
-                        device.save(update_fields=['last_used'])
-                        return False
-                    else:
-                        logger.debug(f"User {self.user.username}: IP matched but fingerprint differs")
-                else:
-                    # No fingerprint provided, IP match is enough (for API calls, etc.)
-                    logger.info(f"User {self.user.username}: Matched trusted device by IP only (no fingerprint provided)")
-                    device.last_used = timezone.now()
-                    device.save(update_fields=['last_used'])
-                    return False
+        # Cached per IP and fingerprint until the device expires or the user's devices change
+        from .services.access import is_device_trusted
+        if is_device_trusted(self.user_id, request_ip, device_fingerprint):
+            logger.debug(f"User {self.user_id}: Matched trusted device")
+            return False
         
-        logger.info(f"User {self.user.username}: No trusted device matched, requiring 2FA verification")
+        logger.info(f"User {self.user_id}: No trusted device matched, requiring 2FA verification")
         return True
         
     def set_device_trusted(self, request_ip, fingerprint, trust_days=30):
@@ -215,6 +194,8 @@ class UserProfile(models.Model):
             
             # Ensure we don't have more than 3 trusted devices
             # Remove oldest devices if we exceed the limit
+            from .services.access import flush_device_usage
+            flush_device_usage()
             devices_count = self.user.trusted_devices.count()
             if devices_count > 3:
                 # Get devices ordered by last_used (oldest first)
@@ -452,6 +433,9 @@ class Ticket(models.Model):
         # Ustawienie daty rozwiązania/zamknięcia przy zmianie statusu
         if self.pk:
             old_ticket = Ticket.objects.get(pk=self.pk)
+            # Read by the post_save signal to tell status changes apart
+            self._previous_status = old_ticket.status
+            self._previous_organization_id = old_ticket.organization_id
             if old_ticket.status != 'resolved' and self.status == 'resolved':
                 self.resolved_at = timezone.now()
             if old_ticket.status != 'closed' and self.status == 'closed':
@@ -462,6 +446,17 @@ class Ticket(models.Model):
         ordering = ['-created_at']
         verbose_name = "Zgłoszenie"
         verbose_name_plural = "Zgłoszenia"
+        indexes = [
+            # Ticket lists and dashboards scoped by organization / assignee with a status filter
+            models.Index(fields=['organization', 'status'], name='ticket_org_status_idx'),
+            models.Index(fields=['assigned_to', 'status'], name='ticket_assignee_status_idx'),
+            # Default ordering and statistics date ranges
+            models.Index(fields=['created_at'], name='ticket_created_idx'),
+            # Auto-close (status='resolved' AND resolved_at <= cutoff)
+            models.Index(fields=['status', 'resolved_at'], name='ticket_status_resolved_idx'),
+            # Incremental statistics refresh (updated_at > watermark)
+            models.Index(fields=['updated_at'], name='ticket_updated_idx'),
+        ]
 
 
 class TicketComment(models.Model):
@@ -577,6 +572,10 @@ class TicketCalendarAssignment(models.Model):
         auto_now_add=True, 
         verbose_name="Data utworzenia"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Data aktualizacji"
+    )
     notes = models.TextField(
         blank=True, 
         null=True,
@@ -594,13 +593,13 @@ class TicketCalendarAssignment(models.Model):
         return f"Ticket #{self.ticket.id} → {self.assigned_to.username} na {self.assigned_date}"
     
     def clean(self):
-        """Validate that assigned_date is not a weekend"""
+        """Validate that assigned_date is a business day (not a weekend or holiday)"""
         from django.core.exceptions import ValidationError
+        from .services.business_calendar import get_business_calendar
         if self.assigned_date:
-            # Check if it's Saturday (5) or Sunday (6)
-            if self.assigned_date.weekday() >= 5:
+            if not get_business_calendar().is_business_day(self.assigned_date):
                 raise ValidationError({
-                    'assigned_date': 'Nie można przypisać ticketu na weekend (sobota/niedziela).'
+                    'assigned_date': 'Nie można przypisać ticketu na weekend ani dzień wolny od pracy.'
                 })
     
     def save(self, *args, **kwargs):
@@ -699,6 +698,11 @@ class ActivityLog(models.Model):
         ordering = ['-created_at']
         verbose_name = "Log aktywności"
         verbose_name_plural = "Logi aktywności"
+        indexes = [
+            models.Index(fields=['-created_at'], name='activity_created_idx'),
+            models.Index(fields=['action_type', '-created_at'], name='activity_action_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='activity_user_created_idx'),
+        ]
 
 
 class UserPreference(models.Model):
@@ -1001,8 +1005,32 @@ class WorkHours(models.Model):
         return f"{self.get_day_of_week_display()} {self.start_time} - {self.end_time}"
 
 
+class Holiday(models.Model):
+    """
+    Day off in addition to the Polish public holidays (e.g. a day off for a holiday on Saturday)
+
+    Public holidays are computed per year by crm.services.business_calendar.holidays and do
+    not need rows here.
+    """
+    date = models.DateField(unique=True, verbose_name="Data")
+    name = models.CharField(max_length=100, verbose_name="Nazwa")
+    
+    class Meta:
+        verbose_name = "Dzień wolny"
+        verbose_name_plural = "Dni wolne"
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.date} - {self.name}"
+
+
 class TicketStatistics(models.Model):
-    """Store aggregated ticket statistics"""
+    """
+    Store aggregated ticket statistics
+    
+    Rows are written by crm.services.statistics.rollups for the cohort of tickets
+    created in the period, per organization (agent empty) or per agent (organization empty).
+    """
     PERIOD_CHOICES = [
         ('day', 'Dzień'),
         ('week', 'Tydzień'),
@@ -1021,13 +1049,18 @@ class TicketStatistics(models.Model):
     tickets_opened = models.IntegerField(default=0)
     tickets_closed = models.IntegerField(default=0)
     tickets_resolved = models.IntegerField(default=0)
+    tickets_assigned = models.IntegerField(default=0)
+    tickets_with_resolution_time = models.IntegerField(default=0)  # Weight of avg_resolution_time
+    tickets_with_actual_time = models.IntegerField(default=0)  # Weight of avg_actual_resolution_time
     
     # Time metrics (in minutes)
     avg_resolution_time = models.FloatField(default=0)
     avg_first_response_time = models.FloatField(default=0)
     avg_agent_work_time = models.FloatField(default=0)
+    avg_actual_resolution_time = models.FloatField(null=True, blank=True)  # In hours, like Ticket.actual_resolution_time
     
     # Categorical breakdowns
+    status_distribution = models.JSONField(default=dict)  # {'new': 3, 'closed': 7, etc.}
     priority_distribution = models.JSONField(default=dict)  # {'low': 5, 'medium': 10, etc.}
     category_distribution = models.JSONField(default=dict)  # {'hardware': 8, 'software': 12, etc.}
     
@@ -1114,6 +1147,16 @@ class EmailNotificationSettings(models.Model):
     notify_ticket_closed = models.BooleanField(default=True, verbose_name="Zamknięcie zgłoszenia")
     notify_ticket_reopened = models.BooleanField(default=True, verbose_name="Ponowne otwarcie")
     
+    # Grouping of ticket notifications
+    notification_window = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="Grupowanie powiadomień (minuty)",
+        help_text="Zmiany zgłoszenia z tego okresu trafiają do jednej wiadomości. Puste - ustawienie domyślne, 0 - wysyłka od razu."
+    )
+    daily_digest = models.BooleanField(
+        default=False, verbose_name="Dzienne podsumowanie",
+        help_text="Zamiast osobnych wiadomości jedno podsumowanie zmian w zgłoszeniach raz dziennie."
+    )
+    
     # System notifications
     notify_account_approved = models.BooleanField(default=True, verbose_name="Zatwierdzenie konta")
     notify_password_reset = models.BooleanField(default=True, verbose_name="Reset hasła")
@@ -1149,3 +1192,110 @@ class CalendarNote(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.date} - {self.title}"
+
+
+class ReportJob(models.Model):
+    """
+    Statistics report generated in the background
+    
+    The finished file (artifact) is stored under settings.REPORT_JOBS_ROOT and served only
+    through the download view. Requests with the same params_key reuse a finished artifact
+    until expires_at.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'W kolejce'),
+        ('running', 'W trakcie'),
+        ('done', 'Gotowy'),
+        ('failed', 'Błąd'),
+    )
+    
+    REPORT_TYPE_CHOICES = (
+        ('statistics', 'Raport statystyk'),
+        ('organization', 'Raport firm'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs', verbose_name="Zlecający")
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPE_CHOICES, verbose_name="Typ raportu")
+    params = models.JSONField(default=dict, verbose_name="Parametry")
+    params_key = models.CharField(max_length=64, db_index=True, verbose_name="Klucz parametrów")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name="Status")
+    artifact = models.CharField(max_length=255, blank=True, verbose_name="Plik raportu")  # relative to REPORT_JOBS_ROOT
+    filename = models.CharField(max_length=255, blank=True, verbose_name="Nazwa pliku")
+    content_type = models.CharField(max_length=100, blank=True, verbose_name="Typ zawartości")
+    error_message = models.TextField(blank=True, verbose_name="Błąd")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data zlecenia")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Data rozpoczęcia")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Data zakończenia")
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Ważny do")
+    
+    class Meta:
+        verbose_name = "Zadanie raportu"
+        verbose_name_plural = "Zadania raportów"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_report_type_display()} #{self.id} ({self.get_status_display()})"
+    
+    @property
+    def artifact_path(self):
+        """Absolute path of the finished report file"""
+        return os.path.join(settings.REPORT_JOBS_ROOT, self.artifact) if self.artifact else None
+    
+    def is_available(self):
+        """Check if the finished report can still be downloaded"""
+        return (
+            self.status == 'done'
+            and self.expires_at is not None
+            and self.expires_at > timezone.now()
+            and os.path.exists(self.artifact_path)
+        )
+
+
+class OutboundEmail(models.Model):
+    """
+    Ticket notification waiting in the email outbox
+    
+    One row per recipient and event; events arriving while a row waits out the recipient's
+    grouping window (or daily digest) are merged into it. Rows are claimed in batches by
+    the outbox worker (process_email_outbox), rendered and sent; failed sends are retried
+    with growing delays until EMAIL_OUTBOX_MAX_ATTEMPTS.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'W kolejce'),
+        ('sending', 'Wysyłanie'),
+        ('sent', 'Wysłany'),
+        ('failed', 'Błąd'),
+    )
+    
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outbound_emails', verbose_name="Odbiorca")
+    to_email = models.EmailField(verbose_name="Adres e-mail")
+    domain = models.CharField(max_length=255, verbose_name="Domena")  # rate limits are per recipient domain
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, null=True, blank=True, related_name='outbound_emails', verbose_name="Zgłoszenie")
+    notification_type = models.CharField(max_length=30, verbose_name="Typ powiadomienia")
+    context = models.JSONField(default=dict, blank=True, verbose_name="Dane szablonu")
+    # Later events merged into this message (notification grouping and daily digests)
+    extra_events = models.JSONField(default=list, blank=True, verbose_name="Dołączone zdarzenia")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name="Status")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Liczba prób")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Następna próba")
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name="Pobrany przez worker")
+    claimed_by = models.CharField(max_length=64, blank=True, verbose_name="Worker")
+    last_error = models.TextField(blank=True, verbose_name="Ostatni błąd")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data dodania")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Data wysłania")
+    
+    class Meta:
+        verbose_name = "Wiadomość w kolejce e-mail"
+        verbose_name_plural = "Kolejka e-mail"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['domain', 'sent_at']),
+            models.Index(fields=['recipient', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.notification_type} -> {self.to_email} ({self.get_status_display()})"
@@ -5,6 +5,7 @@ This runs as part of Django application - no cron needed!
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from django.conf import settings
 from django.core.management import call_command
 from django_apscheduler.jobstores import DjangoJobStore
@@ -28,6 +29,52 @@ def auto_close_resolved_tickets():
         logger.error(f"Error in auto_close_resolved_tickets job: {e}")
 
 
+def refresh_ticket_statistics():
+    """
+    Job that refreshes TicketStatistics rollups for periods touched by changed tickets
+    """
+    logger.info("Running refresh_ticket_statistics job...")
+    try:
+        call_command('refresh_statistics')
+        logger.info("refresh_ticket_statistics job completed successfully")
+    except Exception as e:
+        logger.error(f"Error in refresh_ticket_statistics job: {e}")
+
+
+def rebuild_ticket_statistics():
+    """
+    Job that rebuilds all TicketStatistics rollups (picks up deleted tickets and edited work logs)
+    """
+    logger.info("Running rebuild_ticket_statistics job...")
+    try:
+        call_command('refresh_statistics', full=True)
+        logger.info("rebuild_ticket_statistics job completed successfully")
+    except Exception as e:
+        logger.error(f"Error in rebuild_ticket_statistics job: {e}")
+
+
+def process_report_jobs():
+    """
+    Job that runs report jobs left in the queue and deletes expired report files
+    """
+    logger.info("Running process_report_jobs job...")
+    try:
+        call_command('process_report_jobs')
+        logger.info("process_report_jobs job completed successfully")
+    except Exception as e:
+        logger.error(f"Error in process_report_jobs job: {e}")
+
+
+def process_email_outbox():
+    """
+    Job that sends notification emails waiting in the outbox (retries, rate-limited domains)
+    """
+    try:
+        call_command('process_email_outbox')
+    except Exception as e:
+        logger.error(f"Error in process_email_outbox job: {e}")
+
+
 @util.close_old_connections
 def delete_old_job_executions(max_age=604_800):
     """
@@ -55,6 +102,50 @@ def start_scheduler():
     )
     logger.info("Added job 'auto_close_resolved_tickets' to scheduler (runs daily at 2:00 AM)")
     
+    # Schedule incremental statistics rollup refresh every 15 minutes
+    scheduler.add_job(
+        refresh_ticket_statistics,
+        trigger=IntervalTrigger(minutes=15),
+        id="refresh_ticket_statistics",
+        max_instances=1,
+        replace_existing=True,
+        name="Refresh ticket statistics rollups"
+    )
+    logger.info("Added job 'refresh_ticket_statistics' to scheduler (runs every 15 minutes)")
+    
+    # Schedule full statistics rollup rebuild weekly (Sunday at 4 AM)
+    scheduler.add_job(
+        rebuild_ticket_statistics,
+        trigger=CronTrigger(day_of_week="sun", hour=4, minute=0),
+        id="rebuild_ticket_statistics",
+        max_instances=1,
+        replace_existing=True,
+        name="Rebuild ticket statistics rollups"
+    )
+    logger.info("Added job 'rebuild_ticket_statistics' to scheduler (runs weekly on Sunday at 4:00 AM)")
+    
+    # Schedule report job maintenance every 5 minutes
+    scheduler.add_job(
+        process_report_jobs,
+        trigger=IntervalTrigger(minutes=5),
+        id="process_report_jobs",
+        max_instances=1,
+        replace_existing=True,
+        name="Process background report jobs"
+    )
+    logger.info("Added job 'process_report_jobs' to scheduler (runs every 5 minutes)")
+    
+    # Schedule the email outbox worker every minute (new messages are also sent right after queuing)
+    scheduler.add_job(
+        process_email_outbox,
+        trigger=IntervalTrigger(minutes=1),
+        id="process_email_outbox",
+        max_instances=1,
+        replace_existing=True,
+        name="Send queued notification emails"
+    )
+    logger.info("Added job 'process_email_outbox' to scheduler (runs every minute)")
+    
     # Schedule cleanup of old job executions weekly (Sunday at 3 AM)
     scheduler.add_job(
         delete_old_job_executions,
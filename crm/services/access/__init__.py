@@ -0,0 +1,22 @@
+"""
+Access services package for the CRM application.
+
+This package provides the cached per-user access snapshot read by the middleware and
+context processors on every request, and the cached trusted-device checks of two-factor
+authentication.
+"""
+
+from .snapshot import (
+    AccessSnapshot,
+    build_access_snapshot,
+    get_access_snapshot,
+    invalidate_user_access,
+    invalidate_all_access,
+)
+from .trusted_devices import (
+    find_trusted_device,
+    is_device_trusted,
+    invalidate_trusted_devices,
+    record_device_use,
+    flush_device_usage,
+)
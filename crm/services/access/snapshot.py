@@ -0,0 +1,149 @@
+"""
+Per-user access snapshot.
+
+Middleware and context processors need the same handful of facts about the current user on
+every request: role, approval and email verification, whether 2FA is enabled, the settings
+of the user's first group and the view permissions. AccessSnapshot gathers them with a few
+queries, stores them in the cache and keeps them on the request, so a normal request reads
+them with one cache round trip.
+
+Cache entries are versioned instead of deleted: a per-user version is bumped by profile and
+user permission changes, a global version by group settings and group permission changes
+(see crm/signals.py). Versions only reach other worker processes through a shared cache
+(see CACHES), so with a per-process LocMemCache snapshots are not cached between requests.
+"""
+
+from dataclasses import dataclass, field
+from django.core.cache import cache
+import logging
+
+from ...models import GroupViewPermission, UserProfile, UserViewPermission, ViewPermission
+from .versions import bump_version, cache_is_shared, get_versions
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'crm:access:version'
+USER_VERSION_KEY = 'crm:access:version:{user_id}'
+SNAPSHOT_KEY = 'crm:access:{user_id}:{global_version}:{user_version}'
+
+# Safety net for changes made without signals (queryset.update())
+SNAPSHOT_TTL = 300
+
+
+@dataclass(frozen=True)
+class AccessSnapshot:
+    """What middleware and templates need to know about a user's access"""
+
+    user_id: int
+    has_profile: bool
+    role: str = None
+    is_approved: bool = False
+    email_verified: bool = False
+    ga_enabled: bool = False
+    # Settings of the user's first group (defaults when there is no group or no settings)
+    exempt_from_2fa: bool = False
+    show_navbar: bool = True
+    view_permissions: dict = field(default_factory=dict)
+
+
+def build_access_snapshot(user):
+    """
+    Read the access snapshot of a user from the database
+
+    Args:
+        user: Authenticated User
+
+    Returns:
+        AccessSnapshot
+    """
+    profile = UserProfile.objects.filter(user=user).values(
+        'role', 'is_approved', 'email_verified', 'ga_enabled'
+    ).first()
+
+    # The first group (by id) decides the 2FA exemption, navbar and statistics access
+    first_group = user.groups.order_by('pk').values(
+        'settings__id', 'settings__exempt_from_2fa', 'settings__show_navbar', 'settings__show_statistics'
+    ).first()
+    group_settings = first_group if first_group and first_group['settings__id'] else None
+
+    # Start with a default set of denied permissions for all views
+    permissions = {view[0]: False for view in ViewPermission.VIEW_CHOICES}
+    for view_name in GroupViewPermission.objects.filter(
+        group__in=user.groups.all()
+    ).values_list('view__name', flat=True):
+        permissions[view_name] = True
+
+    # Override with specific user permissions if any
+    for view_name, is_granted in UserViewPermission.objects.filter(
+        user=user
+    ).values_list('view__name', 'is_granted'):
+        permissions[view_name] = is_granted
+
+    # Special case for superusers - they get all permissions
+    if user.is_superuser:
+        for key in permissions:
+            permissions[key] = True
+
+    if group_settings and group_settings['settings__show_statistics']:
+        permissions['statistics'] = True
+
+    if profile is None:
+        return AccessSnapshot(user_id=user.pk, has_profile=False, view_permissions=permissions)
+
+    return AccessSnapshot(
+        user_id=user.pk,
+        has_profile=True,
+        role=profile['role'],
+        is_approved=profile['is_approved'],
+        email_verified=profile['email_verified'],
+        ga_enabled=profile['ga_enabled'],
+        # Group settings only apply to users with a profile
+        exempt_from_2fa=bool(group_settings and group_settings['settings__exempt_from_2fa']),
+        show_navbar=group_settings['settings__show_navbar'] if group_settings else True,
+        view_permissions=permissions,
+    )
+
+
+def get_access_snapshot(request):
+    """
+    Access snapshot of the request's user (None for anonymous users)
+
+    Built at most once per request and shared through the cache between requests (only
+    when the cache is shared by all workers).
+    """
+    if not request.user.is_authenticated:
+        return None
+
+    snapshot = getattr(request, '_access_snapshot', None)
+    if snapshot is not None:
+        return snapshot
+
+    if not cache_is_shared():
+        # Role, approval and 2FA changes made in another worker would go unnoticed
+        snapshot = build_access_snapshot(request.user)
+        request._access_snapshot = snapshot
+        return snapshot
+
+    user_id = request.user.pk
+    global_version, user_version = get_versions(GLOBAL_VERSION_KEY, USER_VERSION_KEY.format(user_id=user_id))
+    key = SNAPSHOT_KEY.format(user_id=user_id, global_version=global_version, user_version=user_version)
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_access_snapshot(request.user)
+        cache.set(key, snapshot, SNAPSHOT_TTL)
+        logger.debug(f"Built access snapshot for user {user_id}")
+
+    request._access_snapshot = snapshot
+    return snapshot
+
+
+def invalidate_user_access(user_id):
+    """Drop the cached snapshot of one user (profile, groups or user permissions changed)"""
+    bump_version(USER_VERSION_KEY.format(user_id=user_id))
+
+
+def invalidate_all_access():
+    """Drop all cached snapshots (group settings or group permissions changed)"""
+    bump_version(GLOBAL_VERSION_KEY)
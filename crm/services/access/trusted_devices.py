@@ -0,0 +1,163 @@
+"""
+Cached trusted-device checks for two-factor authentication.
+
+TwoFactorMiddleware asks on every request whether the current IP and device fingerprint
+belong to a trusted device. The answer is cached per (user, IP, fingerprint) until the
+device's trust expires; saving or deleting any trusted device of the user bumps a per-user
+version (see crm/signals.py), which drops all of the user's cached answers at once. The
+version only reaches other worker processes through a shared cache (see CACHES); with a
+per-process LocMemCache positive answers are kept for LOCAL_DECISION_TTL seconds only.
+
+Matching devices get their last_used timestamp refreshed, but the writes are collected in
+memory and flushed in one batch at most every LAST_USED_FLUSH_INTERVAL seconds, so browsing
+with a trusted device causes no per-request UPDATE.
+"""
+
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
+import atexit
+import hashlib
+import logging
+import threading
+import time
+
+from ...models import TrustedDevice
+from .versions import bump_version, cache_is_shared, get_versions
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+DEVICE_VERSION_KEY = 'crm:2fa:devices:version:{user_id}'
+DECISION_KEY = 'crm:2fa:trusted:{user_id}:{version}:{device_hash}'
+
+# Longest time a positive answer is cached (trust expiry usually ends it sooner)
+DECISION_TTL = 3600
+# ...when the cache is per process and revocations in other workers are not seen
+LOCAL_DECISION_TTL = 10
+# Unknown devices are re-checked quickly, they are about to verify and become trusted
+NEGATIVE_DECISION_TTL = 60
+
+# Seconds between batched last_used writes
+LAST_USED_FLUSH_INTERVAL = 300
+
+_pending_lock = threading.Lock()
+_pending_last_used = {}
+_last_flush = time.monotonic()
+
+
+def _device_hash(ip_address, device_fingerprint):
+    # Fingerprints are full User-Agent strings; hash them to keep cache keys short
+    raw = f'{ip_address}|{device_fingerprint or ""}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def find_trusted_device(user_id, ip_address, device_fingerprint=None):
+    """
+    Id of the valid trusted device matching an IP address (and fingerprint, when given)
+
+    Without a fingerprint (API calls etc.) a matching IP address is enough.
+
+    Args:
+        user_id: Id of the user
+        ip_address: Client IP address
+        device_fingerprint: Device fingerprint (User-Agent) or None
+
+    Returns:
+        int or None: Id of the matching device
+    """
+    version, = get_versions(DEVICE_VERSION_KEY.format(user_id=user_id))
+    key = DECISION_KEY.format(
+        user_id=user_id, version=version, device_hash=_device_hash(ip_address, device_fingerprint)
+    )
+
+    cached = cache.get(key)
+    if cached is not None:
+        device_id, trusted_until = cached
+        if device_id is None or trusted_until > time.time():
+            return device_id
+
+    now = timezone.now()
+    devices = TrustedDevice.objects.filter(user_id=user_id, ip_address=ip_address, trusted_until__gt=now)
+    if device_fingerprint:
+        devices = devices.filter(device_fingerprint=device_fingerprint)
+    device = devices.order_by('-trusted_until').values_list('id', 'trusted_until').first()
+
+    if device is None:
+        cache.set(key, (None, 0), NEGATIVE_DECISION_TTL)
+        return None
+
+    device_id, trusted_until = device
+    max_age = DECISION_TTL if cache_is_shared() else LOCAL_DECISION_TTL
+    timeout = min(max_age, int((trusted_until - now).total_seconds()))
+    if timeout > 0:
+        cache.set(key, (device_id, trusted_until.timestamp()), timeout)
+    return device_id
+
+
+def is_device_trusted(user_id, ip_address, device_fingerprint=None):
+    """
+    Check whether a request comes from a trusted device of the user and note the use
+
+    Returns:
+        bool: True when 2FA verification can be skipped
+    """
+    device_id = find_trusted_device(user_id, ip_address, device_fingerprint)
+    if device_id is None:
+        return False
+    # last_used is written in batches, not on every request
+    record_device_use(device_id)
+    return True
+
+
+def invalidate_trusted_devices(user_id):
+    """Drop the cached trusted-device answers of a user (device added, renewed or removed)"""
+    bump_version(DEVICE_VERSION_KEY.format(user_id=user_id))
+
+
+def record_device_use(device_id):
+    """Remember that a trusted device was used now; written by the next flush"""
+    with _pending_lock:
+        _pending_last_used[device_id] = time.time()
+        due = time.monotonic() - _last_flush >= LAST_USED_FLUSH_INTERVAL
+    if due:
+        flush_device_usage()
+
+
+def flush_device_usage():
+    """
+    Write the collected last_used timestamps in one batch
+
+    Returns:
+        int: Number of updated devices
+    """
+    global _last_flush
+    with _pending_lock:
+        pending = dict(_pending_last_used)
+        _pending_last_used.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+
+    devices = list(TrustedDevice.objects.filter(id__in=pending).only('id'))
+    for device in devices:
+        device.last_used = datetime.fromtimestamp(pending[device.id], tz=dt_timezone.utc)
+    try:
+        # queryset.bulk_update() bypasses auto_now and signals, so the cached answers stay valid
+        TrustedDevice.objects.bulk_update(devices, ['last_used'])
+    except Exception as e:
+        logger.error(f"Error writing trusted device usage: {str(e)}")
+        return 0
+    logger.debug(f"Updated last_used of {len(devices)} trusted devices")
+    return len(devices)
+
+
+def _flush_at_exit():
+    try:
+        flush_device_usage()
+    except Exception:
+        # The database may already be gone at interpreter shutdown
+        pass
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,47 @@
+"""
+Version counters for cache invalidation.
+
+Cached entries embed the current version of what they were built from in their key;
+bumping the version makes every older entry unreachable. Versions start from the current
+time in milliseconds, so a version key lost from the cache never brings back an older entry.
+"""
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+import time
+
+
+def new_version():
+    """Starting value of a version counter (current time in milliseconds)"""
+    return int(time.time() * 1000)
+
+
+def get_versions(*keys):
+    """Current values of version keys (in order), initializing missing ones"""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = new_version()
+            # add() keeps a version set concurrently by another request
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def bump_version(key):
+    """Invalidate everything cached under the current version of key"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), None)
+
+
+def cache_is_shared():
+    """
+    Whether the default cache is shared by all worker processes
+
+    A LocMemCache lives in one process, so a version bumped there is not seen by the other
+    workers; callers then keep their entries for seconds instead of until invalidation.
+    """
+    return not isinstance(caches['default'], LocMemCache)
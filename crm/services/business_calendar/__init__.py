@@ -0,0 +1,20 @@
+"""
+Business calendar services package for the CRM application.
+
+This package provides working-time and business-day arithmetic based on the WorkHours
+configuration, Polish public holidays and the extra days off stored as Holiday rows.
+"""
+
+from .holidays import (
+    BusinessCalendar,
+    easter_sunday,
+    polish_public_holidays,
+)
+from .work_hours import (
+    WorkSchedule,
+    get_work_schedule,
+    get_business_calendar,
+    clear_work_schedule_cache,
+    work_minutes,
+    work_minutes_many,
+)
@@ -0,0 +1,209 @@
+"""
+Polish public holidays and business-day arithmetic.
+
+Public holidays are computed per year (fixed dates plus the ones that follow Easter) and
+combined with the extra days off stored as Holiday rows. A business day is a weekday with
+working hours in the WorkHours schedule that is not a holiday.
+
+BusinessCalendar precomputes, for a range of whole years, the number of business days and
+of working minutes lost to holidays before every day, plus the list of business days. Counting
+business days between two dates, moving by n business days and subtracting holidays from
+working time are then constant-time lookups. The range grows when a date outside it is used.
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+import threading
+
+# Fixed-date public holidays (month, day, name)
+FIXED_HOLIDAYS = (
+    (1, 1, 'Nowy Rok'),
+    (1, 6, 'Święto Trzech Króli'),
+    (5, 1, 'Święto Pracy'),
+    (5, 3, 'Święto Konstytucji 3 Maja'),
+    (8, 15, 'Wniebowzięcie Najświętszej Maryi Panny'),
+    (11, 1, 'Wszystkich Świętych'),
+    (11, 11, 'Narodowe Święto Niepodległości'),
+    (12, 25, 'Boże Narodzenie (pierwszy dzień)'),
+    (12, 26, 'Boże Narodzenie (drugi dzień)'),
+)
+
+# Christmas Eve is a public holiday from 2025
+CHRISTMAS_EVE_FROM = 2025
+
+# Public holidays relative to Easter Sunday (days, name)
+EASTER_HOLIDAYS = (
+    (0, 'Wielkanoc'),
+    (1, 'Poniedziałek Wielkanocny'),
+    (49, 'Zielone Świątki'),
+    (60, 'Boże Ciało'),
+)
+
+# Lost working minutes are counted from here; lookups are only compared with each other
+_ORIGIN = date(2001, 1, 1)
+
+
+def easter_sunday(year):
+    """Date of Easter Sunday in the Gregorian calendar (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def polish_public_holidays(year):
+    """
+    Polish public holidays (dni ustawowo wolne od pracy) of a year
+
+    Returns:
+        Mapping: date -> holiday name (read-only)
+    """
+    holidays = {date(year, month, day): name for month, day, name in FIXED_HOLIDAYS}
+    if year >= CHRISTMAS_EVE_FROM:
+        holidays[date(year, 12, 24)] = 'Wigilia Bożego Narodzenia'
+    easter = easter_sunday(year)
+    for offset, name in EASTER_HOLIDAYS:
+        holidays[easter + timedelta(days=offset)] = name
+    return MappingProxyType(dict(sorted(holidays.items())))
+
+
+class _Tables:
+    """Precomputed lookups for the days from start (inclusive) to end (exclusive)"""
+
+    def __init__(self, start, end, holiday_ordinals, day_minutes):
+        self.start = start.toordinal()
+        self.end = end.toordinal()
+        # business_before[i] / lost_before[i]: business days / working minutes lost to
+        # holidays in [start, start + i)
+        self.business_before = [0]
+        self.lost_before = [0]
+        self.business_days = []
+        weekday = start.weekday()
+        for ordinal in range(self.start, self.end):
+            minutes = day_minutes[weekday]
+            business = minutes > 0 and ordinal not in holiday_ordinals
+            if business:
+                self.business_days.append(ordinal)
+            self.business_before.append(self.business_before[-1] + business)
+            self.lost_before.append(self.lost_before[-1] + (minutes if ordinal in holiday_ordinals else 0))
+            weekday = (weekday + 1) % 7
+
+    def covers(self, ordinal):
+        return self.start <= ordinal < self.end
+
+
+class BusinessCalendar:
+    """
+    Business days of a weekly schedule, with public holidays and extra days off
+
+    Args:
+        day_minutes: Working minutes of each weekday, Monday first (0 - not a business day)
+        extra_holidays: {date: name} of days off in addition to the public holidays
+    """
+
+    def __init__(self, day_minutes, extra_holidays=None):
+        self.day_minutes = tuple(day_minutes)
+        self._extra_by_year = {}
+        for day, name in (extra_holidays or {}).items():
+            self._extra_by_year.setdefault(day.year, {})[day] = name
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def holidays(self, year):
+        """Days off of a year: public holidays and extra days off (date -> name)"""
+        holidays = dict(polish_public_holidays(year))
+        holidays.update(self._extra_by_year.get(year, {}))
+        return holidays
+
+    def _build(self, first_year, last_year):
+        holiday_ordinals = set()
+        for year in range(first_year, last_year + 1):
+            holiday_ordinals.update(day.toordinal() for day in self.holidays(year))
+        return _Tables(date(first_year, 1, 1), date(last_year + 1, 1, 1), holiday_ordinals, self.day_minutes)
+
+    def _tables_for(self, *ordinals):
+        """Tables covering the given day ordinals (and the origin), built or grown on demand"""
+        tables = self._tables
+        if tables is not None and all(tables.covers(ordinal) for ordinal in ordinals):
+            return tables
+
+        with self._lock:
+            tables = self._tables
+            years = [date.fromordinal(ordinal).year for ordinal in ordinals] + [_ORIGIN.year]
+            if tables is not None:
+                years += [date.fromordinal(tables.start).year, date.fromordinal(tables.end - 1).year]
+            else:
+                # Start with some room around today
+                years.append(date.today().year + 1)
+            if tables is None or not all(tables.covers(ordinal) for ordinal in ordinals):
+                tables = self._build(min(years), max(years))
+                self._tables = tables
+            return tables
+
+    def is_holiday(self, day):
+        """Whether a date is a public holiday or an extra day off"""
+        return day in polish_public_holidays(day.year) or day in self._extra_by_year.get(day.year, ())
+
+    def is_business_day(self, day):
+        """Whether a date is a working weekday that is not a holiday"""
+        return self.day_minutes[day.weekday()] > 0 and not self.is_holiday(day)
+
+    def business_days_between(self, start, end):
+        """
+        Number of business days from start (inclusive) to end (exclusive)
+
+        Negative when end is before start.
+        """
+        first, last = start.toordinal(), end.toordinal()
+        tables = self._tables_for(first, last)
+        return tables.business_before[last - tables.start] - tables.business_before[first - tables.start]
+
+    def add_business_days(self, day, count):
+        """
+        Move by a number of business days
+
+        Args:
+            day: Starting date (does not need to be a business day)
+            count: Business days forward (positive) or back (negative); 0 returns day
+
+        Returns:
+            date: The count-th business day after (before) day
+
+        Raises:
+            ValueError: When the schedule has no working weekday
+        """
+        if count == 0:
+            return day
+        if not any(self.day_minutes):
+            raise ValueError('The work schedule has no working days')
+
+        ordinal = day.toordinal()
+        # Enough calendar days for count business days even around a long holiday season
+        reach = abs(count) * 7 // sum(1 for minutes in self.day_minutes if minutes) + 31
+        while True:
+            target = ordinal + reach if count > 0 else ordinal - reach
+            tables = self._tables_for(ordinal, target)
+            offset = ordinal - tables.start
+            if count > 0:
+                # Business days up to and including day, then count more
+                position = tables.business_before[offset + 1] + count - 1
+            else:
+                position = tables.business_before[offset] + count
+            if 0 <= position < len(tables.business_days):
+                return date.fromordinal(tables.business_days[position])
+            reach *= 2
+
+    def lost_minutes_before(self, day):
+        """Working minutes taken by holidays between a fixed origin and day (for differences)"""
+        ordinal = day.toordinal()
+        tables = self._tables_for(ordinal)
+        return tables.lost_before[ordinal - tables.start] - tables.lost_before[_ORIGIN.toordinal() - tables.start]
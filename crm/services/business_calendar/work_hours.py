@@ -0,0 +1,186 @@
+"""
+Working-time arithmetic based on the WorkHours configuration.
+
+The weekly schedule is turned into a cumulative function: the number of working minutes
+between a fixed Monday and a given moment. Working time between two moments is then the
+difference of two lookups, so its cost does not depend on the length of the range.
+
+Work hours are wall-clock times in settings.TIME_ZONE, so aware datetimes are converted to
+local time first. DST changes happen at night, outside working hours, so wall-clock
+minutes within working periods are real minutes.
+
+Holidays (see holidays.py) have no working time: the minutes a holiday would have had are
+subtracted with another constant-time lookup in the schedule's BusinessCalendar.
+"""
+
+from datetime import date, time
+from django.utils import timezone
+import logging
+import threading
+import time as monotonic_time
+
+from ...models import WorkHours, Holiday
+from .holidays import BusinessCalendar
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Used when no WorkHours are configured: Monday to Friday, 8:00-16:00
+DEFAULT_WORK_PERIODS = {day: [(time(8, 0), time(16, 0))] for day in range(5)}
+
+# Any Monday works as the origin of the cumulative function
+_EPOCH = date(2001, 1, 1)
+
+MINUTES_PER_DAY = 24 * 60
+
+# Other processes do not see the invalidation signal, so they reload after this many seconds
+SCHEDULE_MAX_AGE = 300
+
+_schedule = None
+_schedule_loaded_at = 0.0
+_schedule_lock = threading.Lock()
+
+
+def _minute_of_day(value):
+    """Minutes (with fraction) since midnight of a time or datetime"""
+    return value.hour * 60 + value.minute + value.second / 60 + value.microsecond / 60_000_000
+
+
+def _local(value):
+    """Naive local wall-clock datetime for a (possibly aware) datetime"""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.replace(tzinfo=None)
+
+
+def _merge(periods):
+    """Sort periods and merge overlapping ones, so overlapping WorkHours rows count once"""
+    merged = []
+    for start, end in sorted(periods):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return tuple((start, end) for start, end in merged)
+
+
+class WorkSchedule:
+    """
+    Weekly working-time pattern
+
+    Args:
+        periods_by_day: {weekday: [(start_time, end_time), ...]}, weekday 0 = Monday
+        holidays: {date: name} of days off besides the public holidays
+    """
+
+    def __init__(self, periods_by_day, holidays=None):
+        self.periods = tuple(
+            _merge((_minute_of_day(start), _minute_of_day(end)) for start, end in periods_by_day.get(day, ()))
+            for day in range(7)
+        )
+        self.day_minutes = tuple(sum(end - start for start, end in periods) for periods in self.periods)
+        self.week_minutes = sum(self.day_minutes)
+
+        # Working minutes from Monday 00:00 to the start of each weekday
+        self.day_offsets = [0]
+        for minutes in self.day_minutes:
+            self.day_offsets.append(self.day_offsets[-1] + minutes)
+
+        self.calendar = BusinessCalendar(self.day_minutes, holidays)
+
+    @classmethod
+    def from_work_hours(cls, work_hours, holidays=None):
+        """Build the schedule from WorkHours rows (default schedule when there are none)"""
+        periods_by_day = {}
+        has_rows = False
+        for wh in work_hours:
+            has_rows = True
+            if wh.is_working_day:
+                periods_by_day.setdefault(wh.day_of_week, []).append((wh.start_time, wh.end_time))
+
+        return cls(periods_by_day if has_rows else DEFAULT_WORK_PERIODS, holidays)
+
+    def minutes_into_day(self, weekday, minute):
+        """Working minutes from midnight to minute of the given weekday"""
+        total = 0
+        for start, end in self.periods[weekday]:
+            if minute <= start:
+                break
+            total += min(end, minute) - start
+        return total
+
+    def cumulative_minutes(self, moment):
+        """Working minutes from the epoch Monday to a naive local datetime"""
+        day = moment.date()
+        weeks, weekday = divmod((day - _EPOCH).days, 7)
+        into_day = 0 if self.calendar.is_holiday(day) else self.minutes_into_day(weekday, _minute_of_day(moment))
+        return (
+            weeks * self.week_minutes
+            + self.day_offsets[weekday]
+            + into_day
+            - self.calendar.lost_minutes_before(day)
+        )
+
+    def work_minutes(self, start_time, end_time):
+        """Working minutes between two datetimes (0 when end is not after start)"""
+        if end_time <= start_time:
+            return 0
+        return self.cumulative_minutes(_local(end_time)) - self.cumulative_minutes(_local(start_time))
+
+    def work_minutes_many(self, ranges):
+        """Working minutes for each (start, end) pair; end may be None (counted as 0)"""
+        return [
+            self.work_minutes(start_time, end_time) if start_time and end_time else 0
+            for start_time, end_time in ranges
+        ]
+
+
+def get_work_schedule():
+    """
+    Schedule built from WorkHours and Holiday rows, loaded once per process
+
+    The cache is cleared by the WorkHours and Holiday save/delete signals and expires after
+    SCHEDULE_MAX_AGE seconds for changes made by other processes.
+    """
+    global _schedule, _schedule_loaded_at
+    with _schedule_lock:
+        if _schedule is None or monotonic_time.monotonic() - _schedule_loaded_at > SCHEDULE_MAX_AGE:
+            _schedule = WorkSchedule.from_work_hours(
+                WorkHours.objects.all(),
+                holidays=dict(Holiday.objects.values_list('date', 'name')),
+            )
+            _schedule_loaded_at = monotonic_time.monotonic()
+            logger.debug(f"Loaded work schedule: {_schedule.week_minutes} working minutes per week")
+        return _schedule
+
+
+def clear_work_schedule_cache():
+    """Forget the cached schedule (next use reloads WorkHours and holidays)"""
+    global _schedule
+    with _schedule_lock:
+        _schedule = None
+
+
+def get_business_calendar():
+    """Business days of the current schedule (holidays included), cached with it"""
+    return get_work_schedule().calendar
+
+
+def work_minutes(start_time, end_time):
+    """Working minutes between two datetimes according to WorkHours"""
+    return get_work_schedule().work_minutes(start_time, end_time)
+
+
+def work_minutes_many(ranges):
+    """
+    Working minutes for many (start, end) pairs with a single schedule lookup
+
+    Args:
+        ranges: Iterable of (start_time, end_time) pairs
+
+    Returns:
+        list: Working minutes in the same order
+    """
+    return get_work_schedule().work_minutes_many(ranges)
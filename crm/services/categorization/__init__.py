@@ -0,0 +1,15 @@
+"""
+Categorization services package for the CRM application.
+
+This package provides a naive Bayes category classifier trained on existing tickets,
+used for category suggestions when a trained model file is available.
+"""
+
+from .features import text_features
+from .model import (
+    CategoryModel,
+    get_category_model,
+    model_path,
+    predict_category,
+    reset_category_model,
+)
@@ -0,0 +1,49 @@
+"""
+Ticket text features for the category classifier.
+
+Words are folded like the search index (lowercase, no diacritics) and turned into unigram
+and bigram features; title words get an extra feature of their own, because the title
+usually names the problem. Features are hashed into a fixed number of buckets with CRC32,
+which is stable between processes (unlike hash()), so the model file stores bucket
+numbers instead of a vocabulary.
+"""
+
+import re
+import zlib
+
+from ..search.text import fold
+
+_WORD_RE = re.compile(r'[^\W\d_]{2,}')
+
+# Default number of hash buckets (a power of two)
+DEFAULT_BUCKETS = 2 ** 18
+
+
+def words(text):
+    """Folded words of at least two letters (digits and punctuation are dropped)"""
+    return _WORD_RE.findall(fold(text))
+
+
+def text_features(title, description):
+    """
+    Features of a ticket, each counted once
+
+    Args:
+        title: Ticket title
+        description: Ticket description
+
+    Returns:
+        set: Feature strings ('w:<word>', 'b:<word> <word>', 't:<title word>')
+    """
+    title_words = words(title)
+    all_words = title_words + words(description)
+
+    features = {f't:{word}' for word in title_words}
+    features.update(f'w:{word}' for word in all_words)
+    features.update(f'b:{first} {second}' for first, second in zip(all_words, all_words[1:]))
+    return features
+
+
+def hash_feature(feature, buckets):
+    """Bucket of a feature"""
+    return zlib.crc32(feature.encode('utf-8')) & (buckets - 1)
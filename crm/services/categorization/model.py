@@ -0,0 +1,267 @@
+"""
+Naive Bayes ticket category classifier.
+
+A multinomial naive Bayes model over hashed text features (see features.py), trained by
+the train_category_model command from existing tickets and stored as a gzipped JSON file
+at CATEGORY_MODEL_PATH. Each process loads the file on the first prediction and keeps the
+model in memory; after retraining, the command reloads it in its own process and other
+processes pick it up on restart.
+
+When there is no model file, or a ticket has (almost) no feature the model has seen,
+predictions return None and category_suggestion falls back to the keyword heuristic.
+"""
+
+from django.conf import settings
+import gzip
+import json
+import logging
+import math
+import os
+import threading
+
+from .features import DEFAULT_BUCKETS, hash_feature, text_features, words
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+MODEL_FORMAT = 1
+
+# Words shown as the reason of a suggestion
+MAX_EVIDENCE_WORDS = 5
+
+# Fewer known features are not enough to predict (a single one may be a hash collision)
+MIN_KNOWN_FEATURES = 2
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+class CategoryModel:
+    """
+    Trained classifier
+
+    Per category the model keeps the number of training tickets and how many of them had
+    each feature bucket; log probabilities are derived once when the model is created.
+    """
+
+    def __init__(self, categories, buckets=DEFAULT_BUCKETS, alpha=1.0):
+        """
+        Args:
+            categories: dict category -> {'documents': int, 'total': int, 'counts': {bucket: int}}
+            buckets: Number of hash buckets used for the features
+            alpha: Additive (Laplace) smoothing
+        """
+        self.categories = categories
+        self.buckets = buckets
+        self.alpha = alpha
+
+        documents = sum(data['documents'] for data in categories.values())
+        self._log_prior = {}
+        self._log_unseen = {}
+        self._log_likelihood = {}
+        for category, data in categories.items():
+            denominator = data['total'] + alpha * buckets
+            self._log_prior[category] = math.log(data['documents'] / documents)
+            self._log_unseen[category] = math.log(alpha / denominator)
+            self._log_likelihood[category] = {
+                bucket: math.log((count + alpha) / denominator) for bucket, count in data['counts'].items()
+            }
+
+    @classmethod
+    def train(cls, samples, buckets=DEFAULT_BUCKETS, alpha=1.0):
+        """
+        Train a model
+
+        Args:
+            samples: Iterable of (title, description, category)
+            buckets: Number of hash buckets (a power of two)
+            alpha: Additive smoothing
+
+        Returns:
+            CategoryModel
+
+        Raises:
+            ValueError: When there are no samples
+        """
+        categories = {}
+        for title, description, category in samples:
+            data = categories.setdefault(category, {'documents': 0, 'total': 0, 'counts': {}})
+            data['documents'] += 1
+            counts = data['counts']
+            for bucket in {hash_feature(feature, buckets) for feature in text_features(title, description)}:
+                counts[bucket] = counts.get(bucket, 0) + 1
+                data['total'] += 1
+
+        if not categories:
+            raise ValueError('No tickets to train the category model on')
+        return cls(categories, buckets=buckets, alpha=alpha)
+
+    def _buckets(self, title, description):
+        """Hash buckets of a ticket that occurred in the training data"""
+        buckets = {hash_feature(feature, self.buckets) for feature in text_features(title, description)}
+        return [bucket for bucket in buckets if any(bucket in table for table in self._log_likelihood.values())]
+
+    def scores(self, title, description):
+        """
+        Posterior probability of every category
+
+        Returns:
+            dict or None: category -> probability, None when the ticket has fewer than
+                          MIN_KNOWN_FEATURES features the model has seen
+        """
+        buckets = self._buckets(title, description)
+        if len(buckets) < MIN_KNOWN_FEATURES:
+            return None
+
+        log_scores = {}
+        for category, table in self._log_likelihood.items():
+            unseen = self._log_unseen[category]
+            log_scores[category] = self._log_prior[category] + sum(table.get(bucket, unseen) for bucket in buckets)
+
+        best = max(log_scores.values())
+        weights = {category: math.exp(score - best) for category, score in log_scores.items()}
+        total = sum(weights.values())
+        return {category: weight / total for category, weight in weights.items()}
+
+    def predict(self, title, description):
+        """
+        Most likely category of a ticket
+
+        Returns:
+            tuple or None: (category, confidence), None when too few features of the ticket are known
+        """
+        scores = self.scores(title, description)
+        if scores is None:
+            return None
+        category = max(scores, key=scores.get)
+        return category, scores[category]
+
+    def evidence(self, title, description, category, limit=MAX_EVIDENCE_WORDS):
+        """
+        Words of the ticket that speak most for a category
+
+        Returns:
+            list: (word, log-likelihood margin over the next best category), strongest first
+        """
+        table = self._log_likelihood[category]
+        others = [(self._log_likelihood[other], self._log_unseen[other]) for other in self._log_likelihood if other != category]
+        found = {}
+        # Text order, so equally strong words are listed the same way in every process
+        for word in words(title) + words(description):
+            if word in found:
+                continue
+            bucket = hash_feature(f'w:{word}', self.buckets)
+            if bucket not in table:
+                continue
+            margin = table[bucket] - max((other.get(bucket, unseen) for other, unseen in others), default=0)
+            if margin > 0:
+                found[word] = margin
+        strongest = sorted(found.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(word, round(margin, 2)) for word, margin in strongest if round(margin, 2) > 0]
+
+    def to_dict(self):
+        return {
+            'format': MODEL_FORMAT,
+            'buckets': self.buckets,
+            'alpha': self.alpha,
+            'categories': {
+                category: {
+                    'documents': data['documents'],
+                    'total': data['total'],
+                    # JSON object keys are strings
+                    'counts': {str(bucket): count for bucket, count in data['counts'].items()},
+                }
+                for category, data in self.categories.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('format') != MODEL_FORMAT:
+            raise ValueError(f"Unsupported category model format: {data.get('format')}")
+        categories = {
+            category: {
+                'documents': values['documents'],
+                'total': values['total'],
+                'counts': {int(bucket): count for bucket, count in values['counts'].items()},
+            }
+            for category, values in data['categories'].items()
+        }
+        return cls(categories, buckets=data['buckets'], alpha=data['alpha'])
+
+    def save(self, path):
+        """Write the model file (replaced atomically)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f'{path}.tmp'
+        with gzip.open(temporary, 'wt', encoding='utf-8') as handle:
+            json.dump(self.to_dict(), handle, separators=(',', ':'))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            return cls.from_dict(json.load(handle))
+
+
+def model_path():
+    """Location of the model file"""
+    return settings.CATEGORY_MODEL_PATH
+
+
+def get_category_model():
+    """
+    The trained model, loaded once per process
+
+    Returns:
+        CategoryModel or None: None when no model file exists or it cannot be read
+    """
+    global _model, _model_loaded
+    if _model_loaded:
+        return _model
+
+    with _model_lock:
+        if not _model_loaded:
+            path = model_path()
+            if os.path.exists(path):
+                try:
+                    _model = CategoryModel.load(path)
+                    logger.info(f"Loaded category model from {path}")
+                except Exception as e:
+                    logger.error(f"Cannot load category model from {path}: {e}")
+                    _model = None
+            _model_loaded = True
+    return _model
+
+
+def reset_category_model():
+    """Forget the loaded model; the next prediction reads the file again"""
+    global _model, _model_loaded
+    with _model_lock:
+        _model = None
+        _model_loaded = False
+
+
+def predict_category(title, description):
+    """
+    Suggest a category with the trained model
+
+    Returns:
+        tuple or None: (category, confidence, match_details) in the format of
+                       category_suggestion.detect_category, or None when there is no model or
+                       it knows nothing about the text
+    """
+    model = get_category_model()
+    if model is None:
+        return None
+
+    prediction = model.predict(title, description)
+    if prediction is None:
+        return None
+
+    category, confidence = prediction
+    match_details = {name: [] for name in model.categories}
+    match_details[category] = model.evidence(title, description, category)
+    return category, confidence, match_details
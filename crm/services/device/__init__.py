@@ -0,0 +1,13 @@
+"""
+Device services package for the CRM application.
+
+This package classifies the client device (mobile, tablet or desktop) from the User-Agent
+header, once per distinct header, for the context processors, template tags and views.
+"""
+
+from .classification import (
+    DeviceInfo,
+    classify_user_agent,
+    get_device,
+    lazy_device,
+)
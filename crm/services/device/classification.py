@@ -0,0 +1,168 @@
+"""
+User-Agent based device classification.
+
+The pattern lists are compiled once at import. Results are memoized per User-Agent string
+in a bounded LRU cache - a handful of browsers make up almost all traffic - and kept on
+the request as request.device (set lazily by DeviceDetectionMiddleware).
+"""
+
+from dataclasses import dataclass
+from django.utils.functional import SimpleLazyObject
+from functools import lru_cache
+import re
+
+# Distinct User-Agent strings remembered
+CACHE_SIZE = 1024
+
+# Desktop patterns (check first to exclude false positives)
+DESKTOP_PATTERNS = [
+    r'Windows NT.*WOW64',      # Windows 64-bit
+    r'Windows NT.*Win64',      # Windows 64-bit
+    r'Macintosh.*Intel',       # Intel Mac
+    r'X11.*Linux.*x86_64',     # Linux 64-bit
+    r'X11.*Linux.*i686',       # Linux 32-bit
+]
+
+# Tablet specific patterns (check before mobile as tablets may contain "Mobile")
+TABLET_PATTERNS = [
+    r'iPad',                           # iPad
+    r'Android(?!.*Mobile).*Tablet',    # Android tablets explicitly
+    r'Android.*SM-T\d+',              # Samsung Galaxy Tab series (SM-T...)
+    r'Android.*SM-P\d+',              # Samsung Galaxy Note Tab series (SM-P...)
+    r'Kindle',                         # Kindle tablets
+    r'Silk',                          # Amazon Silk browser
+    r'PlayBook',                      # BlackBerry PlayBook
+    r'Windows.*Touch.*Tablet',        # Windows tablets
+    # Large screen Android devices that are likely tablets (exclude phones and Opera Mini)
+    r'Android(?!.*Mobile)(?!.*Opera Mini).*; (?!SM-)',  # Android tablets (non-phone form factor, excluding Opera Mini)
+]
+
+# Mobile device patterns - comprehensive list for all major browsers
+MOBILE_PATTERNS = [
+    # iPhone/iOS devices
+    r'iPhone',
+    r'iPod',
+
+    # Android mobile devices (must contain "Mobile")
+    r'Android.*Mobile',
+    r'Android.*SM-[AEGJN]',    # Samsung Galaxy phones (A, E, G, J, N series)
+    r'Android.*GT-[IPN]',      # Samsung Galaxy phones (older series)
+    r'Android.*SAMSUNG-SM-',   # Samsung phones
+
+    # Mobile browsers specifically
+    r'Mobile.*Safari',         # Mobile Safari
+    r'Mobile.*Chrome',         # Chrome Mobile
+    r'Mobile.*Firefox',        # Firefox Mobile
+    r'Mobile.*Opera',          # Opera Mobile
+    r'Mobile.*Edge',           # Edge Mobile
+    r'Mobile.*SamsungBrowser', # Samsung Internet
+
+    # Other mobile indicators
+    r'Mobile(?!.*Tablet)',     # Generic mobile (not tablet)
+    r'Phone',                  # Generic phone indicator
+    r'BlackBerry',             # BlackBerry devices
+    r'BB10',                   # BlackBerry 10
+    r'Windows Phone',          # Windows Phone
+    r'Windows.*Mobile',        # Windows Mobile
+    r'IEMobile',              # Internet Explorer Mobile
+    r'Opera Mini',            # Opera Mini (always mobile)
+    r'Opera Mobi',            # Opera Mobile
+    r'webOS',                 # webOS devices
+    r'Palm',                  # Palm devices
+    r'Symbian',               # Symbian OS
+
+    # Additional mobile browser patterns
+    r'CriOS',                 # Chrome on iOS
+    r'FxiOS',                 # Firefox on iOS
+    r'OPiOS',                 # Opera on iOS
+    r'EdgiOS',                # Edge on iOS
+    r'YaBrowser.*Mobile',     # Yandex Mobile
+    r'UCBrowser.*Mobile',     # UC Browser Mobile
+    r'SamsungBrowser.*Mobile', # Samsung Internet Mobile
+
+    # Feature phones and older devices
+    r'MIDP',                  # Mobile Information Device Profile
+    r'WML',                   # Wireless Markup Language
+    r'NetFront',              # NetFront browser
+    r'UP\.Browser',           # UP.Browser
+    r'UP\.Link',              # UP.Link
+    r'Mmp',                   # Mobile Multimedia Platform
+    r'PocketPC',              # Pocket PC
+    r'Smartphone',            # Generic smartphone
+    r'Cellphone',             # Generic cellphone
+]
+
+# Words that make the list views use short pages (phones and tablets, including Android
+# tablets the patterns above classify as desktop)
+HANDHELD_WORDS = ['mobile', 'android', 'iphone', 'ipad', 'tablet']
+
+DESKTOP_RE = re.compile('|'.join(DESKTOP_PATTERNS), re.IGNORECASE)
+TABLET_RE = re.compile('|'.join(TABLET_PATTERNS), re.IGNORECASE)
+MOBILE_RE = re.compile('|'.join(MOBILE_PATTERNS), re.IGNORECASE)
+HANDHELD_RE = re.compile('|'.join(HANDHELD_WORDS), re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class DeviceInfo:
+    """Kind of device a request comes from"""
+
+    is_mobile: bool = False
+    is_tablet: bool = False
+    # Phone or tablet (classified as one, or with one of HANDHELD_WORDS) - views show shorter pages on these
+    is_handheld: bool = False
+
+    @property
+    def is_desktop(self):
+        return not (self.is_mobile or self.is_tablet)
+
+    @property
+    def device_type(self):
+        if self.is_mobile:
+            return 'mobile'
+        if self.is_tablet:
+            return 'tablet'
+        return 'desktop'
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def classify_user_agent(user_agent):
+    """
+    Classify a User-Agent string
+
+    Args:
+        user_agent: Value of the User-Agent header ('' when missing)
+
+    Returns:
+        DeviceInfo
+    """
+    is_handheld = bool(HANDHELD_RE.search(user_agent))
+
+    # Explicit desktop platforms skip mobile/tablet detection
+    if DESKTOP_RE.search(user_agent):
+        return DeviceInfo(is_handheld=is_handheld)
+
+    # Check for tablet first, then mobile (tablets may contain "Mobile")
+    if TABLET_RE.search(user_agent):
+        return DeviceInfo(is_tablet=True, is_handheld=True)
+
+    is_mobile = bool(MOBILE_RE.search(user_agent))
+    return DeviceInfo(is_mobile=is_mobile, is_handheld=is_handheld or is_mobile)
+
+
+def get_device(request):
+    """
+    Device of a request
+
+    Uses request.device when DeviceDetectionMiddleware has set it, so the header is
+    classified at most once per request.
+    """
+    device = getattr(request, 'device', None)
+    if device is None:
+        device = classify_user_agent(request.META.get('HTTP_USER_AGENT', ''))
+        request.device = device
+    return device
+
+
+def lazy_device(request):
+    """request.device value computed on first access"""
+    return SimpleLazyObject(lambda: classify_user_agent(request.META.get('HTTP_USER_AGENT', '')))
@@ -2,9 +2,11 @@
 Core email functionality for the CRM application.
 
 This module contains basic email sending capabilities used by other specialized modules.
+The SMTP timeout comes from settings.EMAIL_TIMEOUT through the mail backend, so sending
+never changes the process-wide socket timeout.
 """
 
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
 import logging
 import socket
@@ -13,6 +15,75 @@ import smtplib
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Errors after which the SMTP session is reopened and the message tried once more
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+
+
+def _reopen(connection):
+    """Drop a broken SMTP session and open a new one"""
+    try:
+        connection.close()
+    except Exception:
+        pass
+    connection.open()
+
+
+def send_messages_batch(messages, connection=None):
+    """
+    Send already rendered messages over a single mail connection
+
+    The connection (one SMTP/TLS session) is opened once for the whole batch. When the
+    server drops it, the connection is reopened and the message is tried once more;
+    other failures only affect their own message.
+
+    Args:
+        messages: EmailMessage / EmailMultiAlternatives instances
+        connection: Open mail backend to reuse (default: a new get_connection())
+
+    Returns:
+        list: One (sent, error) tuple per message, in order - error is None when sent
+    """
+    results = []
+    if not messages:
+        return results
+
+    own_connection = connection is None
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not open mail connection for {len(messages)} message(s): {str(e)}")
+        return [(False, str(e)) for _ in messages]
+
+    try:
+        for msg in messages:
+            try:
+                try:
+                    connection.send_messages([msg])
+                except CONNECTION_ERRORS as e:
+                    logger.warning(f"Mail connection lost ({str(e)}), reconnecting")
+                    _reopen(connection)
+                    connection.send_messages([msg])
+                results.append((True, None))
+            except Exception as e:
+                logger.error(f"Failed to send email '{msg.subject}' to {', '.join(msg.to)}: {str(e)}")
+                results.append((False, str(e)))
+                if isinstance(e, CONNECTION_ERRORS):
+                    # Start the next message on a fresh session
+                    try:
+                        _reopen(connection)
+                    except Exception as reconnect_error:
+                        logger.error(f"Could not reopen mail connection: {str(reconnect_error)}")
+                        results.extend((False, str(reconnect_error)) for _ in messages[len(results):])
+                        break
+    finally:
+        if own_connection:
+            connection.close()
+
+    logger.info(f"Sent {sum(1 for sent, _ in results if sent)} of {len(messages)} email(s) in one connection")
+    return results
+
+
 def send_email(subject, recipient, text_content, html_content):
     """
     Central method for sending all emails with consistent formatting
@@ -29,10 +100,6 @@ def send_email(subject, recipient, text_content, html_content):
     try:
         logger.debug(f"Preparing to send email '{subject}' to {recipient}")
         
-        # Set socket timeout to avoid hanging on SMTP connections
-        default_timeout = socket.getdefaulttimeout()
-        socket.setdefaulttimeout(settings.EMAIL_TIMEOUT)
-        
         # Create more robust email message with headers to improve deliverability
         msg = EmailMultiAlternatives(
             subject=subject,
@@ -59,9 +126,6 @@ def send_email(subject, recipient, text_content, html_content):
         # Attempt to send with detailed error logging
         msg.send(fail_silently=False)
         
-        # Reset socket timeout
-        socket.setdefaulttimeout(default_timeout)
-        
         logger.info(f"Email '{subject}' sent to {recipient}")
         return True
     except smtplib.SMTPException as smtp_error:
@@ -0,0 +1,159 @@
+"""
+Grouping of ticket notifications.
+
+A ticket edited, commented on and reassigned within a minute used to send three emails to
+every stakeholder. Now a notification waits in the outbox for the recipient's grouping
+window (EmailNotificationSettings.notification_window, default
+settings.TICKET_NOTIFICATION_WINDOW minutes), and later events for the same ticket are
+merged into it. Users who opt in to the daily digest get one message a day
+(settings.TICKET_DIGEST_HOUR) covering all their tickets.
+
+Merged messages are rendered with the emails/ticket_digest templates.
+"""
+
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import logging
+
+from ...models import Ticket
+from .ticket import get_notification_settings, get_ticket_url
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# notification_type of daily digest messages (they are not tied to one ticket)
+DIGEST_TYPE = 'digest'
+
+EVENT_LABELS = {
+    'created': 'Nowe zgłoszenie',
+    'assigned': 'Przypisanie zgłoszenia',
+    'status_changed': 'Zmiana statusu',
+    'commented': 'Nowy komentarz',
+    'updated': 'Aktualizacja zgłoszenia',
+    'closed': 'Zamknięcie zgłoszenia',
+    'reopened': 'Ponowne otwarcie',
+    'resolved': 'Rozwiązanie zgłoszenia',
+}
+
+
+def make_event(notification_type, ticket, context, at):
+    """Event as stored in OutboundEmail.extra_events"""
+    return {
+        'type': notification_type,
+        'ticket_id': ticket.id,
+        'context': context,
+        'at': at.isoformat(),
+    }
+
+
+def message_events(message):
+    """All events of an outbox message, oldest first"""
+    if message.notification_type == DIGEST_TYPE:
+        return list(message.extra_events)
+    first = make_event(message.notification_type, message.ticket, message.context, message.created_at)
+    return [first, *message.extra_events]
+
+
+def next_digest_time(now):
+    """Next daily digest send time (TICKET_DIGEST_HOUR, local time)"""
+    local_now = timezone.localtime(now)
+    send_at = timezone.make_aware(
+        datetime.combine(local_now.date(), time(hour=settings.TICKET_DIGEST_HOUR)),
+        timezone.get_current_timezone()
+    )
+    if send_at <= local_now:
+        send_at += timedelta(days=1)
+    return send_at
+
+
+def delivery_time(preferences, now):
+    """
+    When a new notification for a user should be sent
+
+    Args:
+        preferences: User's EmailNotificationSettings or None
+        now: Current time
+
+    Returns:
+        tuple: (send_at, daily) - daily is True for the daily digest
+    """
+    if preferences is not None and preferences.daily_digest:
+        return next_digest_time(now), True
+
+    window = settings.TICKET_NOTIFICATION_WINDOW
+    if preferences is not None and preferences.notification_window is not None:
+        window = preferences.notification_window
+    return now + timedelta(minutes=window), False
+
+
+def wants_notification(preferences, notification_type):
+    """Check the user's notify_ticket_<type> preference (missing settings - send)"""
+    if preferences is None:
+        return True
+    return getattr(preferences, f'notify_ticket_{notification_type}', True)
+
+
+def build_ticket_digest(user, events):
+    """
+    Render one message covering several ticket events
+
+    Args:
+        user: Recipient
+        events: Events from message_events()
+
+    Returns:
+        EmailMultiAlternatives or None: None when nothing is left to send (notification types
+        disabled by the user, tickets deleted, no email address)
+    """
+    if not user.email:
+        return None
+
+    preferences = get_notification_settings(user)
+    events = [event for event in events if wants_notification(preferences, event['type'])]
+    tickets = Ticket.objects.select_related('organization').in_bulk({event['ticket_id'] for event in events})
+
+    groups = {}
+    for event in events:
+        ticket = tickets.get(event['ticket_id'])
+        if ticket is None:
+            continue
+        group = groups.setdefault(ticket.id, {
+            'ticket': ticket,
+            'ticket_url': get_ticket_url(ticket),
+            'events': [],
+        })
+        group['events'].append({
+            'label': EVENT_LABELS.get(event['type'], event['type']),
+            'at': parse_datetime(event['at']),
+            **event['context'],
+        })
+    if not groups:
+        return None
+
+    groups = list(groups.values())
+    event_count = sum(len(group['events']) for group in groups)
+    if len(groups) == 1:
+        ticket = groups[0]['ticket']
+        subject = f"Zmiany w zgłoszeniu #{ticket.id}: {ticket.title} ({event_count})"
+    else:
+        subject = f"Podsumowanie zmian w zgłoszeniach: {len(groups)} zgłoszeń, {event_count} zmian"
+
+    context = {
+        'user': user,
+        'groups': groups,
+        'event_count': event_count,
+        'site_name': 'System Helpdesk',
+    }
+    msg = EmailMultiAlternatives(
+        subject=subject,
+        body=render_to_string('emails/ticket_digest.txt', context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email]
+    )
+    msg.attach_alternative(render_to_string('emails/ticket_digest.html', context), "text/html")
+    logger.debug(f"Rendered digest of {event_count} events for {user.username}")
+    return msg
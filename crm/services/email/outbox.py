@@ -0,0 +1,453 @@
+"""
+Database-backed outbox for ticket notification emails.
+
+notify_ticket_stakeholders stores one OutboundEmail row per recipient instead of sending
+from a request thread, so queued notifications survive process restarts. Messages first
+wait out the recipient's grouping window (see digest.py). Workers (the process_email_outbox
+command, the scheduler job and a single per-process thread woken after each commit) claim
+due rows in batches, render them and send each batch over one mail connection:
+
+- claiming locks the rows (SELECT ... FOR UPDATE SKIP LOCKED where the database supports
+  it) and marks them 'sending', so several workers never send the same message
+- each recipient domain gets at most EMAIL_OUTBOX_DOMAIN_RATE messages per minute; rows
+  over the limit stay queued for a later batch
+- failed sends are retried after EMAIL_OUTBOX_RETRY_DELAY seconds, doubled after every
+  attempt, until EMAIL_OUTBOX_MAX_ATTEMPTS
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+import json
+import logging
+import os
+import random
+import socket
+import threading
+
+from ...models import EmailNotificationSettings, OutboundEmail
+from .core import send_messages_batch
+from .digest import DIGEST_TYPE, build_ticket_digest, delivery_time, make_event, message_events
+from .ticket import build_ticket_notification, render_ticket_notification
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Sliding window of the per-domain rate limit
+RATE_WINDOW = timedelta(minutes=1)
+
+# Rows left in 'sending' this long were claimed by a worker that died
+STALE_CLAIM_AGE = timedelta(minutes=10)
+
+# Longest delay between two attempts
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+# Candidates read per free slot of the batch (domains at their limit are excluded in the query)
+CANDIDATES_PER_SLOT = 3
+
+_executor = None
+_executor_lock = threading.Lock()
+_wakeup_pending = False
+
+
+def _worker_name():
+    """Host, process and thread of the calling worker (stored on claimed rows)"""
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'[-64:]
+
+
+def _domain(email):
+    return email.rsplit('@', 1)[-1].lower()
+
+
+def _domain_limit(domain):
+    """Messages per RATE_WINDOW allowed for a recipient domain"""
+    return getattr(settings, 'EMAIL_OUTBOX_DOMAIN_RATES', {}).get(domain, settings.EMAIL_OUTBOX_DOMAIN_RATE)
+
+
+def _json_context(context):
+    """Template context as stored in the outbox (values JSON cannot hold become strings)"""
+    return json.loads(json.dumps(context, cls=DjangoJSONEncoder, default=str))
+
+
+def enqueue_ticket_notifications(notification_type, ticket, recipients, recipient_settings=None, **context):
+    """
+    Queue a ticket notification for several recipients
+
+    For recipients who already have a message about this ticket waiting out their grouping
+    window (or a daily digest waiting), the event is merged into that message.
+
+    Args:
+        notification_type: Type of notification (created, updated, commented, etc.)
+        ticket: Ticket the notification is about
+        recipients: Users to notify (users without an email address are skipped)
+        recipient_settings: Dict of user id -> EmailNotificationSettings when already loaded
+        **context: Additional context data for the email template
+
+    Returns:
+        int: Number of recipients the notification was queued for
+    """
+    return enqueue_ticket_notifications_bulk(
+        notification_type, [(ticket, recipients)], recipient_settings=recipient_settings, **context
+    )
+
+
+def enqueue_ticket_notifications_bulk(notification_type, recipients_by_ticket, recipient_settings=None, **context):
+    """
+    Queue the same kind of notification about many tickets at once
+
+    Same as enqueue_ticket_notifications for every ticket, with one query for the waiting
+    messages and one bulk insert. A recipient's events of several tickets all join the
+    same daily digest.
+
+    Args:
+        notification_type: Type of notification (created, updated, commented, etc.)
+        recipients_by_ticket: List of (ticket, users to notify)
+        recipient_settings: Dict of user id -> EmailNotificationSettings when already loaded
+        **context: Additional context data for the email template (shared by all tickets)
+
+    Returns:
+        int: Number of notifications queued
+    """
+    recipients_by_ticket = [
+        (ticket, [user for user in recipients if user.email]) for ticket, recipients in recipients_by_ticket
+    ]
+    recipients_by_ticket = [(ticket, recipients) for ticket, recipients in recipients_by_ticket if recipients]
+    if not recipients_by_ticket:
+        return 0
+
+    context = _json_context(context)
+    now = timezone.now()
+    user_ids = {user.id for _, recipients in recipients_by_ticket for user in recipients}
+    preferences = recipient_settings
+    if preferences is None:
+        preferences = {
+            preference.user_id: preference
+            for preference in EmailNotificationSettings.objects.filter(user_id__in=user_ids)
+        }
+
+    queued = 0
+    with transaction.atomic():
+        # Messages still waiting that new events can join: one per recipient and ticket
+        # (key: recipient, ticket id) or the recipient's daily digest (key: recipient, None)
+        waiting = OutboundEmail.objects.filter(
+            recipient_id__in=user_ids,
+            status='queued',
+            attempts=0,
+            next_attempt_at__gt=now
+        ).filter(
+            Q(ticket__in=[ticket for ticket, _ in recipients_by_ticket]) | Q(notification_type=DIGEST_TYPE)
+        ).order_by('next_attempt_at')
+        pending = {}
+        for message in waiting.select_for_update():
+            key = (message.recipient_id, None if message.notification_type == DIGEST_TYPE else message.ticket_id)
+            pending.setdefault(key, message)
+
+        merged, created = {}, []
+        for ticket, recipients in recipients_by_ticket:
+            event = make_event(notification_type, ticket, context, now)
+            for user in recipients:
+                send_at, daily = delivery_time(preferences.get(user.id), now)
+                key = (user.id, None if daily else ticket.id)
+                message = pending.get(key) if send_at > now else None
+                if message is not None:
+                    message.extra_events.append(event)
+                    if message.pk:
+                        merged[message.pk] = message
+                elif daily:
+                    message = OutboundEmail(
+                        recipient=user, to_email=user.email, domain=_domain(user.email),
+                        notification_type=DIGEST_TYPE, extra_events=[event], next_attempt_at=send_at,
+                    )
+                    # Later tickets of this batch join the new digest
+                    pending[key] = message
+                    created.append(message)
+                else:
+                    created.append(OutboundEmail(
+                        recipient=user, to_email=user.email, domain=_domain(user.email),
+                        ticket=ticket, notification_type=notification_type, context=context,
+                        next_attempt_at=send_at,
+                    ))
+                queued += 1
+
+        if merged:
+            OutboundEmail.objects.bulk_update(list(merged.values()), ['extra_events'])
+        if created:
+            OutboundEmail.objects.bulk_create(created)
+
+    if merged:
+        logger.debug(f"Merged {notification_type} events into {len(merged)} waiting message(s)")
+    if any(message.next_attempt_at <= now for message in created):
+        # Wake this process's worker once the rows are visible to its connection
+        transaction.on_commit(wake_outbox_worker)
+    return queued
+
+
+def _release_stale_claims(now):
+    """Return rows of crashed workers to the queue"""
+    released = OutboundEmail.objects.filter(
+        status='sending',
+        claimed_at__lt=now - STALE_CLAIM_AGE
+    ).update(status='queued', claimed_at=None, claimed_by='')
+    if released:
+        logger.warning(f"Returned {released} stale outbox message(s) to the queue")
+    return released
+
+
+def _domain_usage(now):
+    """Messages per domain sent in the rate window or being sent right now"""
+    usage = OutboundEmail.objects.filter(
+        Q(sent_at__gte=now - RATE_WINDOW) | Q(status='sending')
+    ).values('domain').annotate(count=Count('id'))
+    return {row['domain']: row['count'] for row in usage}
+
+
+def claim_batch(batch_size=None, worker_id=None):
+    """
+    Claim due messages for sending
+
+    Args:
+        batch_size: Maximum number of messages (default EMAIL_OUTBOX_BATCH_SIZE)
+        worker_id: Name stored on the claimed rows (default: host, process and thread)
+
+    Returns:
+        list: Ids of the claimed OutboundEmail rows
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    worker_id = worker_id or _worker_name()
+    now = timezone.now()
+    _release_stale_claims(now)
+
+    with transaction.atomic():
+        usage = _domain_usage(now)
+        saturated = {domain for domain, count in usage.items() if count >= _domain_limit(domain)}
+        claimed = []
+        while True:
+            # Domains at their limit are left out in the query, so a burst to one domain
+            # cannot fill the candidate window
+            due = OutboundEmail.objects.filter(
+                status='queued',
+                next_attempt_at__lte=now
+            ).exclude(domain__in=saturated).exclude(id__in=claimed).order_by('next_attempt_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                # Rows locked by another worker are skipped instead of waited for
+                due = due.select_for_update(skip_locked=True)
+            window = (batch_size - len(claimed)) * CANDIDATES_PER_SLOT
+            candidates = list(due.values_list('id', 'domain')[:window])
+
+            newly_saturated = set()
+            for message_id, domain in candidates:
+                if domain in newly_saturated:
+                    continue
+                usage[domain] = usage.get(domain, 0) + 1
+                claimed.append(message_id)
+                if usage[domain] >= _domain_limit(domain):
+                    newly_saturated.add(domain)
+                if len(claimed) >= batch_size:
+                    break
+
+            # Read again without the domains that reached their limit in this round, unless
+            # the window already held every due row
+            if len(claimed) >= batch_size or len(candidates) < window or not newly_saturated:
+                break
+            saturated |= newly_saturated
+
+        if claimed:
+            # The status condition keeps the claim safe on databases without row locks
+            OutboundEmail.objects.filter(id__in=claimed, status='queued').update(
+                status='sending',
+                claimed_at=now,
+                claimed_by=worker_id
+            )
+            claimed = list(OutboundEmail.objects.filter(
+                id__in=claimed, status='sending', claimed_by=worker_id, claimed_at=now
+            ).values_list('id', flat=True))
+
+    return claimed
+
+
+def _retry_delay(attempts):
+    """Delay before the next attempt, doubled after every failure (with a little jitter)"""
+    delay = timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+    return min(delay, MAX_RETRY_DELAY) * random.uniform(1.0, 1.25)
+
+
+def _mark_failed_attempt(message, error):
+    """
+    Schedule a retry, or give up after EMAIL_OUTBOX_MAX_ATTEMPTS
+
+    Returns:
+        bool: True when the message will be retried
+    """
+    message.attempts += 1
+    message.last_error = str(error)[:2000]
+    message.claimed_at = None
+    message.claimed_by = ''
+    if message.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        message.status = 'failed'
+        logger.error(f"Giving up on outbox message {message.id} to {message.to_email}: {error}")
+    else:
+        message.status = 'queued'
+        message.next_attempt_at = timezone.now() + _retry_delay(message.attempts)
+        logger.warning(
+            f"Outbox message {message.id} to {message.to_email} failed "
+            f"(attempt {message.attempts}), retrying at {message.next_attempt_at:%H:%M:%S}: {error}"
+        )
+    message.save(update_fields=['attempts', 'last_error', 'claimed_at', 'claimed_by', 'status', 'next_attempt_at'])
+    return message.status == 'queued'
+
+
+def send_claimed(message_ids):
+    """
+    Render and send claimed messages
+
+    All messages are rendered first and then sent over one mail connection.
+
+    Returns:
+        dict: Numbers of 'sent', 'skipped' (recipient opted out), 'retried' and 'failed'
+              (out of attempts) messages
+    """
+    result = {'sent': 0, 'skipped': 0, 'retried': 0, 'failed': 0}
+    messages = OutboundEmail.objects.filter(
+        id__in=message_ids, status='sending'
+    ).select_related('recipient__emailnotificationsettings', 'ticket')
+
+    def count_failure(message, error):
+        result['retried' if _mark_failed_attempt(message, error) else 'failed'] += 1
+
+    # Recipients of the same event share one rendering of its body
+    shared_bodies = {}
+
+    def shared_body(message):
+        key = (message.notification_type, message.ticket_id, json.dumps(message.context, sort_keys=True))
+        if key not in shared_bodies:
+            shared_bodies[key] = render_ticket_notification(
+                message.notification_type, message.ticket, **message.context
+            )
+        return shared_bodies[key]
+
+    rendered, skipped = [], []
+    for message in messages:
+        try:
+            if message.notification_type == DIGEST_TYPE or message.extra_events:
+                email = build_ticket_digest(message.recipient, message_events(message))
+            else:
+                email = build_ticket_notification(
+                    message.notification_type, message.ticket, message.recipient,
+                    shared=shared_body(message), **message.context
+                )
+        except Exception as e:
+            count_failure(message, e)
+            continue
+        if email is None:
+            skipped.append(message.id)
+        else:
+            rendered.append((message, email))
+
+    done = []
+    send_results = send_messages_batch([email for _, email in rendered])
+    for (message, _), (sent, error) in zip(rendered, send_results):
+        if sent:
+            done.append(message.id)
+        else:
+            count_failure(message, error)
+
+    now = timezone.now()
+    if done:
+        OutboundEmail.objects.filter(id__in=done).update(
+            status='sent', sent_at=now, last_error='', claimed_at=None, claimed_by=''
+        )
+    if skipped:
+        # Opted-out recipients count as handled; they use no share of the domain rate
+        OutboundEmail.objects.filter(id__in=skipped).update(
+            status='sent', last_error='Pominięto (powiadomienia wyłączone)', claimed_at=None, claimed_by=''
+        )
+    result['sent'] = len(done)
+    result['skipped'] = len(skipped)
+    return result
+
+
+def process_outbox(batch_size=None, max_batches=None):
+    """
+    Send due outbox messages until nothing more can be claimed
+
+    Stops early when every due message is held back by its domain's rate limit; the next
+    run picks them up.
+
+    Args:
+        batch_size: Messages claimed at a time (default EMAIL_OUTBOX_BATCH_SIZE)
+        max_batches: Stop after this many batches (None - no limit)
+
+    Returns:
+        dict: Totals of 'sent', 'skipped', 'retried' and 'failed' messages
+    """
+    totals = {'sent': 0, 'skipped': 0, 'retried': 0, 'failed': 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        claimed = claim_batch(batch_size)
+        if not claimed:
+            break
+        batches += 1
+        result = send_claimed(claimed)
+        for key, value in result.items():
+            totals[key] += value
+        logger.info(f"Outbox batch of {len(claimed)}: {result}")
+    return totals
+
+
+def _run_worker():
+    global _wakeup_pending
+    close_old_connections()
+    try:
+        with _executor_lock:
+            _wakeup_pending = False
+        process_outbox()
+    except Exception as e:
+        logger.error(f"Email outbox worker crashed: {e}")
+    finally:
+        close_old_connections()
+
+
+def wake_outbox_worker():
+    """Send queued messages from this process's worker thread (one run queued at a time)"""
+    global _executor, _wakeup_pending
+    with _executor_lock:
+        if _wakeup_pending:
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+        _wakeup_pending = True
+    _executor.submit(_run_worker)
+
+
+def outbox_stats():
+    """
+    Queue depth of the outbox
+
+    Returns:
+        dict: Message counts per status, 'due' (queued and ready to send now) and
+              'oldest_queued' (creation time of the oldest queued message or None)
+    """
+    now = timezone.now()
+    data = OutboundEmail.objects.aggregate(
+        **{status: Count('id', filter=Q(status=status)) for status, _ in OutboundEmail.STATUS_CHOICES},
+        due=Count('id', filter=Q(status='queued', next_attempt_at__lte=now)),
+        oldest_queued=Min('created_at', filter=Q(status='queued')),
+    )
+    return data
+
+
+def cleanup_outbox(retention_days=None):
+    """
+    Delete sent messages older than EMAIL_OUTBOX_RETENTION_DAYS (failed ones are kept for review)
+
+    Returns:
+        int: Number of deleted messages
+    """
+    retention_days = retention_days or settings.EMAIL_OUTBOX_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = OutboundEmail.objects.filter(status='sent', created_at__lt=cutoff).delete()
+    return deleted
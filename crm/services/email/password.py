@@ -4,11 +4,10 @@ Password-related email functionality.
 This module handles sending password reset, verification, and change notification emails.
 """
 
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils import timezone
-import socket
 import logging
 
 # Configure logger
@@ -190,15 +189,12 @@ def send_password_changed_notification(user, context=None):
             'Importance': 'high',
         }
         
-        # Set socket timeout for email sending
-        default_timeout = socket.getdefaulttimeout()
-        socket.setdefaulttimeout(15)  # Use longer timeout for this critical email
+        # Use longer timeout for this critical email
+        msg.connection = get_connection(fail_silently=False, timeout=15)
         
         try:
             logger.info(f"🔵 SENDING NOW: Password change notification to {user.email}")
             msg.send(fail_silently=False)
-            # Reset socket timeout
-            socket.setdefaulttimeout(default_timeout)
             logger.info(f"✅ Password change notification SUCCESSFULLY sent to {user.email}")
             return True
         except Exception as send_error:
@@ -212,7 +208,6 @@ def send_password_changed_notification(user, context=None):
                 return True
             except Exception as retry_error:
                 logger.error(f"❌ Second attempt also failed: {str(retry_error)}")
-                socket.setdefaulttimeout(default_timeout)
                 return False
     except Exception as e:
         logger.error(f"❌ Failed to prepare password notification: {str(e)}", exc_info=True)
@@ -0,0 +1,98 @@
+"""
+Shared rendering of notification emails.
+
+The ticket notification templates differ between recipients only in the greeting. An
+event is therefore rendered once with a placeholder recipient, and each recipient's copy
+is made by replacing the placeholder with their name. Templates come from Django's
+cached template loader (the default loader configuration), so they are compiled once per
+process.
+
+Only the recipient's name (user.first_name / user.username) is personalised; any other
+user attribute renders empty in a shared body.
+"""
+
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import select_template
+from django.utils.html import escape
+import logging
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Survives HTML escaping and never occurs in real content
+RECIPIENT_NAME = '[[recipient-name:5c1f9e]]'
+
+
+class RecipientPlaceholder:
+    """Stands in for the recipient when rendering a shared body"""
+
+    first_name = RECIPIENT_NAME
+    username = RECIPIENT_NAME
+
+    def get_full_name(self):
+        return RECIPIENT_NAME
+
+    def __str__(self):
+        return RECIPIENT_NAME
+
+
+def recipient_name(user):
+    """Name used in the greeting of a notification"""
+    return user.first_name or user.username
+
+
+@dataclass(frozen=True)
+class SharedEmail:
+    """Subject and bodies of one event, with the recipient's name left as a placeholder"""
+
+    subject: str
+    text: str
+    html: str
+
+    def for_recipient(self, user):
+        """
+        Build the message for one recipient
+
+        Args:
+            user: Recipient (must have an email address)
+
+        Returns:
+            EmailMultiAlternatives
+        """
+        # Both templates are rendered with autoescaping, so the text body gets the escaped
+        # name as well - same output as rendering the templates per recipient
+        name = escape(recipient_name(user))
+        msg = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.text.replace(RECIPIENT_NAME, name),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email]
+        )
+        msg.attach_alternative(self.html.replace(RECIPIENT_NAME, name), "text/html")
+        return msg
+
+
+def render_shared(template_names, context):
+    """
+    Render the HTML and text bodies of an event once for all recipients
+
+    Args:
+        template_names: Base names to try in order, e.g. ['emails/ticket_created',
+                        'emails/ticket_generic'] ('.html' and '.txt' are appended)
+        context: Template context without the recipient ('user' is set to a placeholder)
+
+    Returns:
+        tuple: (text, html) with RECIPIENT_NAME in place of the recipient's name
+
+    Raises:
+        TemplateDoesNotExist: When none of the templates exist
+    """
+    html_template = select_template([f'{name}.html' for name in template_names])
+    text_template = select_template([f'{name}.txt' for name in template_names])
+    if html_template.origin.template_name != f'{template_names[0]}.html':
+        logger.warning(f"Template {template_names[0]}.html not found, using {html_template.origin.template_name}")
+
+    context = {**context, 'user': RecipientPlaceholder()}
+    return text_template.render(context), html_template.render(context)
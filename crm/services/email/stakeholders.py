@@ -0,0 +1,144 @@
+"""
+Recipients of ticket notifications.
+
+Who hears about a ticket: its creator and assignee, plus - for new tickets and changes to
+unassigned ones - every superagent and admin and the agents of the ticket's organization.
+That staff list changes rarely, so its user ids are cached per organization; the cache is
+versioned per organization (membership changes) and globally (role changes), see
+crm/signals.py. Other worker processes only see the new versions through a shared cache
+(see CACHES); with a per-process LocMemCache lists are kept for LOCAL_STAFF_TTL. Recipients and their EmailNotificationSettings are then read in one query.
+"""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Q
+import logging
+
+from ...models import EmailNotificationSettings, UserProfile
+from ..access.versions import bump_version, cache_is_shared, get_versions
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'crm:notify:staff:version'
+ORGANIZATION_VERSION_KEY = 'crm:notify:staff:version:{organization_id}'
+STAFF_KEY = 'crm:notify:staff:{organization_id}:{global_version}:{organization_version}'
+STAFF_TTL = 3600
+# ...when the cache is per process and membership or role changes in other workers are not seen
+LOCAL_STAFF_TTL = 60
+
+# Notification types that also go to the staff handling the ticket's organization
+STAFF_TYPES = ('created',)
+# ...and these only while the ticket is unassigned
+UNASSIGNED_STAFF_TYPES = ('status_changed', 'commented', 'updated', 'closed', 'reopened')
+
+
+def organization_staff_ids(organization_id):
+    """
+    Ids of users notified about tickets of an organization: all superagents and admins,
+    plus the agents of the organization (cached)
+    """
+    global_version, organization_version = get_versions(
+        GLOBAL_VERSION_KEY, ORGANIZATION_VERSION_KEY.format(organization_id=organization_id)
+    )
+    key = STAFF_KEY.format(
+        organization_id=organization_id,
+        global_version=global_version,
+        organization_version=organization_version
+    )
+    staff_ids = cache.get(key)
+    if staff_ids is None:
+        staff_ids = frozenset(UserProfile.objects.filter(
+            Q(role__in=['superagent', 'admin']) |
+            Q(role='agent', organizations=organization_id)
+        ).values_list('user_id', flat=True))
+        cache.set(key, staff_ids, STAFF_TTL if cache_is_shared() else LOCAL_STAFF_TTL)
+    return staff_ids
+
+
+def invalidate_organization_staff(organization_ids=None):
+    """Drop cached staff lists of some organizations (None - all of them)"""
+    if organization_ids is None:
+        bump_version(GLOBAL_VERSION_KEY)
+        return
+    for organization_id in organization_ids:
+        bump_version(ORGANIZATION_VERSION_KEY.format(organization_id=organization_id))
+
+
+def stakeholder_ids(notification_type, ticket, triggered_by=None):
+    """Ids of the users to notify about a ticket event (notification settings not checked)"""
+    user_ids = {ticket.created_by_id, ticket.assigned_to_id}
+    if notification_type in STAFF_TYPES or (
+        notification_type in UNASSIGNED_STAFF_TYPES and not ticket.assigned_to_id
+    ):
+        user_ids |= organization_staff_ids(ticket.organization_id)
+    user_ids.discard(None)
+    if triggered_by is not None:
+        user_ids.discard(triggered_by.pk)
+    return user_ids
+
+
+def _load_recipients(user_ids, notification_type):
+    """
+    Users with the given ids who want this notification type, in one query
+
+    Returns:
+        tuple: (dict of user id -> User, dict of user id -> EmailNotificationSettings)
+    """
+    users = User.objects.filter(id__in=user_ids).select_related('emailnotificationsettings')
+    preferences = {}
+    recipients = {}
+    field = f'notify_ticket_{notification_type}'
+    for user in users:
+        try:
+            preference = user.emailnotificationsettings
+        except EmailNotificationSettings.DoesNotExist:
+            preference = None
+        if preference is not None:
+            if not getattr(preference, field, True):
+                logger.debug(f"User {user.username} has disabled {notification_type} notifications")
+                continue
+            preferences[user.id] = preference
+        recipients[user.id] = user
+    return recipients, preferences
+
+
+def resolve_stakeholders(notification_type, ticket, triggered_by=None):
+    """
+    Users to notify about a ticket event, with their notification settings
+
+    Users who disabled this notification type are left out.
+
+    Args:
+        notification_type: Type of notification (created, updated, commented, etc.)
+        ticket: The ticket object related to this notification
+        triggered_by: User who triggered the action (never notified)
+
+    Returns:
+        tuple: (list of User, dict of user id -> EmailNotificationSettings for users who have them)
+    """
+    user_ids = stakeholder_ids(notification_type, ticket, triggered_by)
+    if not user_ids:
+        return [], {}
+
+    recipients, preferences = _load_recipients(user_ids, notification_type)
+    return list(recipients.values()), preferences
+
+
+def resolve_stakeholders_bulk(notification_type, tickets, triggered_by=None):
+    """
+    resolve_stakeholders for many tickets with one user query
+
+    Returns:
+        tuple: (dict of ticket id -> list of User, dict of user id -> EmailNotificationSettings)
+    """
+    ids_per_ticket = {ticket.pk: stakeholder_ids(notification_type, ticket, triggered_by) for ticket in tickets}
+    all_ids = set().union(*ids_per_ticket.values())
+    if not all_ids:
+        return {ticket_id: [] for ticket_id in ids_per_ticket}, {}
+
+    recipients, preferences = _load_recipients(all_ids, notification_type)
+    return {
+        ticket_id: [recipients[user_id] for user_id in sorted(user_ids) if user_id in recipients]
+        for ticket_id, user_ids in ids_per_ticket.items()
+    }, preferences
@@ -0,0 +1,15 @@
+"""
+Report services package for the CRM application.
+
+This package runs statistics reports as background jobs and keeps their finished files
+available for download.
+"""
+
+from .jobs import (
+    REPORT_PARAMS,
+    submit_report_job,
+    run_report_job,
+    can_access_report_job,
+    recover_report_jobs,
+    cleanup_report_jobs,
+)
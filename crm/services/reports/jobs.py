@@ -0,0 +1,261 @@
+"""
+Background report jobs.
+
+Reports are generated in a small per-process thread pool instead of inside the request, so
+a report over a long period does not hold a web worker. Jobs are stored as ReportJob rows:
+the browser polls the job and downloads the finished file. A finished file is reused for
+identical parameters until it expires (settings.REPORT_JOBS_TTL).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.http import FileResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+
+from ...models import ReportJob
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Functions building each report type: builder(user, params) -> FileResponse or JsonResponse
+REPORT_BUILDERS = {
+    'statistics': 'crm.views.statistics_views.build_statistics_report',
+    'organization': 'crm.views.statistics_views.build_organization_report',
+}
+
+# Parameters accepted for each report type (same names as the report forms)
+REPORT_PARAMS = {
+    'statistics': ('period_type', 'period_start', 'period_end', 'organization', 'agent', 'on_duty', 'format'),
+    'organization': ('period_start', 'period_end', 'organization', 'agent', 'on_duty'),
+}
+
+# Running jobs older than this were lost with their process (e.g. a Passenger restart)
+STALE_JOB_AGE = timedelta(minutes=30)
+
+# Queued jobs are left to the worker pool for this long before recovery runs them
+QUEUE_GRACE = timedelta(minutes=1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Worker pool of this process (created on first use)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.REPORT_JOBS_WORKERS,
+                thread_name_prefix='report-job'
+            )
+        return _executor
+
+
+def _report_scope(user, report_type):
+    """
+    Part of the reuse key that depends on who asks for the report
+
+    The statistics report shows the same data to every admin and superagent, while the
+    organization report of a superagent covers only their organizations.
+    """
+    if report_type == 'organization' and user.profile.role != 'admin':
+        org_ids = sorted(user.profile.organizations.values_list('id', flat=True))
+        return 'orgs:' + ','.join(str(org_id) for org_id in org_ids)
+    return 'all'
+
+
+def _params_key(user, report_type, params):
+    """Hash identifying identical report requests"""
+    payload = json.dumps([report_type, _report_scope(user, report_type), params], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _normalize_params(report_type, params):
+    """Keep the known, non-empty parameters (empty values fall back to report defaults)"""
+    normalized = {}
+    for name in REPORT_PARAMS[report_type]:
+        value = str(params.get(name) or '').strip()
+        if value:
+            normalized[name] = value
+    return normalized
+
+
+def submit_report_job(user, report_type, params):
+    """
+    Queue a report, or return a job for the same parameters that can be reused
+
+    A job counts as reusable while it is queued, running, or finished and not expired.
+
+    Args:
+        user: User requesting the report (admin or superagent)
+        report_type: Key of REPORT_BUILDERS
+        params: Report parameters (request.POST or dict)
+
+    Returns:
+        tuple: (ReportJob, reused)
+    """
+    params = _normalize_params(report_type, params)
+    params_key = _params_key(user, report_type, params)
+
+    candidates = ReportJob.objects.filter(params_key=params_key).filter(
+        Q(status__in=('queued', 'running')) | Q(status='done', expires_at__gt=timezone.now())
+    ).order_by('-created_at')
+
+    for job in candidates[:3]:
+        if job.status != 'done' or job.is_available():
+            logger.info(f"Reusing report job {job.id} for {user.username} ({report_type})")
+            return job, True
+
+    job = ReportJob.objects.create(
+        user=user,
+        report_type=report_type,
+        params=params,
+        params_key=params_key
+    )
+    # Start only after the row is visible to the worker's connection
+    transaction.on_commit(lambda: _get_executor().submit(run_report_job, job.id))
+
+    logger.info(f"Queued report job {job.id} for {user.username} ({report_type}: {params})")
+    return job, False
+
+
+def can_access_report_job(user, job):
+    """Check if user may see and download a job (own job, or one they would get by reuse)"""
+    if job.user_id == user.id:
+        return True
+    if user.profile.role not in ('admin', 'superagent'):
+        return False
+    return job.params_key == _params_key(user, job.report_type, job.params)
+
+
+def run_report_job(job_id):
+    """
+    Generate the report of a queued job (worker pool entry point)
+
+    The job is claimed with a conditional UPDATE, so a job is never run twice even if it is
+    also picked up by recover_report_jobs.
+    """
+    close_old_connections()
+    try:
+        claimed = ReportJob.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            started_at=timezone.now()
+        )
+        if not claimed:
+            return
+
+        job = ReportJob.objects.select_related('user__profile').get(id=job_id)
+        _execute(job)
+    except Exception as e:
+        logger.error(f"Report job {job_id} crashed: {e}")
+    finally:
+        close_old_connections()
+
+
+def _execute(job):
+    """Build the report and store the file, marking the job done or failed"""
+    logger.info(f"Running report job {job.id} ({job.report_type}: {job.params})")
+    builder = import_string(REPORT_BUILDERS[job.report_type])
+
+    try:
+        response = builder(job.user, job.params)
+        if not isinstance(response, FileResponse):
+            raise ValueError(_error_message(response))
+
+        extension = os.path.splitext(response.filename)[1]
+        job.artifact = f"{job.id}_{uuid.uuid4().hex}{extension}"
+        os.makedirs(settings.REPORT_JOBS_ROOT, exist_ok=True)
+        try:
+            with open(job.artifact_path, 'wb') as output:
+                for chunk in response:
+                    output.write(chunk)
+        finally:
+            response.close()
+
+        job.filename = response.filename
+        job.content_type = response['Content-Type']
+        job.status = 'done'
+        job.expires_at = timezone.now() + timedelta(seconds=settings.REPORT_JOBS_TTL)
+        logger.info(f"Report job {job.id} finished: {job.filename}")
+    except Exception as e:
+        logger.error(f"Report job {job.id} failed: {e}")
+        job.status = 'failed'
+        job.error_message = str(e)
+        job.artifact = ''
+
+    job.finished_at = timezone.now()
+    job.save()
+
+
+def _error_message(response):
+    """Message of a JsonResponse error returned by a report builder"""
+    try:
+        return json.loads(response.content).get('message') or 'Nieznany błąd'
+    except (ValueError, AttributeError):
+        return f'Nieoczekiwana odpowiedź (HTTP {response.status_code})'
+
+
+def recover_report_jobs():
+    """
+    Fail jobs lost by a restarted process and run jobs still waiting in the queue
+
+    Queued jobs are run synchronously in the calling thread.
+
+    Returns:
+        tuple: (failed_count, run_count)
+    """
+    now = timezone.now()
+    failed = ReportJob.objects.filter(
+        status='running',
+        started_at__lt=now - STALE_JOB_AGE
+    ).update(
+        status='failed',
+        error_message='Generowanie raportu zostało przerwane',
+        finished_at=now
+    )
+
+    waiting = list(ReportJob.objects.filter(
+        status='queued',
+        created_at__lt=now - QUEUE_GRACE
+    ).values_list('id', flat=True))
+    for job_id in waiting:
+        run_report_job(job_id)
+
+    return failed, len(waiting)
+
+
+def cleanup_report_jobs():
+    """
+    Delete expired report files and their jobs, and failed jobs older than the TTL
+
+    Returns:
+        int: Number of jobs deleted
+    """
+    now = timezone.now()
+    expired = ReportJob.objects.filter(
+        Q(status='done', expires_at__lte=now) |
+        Q(status='failed', finished_at__lte=now - timedelta(seconds=settings.REPORT_JOBS_TTL))
+    )
+
+    deleted = 0
+    for job in expired.iterator():
+        if job.artifact_path and os.path.exists(job.artifact_path):
+            try:
+                os.remove(job.artifact_path)
+            except OSError as e:
+                logger.warning(f"Could not remove report file {job.artifact_path}: {e}")
+                continue
+        job.delete()
+        deleted += 1
+
+    return deleted
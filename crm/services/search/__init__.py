@@ -0,0 +1,15 @@
+"""
+Search services package for the CRM application.
+
+This package provides full-text ticket search over titles, descriptions and comments,
+backed by SQLite FTS5 locally and MySQL FULLTEXT indexes in production.
+"""
+
+from .backends import get_backend
+from .index import (
+    filter_tickets,
+    search_tickets,
+    index_tickets,
+    rebuild_index,
+)
+from .text import fold, tokenize
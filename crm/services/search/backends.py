@@ -0,0 +1,241 @@
+"""
+Full-text search backends.
+
+The search index is a side table keyed by ticket id, holding folded copies of the ticket
+title and of its description plus comments ("body"). It is not a Django model: the SQLite
+backend stores it in an FTS5 virtual table and the MySQL backend in an InnoDB table with
+FULLTEXT keys, neither of which the ORM can describe. Both tables are created by the
+rebuild_search_index command.
+
+Each backend turns query tokens into SQL fragments that the ORM embeds in ticket querysets,
+so the user's role scope and the other filters stay in the same query.
+"""
+
+from django.conf import settings
+from django.db import connection
+import logging
+import time
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'crm_ticket_search'
+
+# The title counts this many times more than the description and comments
+TITLE_WEIGHT = 10.0
+
+# A missing index table is looked for again after this many seconds (rebuild_search_index
+# may have created it in another process)
+MISSING_TABLE_RECHECK = 60
+
+
+class SearchBackend:
+    """Common interface of the search backends"""
+
+    vendor = None
+    # Shorter query tokens are ignored (the index does not contain them)
+    min_token_length = 1
+
+    def __init__(self):
+        # None - not checked yet
+        self._table_exists = None
+        self._checked_at = 0.0
+
+    def is_ready(self):
+        """
+        True when the index table exists
+
+        A found table is remembered for the life of the process, a missing one for
+        MISSING_TABLE_RECHECK seconds, so saves and searches do not query the schema each time.
+        """
+        if self._table_exists is None or (
+            not self._table_exists and time.monotonic() - self._checked_at > MISSING_TABLE_RECHECK
+        ):
+            with connection.cursor() as cursor:
+                self._table_exists = self.table_exists(cursor)
+            self._checked_at = time.monotonic()
+        return self._table_exists
+
+    def table_exists(self, cursor):
+        """Look the index table up in the database schema"""
+        return SEARCH_TABLE in connection.introspection.table_names(cursor)
+
+    def reset(self):
+        """Forget the cached table check (after creating or dropping the table)"""
+        self._table_exists = None
+
+    def create_table(self, cursor):
+        raise NotImplementedError
+
+    def drop_table(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def upsert(self, cursor, rows):
+        """Store (ticket_id, title, body) rows, replacing existing documents"""
+        raise NotImplementedError
+
+    def delete(self, cursor, ticket_ids):
+        """Remove documents of the given tickets"""
+        placeholders = ', '.join(['%s'] * len(ticket_ids))
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE ticket_id IN ({placeholders})', list(ticket_ids))
+
+    def match_sql(self, tokens, title_only=False):
+        """
+        SQL selecting the ids of all tickets matching every token
+
+        Returns:
+            tuple: (sql, params) usable as RawSQL in an id__in filter
+        """
+        raise NotImplementedError
+
+    def ranked_sql(self, tokens, scope_sql, scope_params, limit):
+        """
+        SQL selecting (ticket_id, score) of the best matches among the scope ids
+
+        Args:
+            tokens: Query tokens
+            scope_sql: SQL selecting the ids the user may see
+            scope_params: Parameters of scope_sql
+            limit: Maximum number of rows
+
+        Returns:
+            tuple: (sql, params), rows ordered by score (best first)
+        """
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 virtual table, used locally and in tests"""
+
+    vendor = 'sqlite'
+
+    def create_table(self, cursor):
+        # The ticket id is stored as the rowid; text is folded before indexing, so the
+        # tokenizer only has to split words
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+            f"USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def table_exists(self, cursor):
+        # introspection.table_names() skips virtual tables on some SQLite versions
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [SEARCH_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+    def upsert(self, cursor, rows):
+        self.delete(cursor, [row[0] for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+            rows
+        )
+
+    def delete(self, cursor, ticket_ids):
+        placeholders = ', '.join(['%s'] * len(ticket_ids))
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', list(ticket_ids))
+
+    def _expression(self, tokens, title_only=False):
+        """FTS5 query: every token as a quoted prefix term"""
+        expression = ' AND '.join(f'"{token}"*' for token in tokens)
+        if title_only:
+            expression = f'title : ({expression})'
+        return expression
+
+    def match_sql(self, tokens, title_only=False):
+        return (
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+            [self._expression(tokens, title_only)]
+        )
+
+    def ranked_sql(self, tokens, scope_sql, scope_params, limit):
+        # bm25() is lower for better matches
+        return (
+            f'SELECT rowid, -bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, 1.0) AS score '
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid IN ({scope_sql}) '
+            f'ORDER BY score DESC LIMIT %s',
+            [self._expression(tokens), *scope_params, limit]
+        )
+
+
+class MySQLFulltextBackend(SearchBackend):
+    """InnoDB FULLTEXT indexes, used in production"""
+
+    vendor = 'mysql'
+    # InnoDB default innodb_ft_min_token_size
+    min_token_length = 3
+
+    def create_table(self, cursor):
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            f'ticket_id BIGINT NOT NULL PRIMARY KEY, '
+            f'title TEXT NOT NULL, '
+            f'body MEDIUMTEXT NOT NULL, '
+            f'FULLTEXT KEY {SEARCH_TABLE}_title (title), '
+            f'FULLTEXT KEY {SEARCH_TABLE}_all (title, body)'
+            f') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci'
+        )
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(
+            f'REPLACE INTO {SEARCH_TABLE} (ticket_id, title, body) VALUES (%s, %s, %s)',
+            rows
+        )
+
+    def _expression(self, tokens):
+        """Boolean mode query: every token required, as a prefix"""
+        return ' '.join(f'+{token}*' for token in tokens)
+
+    def match_sql(self, tokens, title_only=False):
+        columns = 'title' if title_only else 'title, body'
+        return (
+            f'SELECT ticket_id FROM {SEARCH_TABLE} '
+            f'WHERE MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)',
+            [self._expression(tokens)]
+        )
+
+    def ranked_sql(self, tokens, scope_sql, scope_params, limit):
+        expression = self._expression(tokens)
+        return (
+            f'SELECT ticket_id, '
+            f'MATCH(title) AGAINST (%s IN BOOLEAN MODE) * {TITLE_WEIGHT} '
+            f'+ MATCH(title, body) AGAINST (%s IN BOOLEAN MODE) AS score '
+            f'FROM {SEARCH_TABLE} '
+            f'WHERE MATCH(title, body) AGAINST (%s IN BOOLEAN MODE) AND ticket_id IN ({scope_sql}) '
+            f'ORDER BY score DESC LIMIT %s',
+            [expression, expression, expression, *scope_params, limit]
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'mysql': MySQLFulltextBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    """
+    Return the search backend for the default database
+
+    TICKET_SEARCH_BACKEND selects it explicitly ('sqlite', 'mysql' or 'none');
+    'auto' follows the database vendor.
+
+    Returns:
+        SearchBackend or None: None when full-text search is disabled or not supported
+    """
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'TICKET_SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            name = connection.vendor
+        backend_class = BACKENDS.get(name)
+        if backend_class is None:
+            if name != 'none':
+                logger.warning(f"No full-text search backend for '{name}', using plain filtering")
+            _backend = False
+        else:
+            _backend = backend_class()
+    return _backend or None
@@ -0,0 +1,198 @@
+"""
+Ticket search index upkeep and ticket search.
+
+Documents are written after the surrounding transaction commits (see crm/signals.py) and
+rebuilt in bulk by the rebuild_search_index command. Until the index table exists, search
+falls back to the previous icontains filtering.
+"""
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from itertools import islice
+import logging
+
+from ...models import Ticket, TicketComment
+from .backends import get_backend
+from .text import fold, tokenize
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Ranked search returns at most this many tickets
+MAX_RANKED_RESULTS = 500
+
+
+def _documents(ticket_ids):
+    """Build (ticket_id, title, body) index rows for the given tickets"""
+    comments = {}
+    for ticket_id, content in TicketComment.objects.filter(
+        ticket_id__in=ticket_ids
+    ).order_by('ticket_id', 'created_at').values_list('ticket_id', 'content'):
+        comments.setdefault(ticket_id, []).append(content)
+
+    rows = []
+    for ticket_id, title, description in Ticket.objects.filter(
+        id__in=ticket_ids
+    ).values_list('id', 'title', 'description'):
+        body = '\n'.join([description or '', *comments.get(ticket_id, [])])
+        rows.append((ticket_id, fold(title), fold(body)))
+    return rows
+
+
+def index_tickets(ticket_ids):
+    """
+    Write (or remove) the index documents of the given tickets
+
+    Tickets that no longer exist are removed from the index. Does nothing while the
+    index table has not been created.
+
+    Returns:
+        int: Number of documents written
+    """
+    backend = get_backend()
+    ticket_ids = list(ticket_ids)
+    if not ticket_ids or not backend or not backend.is_ready():
+        return 0
+
+    rows = _documents(ticket_ids)
+    removed = set(ticket_ids) - {row[0] for row in rows}
+    with connection.cursor() as cursor:
+        if removed:
+            backend.delete(cursor, removed)
+        if rows:
+            backend.upsert(cursor, rows)
+    return len(rows)
+
+
+def rebuild_index(chunk_size=1000):
+    """
+    Recreate the index table and index every ticket
+
+    Args:
+        chunk_size: Tickets indexed per batch
+
+    Returns:
+        int: Number of indexed tickets
+
+    Raises:
+        RuntimeError: When no search backend is available for the database
+    """
+    backend = get_backend()
+    if not backend:
+        raise RuntimeError('Full-text search is not available for this database')
+
+    with connection.cursor() as cursor:
+        backend.drop_table(cursor)
+        backend.create_table(cursor)
+    backend.reset()
+
+    indexed = 0
+    ids = iter(list(Ticket.objects.order_by('id').values_list('id', flat=True)))
+    while True:
+        chunk = list(islice(ids, chunk_size))
+        if not chunk:
+            break
+        rows = _documents(chunk)
+        with connection.cursor() as cursor:
+            backend.upsert(cursor, rows)
+        indexed += len(rows)
+        logger.debug(f"Indexed {indexed} tickets")
+
+    logger.info(f"Search index rebuilt: {indexed} tickets")
+    return indexed
+
+
+def _search_ready(query):
+    """Return (backend, tokens) when the query can use the index, else (None, None)"""
+    backend = get_backend()
+    if not backend or not backend.is_ready():
+        return None, None
+    tokens = tokenize(query, backend.min_token_length)
+    if not tokens:
+        return None, None
+    return backend, tokens
+
+
+def _ticket_number(query):
+    """Ticket number typed into the search box (e.g. '123' or '#123'), else None"""
+    number = query.strip().lstrip('#')
+    if number.isdigit():
+        return int(number)
+    return None
+
+
+def filter_tickets(tickets, query, title_only=False):
+    """
+    Narrow a ticket queryset to tickets matching a search query
+
+    Every word must occur (as a word prefix) in the title, description or a comment;
+    with title_only only the title is searched. Diacritics and case are ignored.
+
+    Args:
+        tickets: Ticket queryset (scope and other filters already applied)
+        query: Text typed by the user
+        title_only: Search the title only
+
+    Returns:
+        QuerySet: Filtered tickets, ordering unchanged
+    """
+    backend, tokens = _search_ready(query)
+    if not backend:
+        if title_only:
+            return tickets.filter(title__icontains=query)
+        return tickets.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(id__icontains=query)
+        )
+
+    sql, params = backend.match_sql(tokens, title_only=title_only)
+    condition = Q(id__in=RawSQL(sql, params))
+    number = None if title_only else _ticket_number(query)
+    if number is not None:
+        condition |= Q(id=number)
+    return tickets.filter(condition)
+
+
+def search_tickets(tickets, query, limit=MAX_RANKED_RESULTS):
+    """
+    Search tickets and order them by relevance
+
+    Matches are ranked by the backend (title matches weigh more than description and
+    comments) within the given queryset, so role scoping and filters are respected before
+    the limit is applied. A ticket whose number equals the query comes first.
+
+    Args:
+        tickets: Ticket queryset (scope and other filters already applied)
+        query: Text typed by the user
+        limit: Maximum number of results
+
+    Returns:
+        QuerySet: Matching tickets, best match first
+    """
+    backend, tokens = _search_ready(query)
+    if not backend:
+        return filter_tickets(tickets, query)
+
+    scope_sql, scope_params = tickets.order_by().values('id').query.sql_with_params()
+    sql, params = backend.ranked_sql(tokens, scope_sql, scope_params, limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ranked_ids = [row[0] for row in cursor.fetchall()]
+
+    number = _ticket_number(query)
+    if number is not None:
+        if number in ranked_ids:
+            ranked_ids.remove(number)
+            ranked_ids.insert(0, number)
+        elif tickets.filter(id=number).exists():
+            ranked_ids = [number, *ranked_ids[:limit - 1]]
+
+    if not ranked_ids:
+        return tickets.none()
+
+    positions = [When(id=ticket_id, then=Value(position)) for position, ticket_id in enumerate(ranked_ids)]
+    return Ticket.objects.filter(id__in=ranked_ids).order_by(
+        Case(*positions, output_field=IntegerField())
+    )
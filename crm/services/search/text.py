@@ -0,0 +1,57 @@
+"""
+Text normalization for ticket search.
+
+Indexed text and queries go through the same folding, so "zażółć" finds "zazolc" and the
+other way round. Polish letters without a Unicode decomposition (ł) are mapped explicitly.
+"""
+
+import re
+import unicodedata
+
+# Letters that NFKD does not split into base letter + combining mark
+_EXTRA_FOLDS = str.maketrans({
+    'ł': 'l',
+    'Ł': 'l',
+    'đ': 'd',
+    'Đ': 'd',
+    'ø': 'o',
+    'Ø': 'o',
+    'ß': 'ss',
+})
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """
+    Lowercase text and strip diacritics
+
+    Args:
+        text: Any string (None is treated as empty)
+
+    Returns:
+        str: Folded text, e.g. 'Zażółć gęślą jaźń' -> 'zazolc gesla jazn'
+    """
+    if not text:
+        return ''
+    text = text.translate(_EXTRA_FOLDS)
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text, min_length=1):
+    """
+    Split folded text into search tokens
+
+    Args:
+        text: Raw query text
+        min_length: Tokens shorter than this are dropped
+
+    Returns:
+        list: Unique tokens in query order
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(fold(text).replace('_', ' ')):
+        if len(token) >= min_length and token not in tokens:
+            tokens.append(token)
+    return tokens
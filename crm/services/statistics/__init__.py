@@ -0,0 +1,16 @@
+"""
+Statistics services package for the CRM application.
+
+This package provides the aggregation engine used by the statistics dashboard and reports,
+the TicketStatistics rollups built on top of it and batch upkeep of AgentWorkLog times.
+"""
+
+from .aggregation import (
+    ticket_summary,
+    ticket_distribution,
+    agent_breakdown,
+    agent_work_summary,
+    agent_display_name,
+)
+from .rollups import refresh_rollups, summarize_range
+from .work_logs import recompute_work_log_minutes
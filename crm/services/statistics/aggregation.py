@@ -0,0 +1,215 @@
+"""
+Ticket statistics aggregation.
+
+This module computes the headline numbers and the per-agent breakdown for a ticket
+queryset using conditional aggregation, so the cost of a statistics page does not grow
+with the number of statuses or agents.
+"""
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+import logging
+
+from ...models import Ticket
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Statuses reported separately in the summary
+STATUS_KEYS = tuple(key for key, _ in Ticket.STATUS_CHOICES)
+PRIORITY_KEYS = tuple(key for key, _ in Ticket.PRIORITY_CHOICES)
+CATEGORY_KEYS = tuple(key for key, _ in Ticket.CATEGORY_CHOICES)
+
+# Statuses counted as "resolved" in agent performance
+RESOLVED_STATUSES = ('resolved', 'closed')
+
+
+def _resolution_duration():
+    """Expression for the time between ticket creation and resolution"""
+    return ExpressionWrapper(
+        F('resolved_at') - F('created_at'),
+        output_field=DurationField()
+    )
+
+
+def _to_hours(duration):
+    """Convert an averaged duration to hours (0 when there is no data)"""
+    if duration:
+        return duration.total_seconds() / 3600
+    return 0
+
+
+def _actual_hours(value):
+    """Convert an averaged actual_resolution_time to float (None when there is no data)"""
+    if value:
+        return float(value)
+    return None
+
+
+def agent_display_name(first_name, last_name, username):
+    """Name shown for an agent in statistics tables and reports"""
+    return f"{first_name} {last_name}" if first_name else username
+
+
+def summary_aggregates():
+    """
+    Aggregate expressions behind ticket_summary
+
+    Shared with the TicketStatistics rollups so both compute the numbers the same way.
+    Status counts are exposed as status_<key>.
+    """
+    aggregates = {
+        'total': Count('id'),
+        'assigned': Count('id', filter=Q(assigned_to__isnull=False)),
+        'avg_resolution': Avg(_resolution_duration()),
+        'tickets_with_resolution_time': Count('resolved_at'),
+        'avg_actual': Avg('actual_resolution_time'),
+        'tickets_with_actual_time': Count('actual_resolution_time'),
+    }
+    for status in STATUS_KEYS:
+        aggregates[f'status_{status}'] = Count('id', filter=Q(status=status))
+    return aggregates
+
+
+def distribution_aggregates():
+    """Aggregate expressions for priority_<key> and category_<key> counts"""
+    aggregates = {}
+    for priority in PRIORITY_KEYS:
+        aggregates[f'priority_{priority}'] = Count('id', filter=Q(priority=priority))
+    for category in CATEGORY_KEYS:
+        aggregates[f'category_{category}'] = Count('id', filter=Q(category=category))
+    return aggregates
+
+
+def ticket_summary(tickets):
+    """
+    Compute all headline numbers for a ticket queryset in a single query
+
+    Args:
+        tickets: Filtered Ticket queryset
+
+    Returns:
+        dict: total, assigned, one count per status, avg_resolution_hours,
+              tickets_with_resolution_time, avg_actual_hours and tickets_with_actual_time
+    """
+    data = tickets.aggregate(**summary_aggregates())
+
+    summary = {
+        'total': data['total'],
+        'assigned': data['assigned'],
+        'avg_resolution_hours': _to_hours(data['avg_resolution']),
+        'tickets_with_resolution_time': data['tickets_with_resolution_time'],
+        'avg_actual_hours': _actual_hours(data['avg_actual']),
+        'tickets_with_actual_time': data['tickets_with_actual_time'],
+    }
+    for status in STATUS_KEYS:
+        summary[status] = data[f'status_{status}']
+
+    return summary
+
+
+def ticket_distribution(tickets):
+    """
+    Compute the priority and category distribution of a ticket queryset in a single query
+
+    Returns:
+        dict: {'priority': {key: count}, 'category': {key: count}}, keys in choice order,
+              only values that occur
+    """
+    data = tickets.aggregate(**distribution_aggregates())
+    return {
+        'priority': {key: data[f'priority_{key}'] for key in PRIORITY_KEYS if data[f'priority_{key}']},
+        'category': {key: data[f'category_{key}'] for key in CATEGORY_KEYS if data[f'category_{key}']},
+    }
+
+
+def agent_breakdown(tickets):
+    """
+    Compute the per-agent breakdown for a ticket queryset in a single GROUP BY query
+
+    Agents without a UserProfile are skipped, matching the rest of the statistics code.
+
+    Args:
+        tickets: Filtered Ticket queryset
+
+    Returns:
+        list: One dict per agent, ordered by ticket count (descending)
+    """
+    rows = tickets.filter(
+        assigned_to__isnull=False,
+        assigned_to__profile__isnull=False
+    ).values(
+        'assigned_to',
+        'assigned_to__username',
+        'assigned_to__first_name',
+        'assigned_to__last_name',
+    ).annotate(
+        ticket_count=Count('id'),
+        resolved_count=Count('id', filter=Q(status__in=RESOLVED_STATUSES)),
+        avg_resolution=Avg(_resolution_duration()),
+        tickets_with_resolution_time=Count('resolved_at'),
+        avg_actual=Avg('actual_resolution_time'),
+        tickets_with_actual_time=Count('actual_resolution_time'),
+    ).order_by('-ticket_count', 'assigned_to')
+
+    performance = []
+    for row in rows:
+        ticket_count = row['ticket_count']
+        resolved_count = row['resolved_count']
+        performance.append({
+            'agent_id': row['assigned_to'],
+            'agent_name': agent_display_name(
+                row['assigned_to__first_name'],
+                row['assigned_to__last_name'],
+                row['assigned_to__username']
+            ),
+            'ticket_count': ticket_count,
+            'resolved_count': resolved_count,
+            'resolution_rate': (resolved_count / ticket_count) * 100 if ticket_count > 0 else 0,
+            'avg_resolution_time': _to_hours(row['avg_resolution']),
+            'tickets_with_resolution_time': row['tickets_with_resolution_time'],
+            'avg_actual_resolution_time': _actual_hours(row['avg_actual']),
+            'tickets_with_actual_time': row['tickets_with_actual_time'],
+        })
+
+    logger.debug(f"Computed performance for {len(performance)} agents")
+    return performance
+
+
+def agent_work_summary(work_logs):
+    """
+    Summarize AgentWorkLog rows per agent in a single GROUP BY query
+
+    Args:
+        work_logs: Filtered AgentWorkLog queryset
+
+    Returns:
+        dict: agent_id -> {'agent_name', 'total_minutes', 'avg_minutes_per_ticket', 'ticket_count'}
+    """
+    rows = work_logs.filter(
+        agent__profile__isnull=False
+    ).values(
+        'agent',
+        'agent__username',
+        'agent__first_name',
+        'agent__last_name',
+    ).annotate(
+        total_time=Sum('work_time_minutes'),
+        ticket_count=Count('ticket', distinct=True)
+    ).order_by('agent')
+
+    stats = {}
+    for row in rows:
+        total_minutes = row['total_time'] or 0
+        ticket_count = row['ticket_count']
+        stats[row['agent']] = {
+            'agent_name': agent_display_name(
+                row['agent__first_name'],
+                row['agent__last_name'],
+                row['agent__username']
+            ),
+            'total_minutes': total_minutes,
+            'avg_minutes_per_ticket': total_minutes / ticket_count if ticket_count > 0 else 0,
+            'ticket_count': ticket_count,
+        }
+
+    return stats
@@ -0,0 +1,137 @@
+"""
+Streaming CSV/XLSX export for statistics reports.
+
+Reports are written with openpyxl write-only worksheets, so memory use stays flat no matter
+how many rows are exported. Write-only worksheets need column widths before the first row,
+so rows are spooled to a temporary file while their widths are tracked and replayed into
+the worksheet once all widths are known.
+
+Both formats end up as a FileResponse over an anonymous temporary file, which is streamed
+to the browser or copied to disk by the background report jobs.
+"""
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+import csv
+import io
+import json
+import logging
+import tempfile
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+
+# Column widths are capped, like the previous auto-size code
+MAX_COLUMN_WIDTH = 50
+
+
+class StreamingSheet:
+    """
+    Worksheet that learns its column widths while rows are written
+
+    Rows are lists of values. A value can be a (value, style_name) tuple, where style_name
+    refers to the styles passed to the constructor ({'name': {'font': ..., 'fill': ...}}).
+    """
+
+    def __init__(self, title, styles=None):
+        self.title = title
+        self.styles = styles or {}
+        self.widths = {}
+        self.merged = []
+        self.row_count = 0
+        self._spool = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+
+    def append(self, values=()):
+        """Add a row (an empty call adds a blank row)"""
+        row = []
+        for column, value in enumerate(values, 1):
+            style = None
+            if isinstance(value, tuple):
+                value, style = value
+            if value is not None:
+                self.widths[column] = max(self.widths.get(column, 0), len(str(value)))
+            row.append([value, style])
+
+        self._spool.write(json.dumps(row, default=str))
+        self._spool.write('\n')
+        self.row_count += 1
+
+    def merge(self, cell_range):
+        """Merge a range of cells, e.g. 'A1:C1'"""
+        self.merged.append(cell_range)
+
+    def write_to(self, workbook):
+        """Create the write-only worksheet in workbook and replay the spooled rows"""
+        worksheet = workbook.create_sheet(self.title)
+
+        for column, width in self.widths.items():
+            worksheet.column_dimensions[get_column_letter(column)].width = min(width + 2, MAX_COLUMN_WIDTH)
+
+        self._spool.seek(0)
+        for line in self._spool:
+            worksheet.append([self._cell(worksheet, value, style) for value, style in json.loads(line)])
+        self._spool.close()
+
+        for cell_range in self.merged:
+            worksheet.merged_cells.add(cell_range)
+
+    def _cell(self, worksheet, value, style):
+        """Plain value, or a styled WriteOnlyCell"""
+        if not style:
+            return value
+        cell = WriteOnlyCell(worksheet, value=value)
+        for attribute, style_value in self.styles[style].items():
+            setattr(cell, attribute, style_value)
+        return cell
+
+
+def xlsx_response(sheets, filename):
+    """
+    Build a write-only workbook from StreamingSheets and return it as a streamed download
+
+    The workbook is saved to an anonymous temporary file, which FileResponse streams in
+    chunks and closes (deleting it) when the response is finished.
+    """
+    workbook = Workbook(write_only=True)
+    for sheet in sheets:
+        sheet.write_to(workbook)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+
+    logger.info(f"XLSX export '{filename}' written ({sum(sheet.row_count for sheet in sheets)} rows)")
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE
+    )
+
+
+class CsvSpool:
+    """CSV rows written to an anonymous temporary file (use .writer like csv.writer)"""
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._text = io.TextIOWrapper(self._file, encoding='utf-8', newline='')
+        self.writer = csv.writer(self._text)
+
+    def response(self, filename):
+        """Return the written rows as a streamed download"""
+        self._text.flush()
+        self._text.detach()
+        self._file.seek(0)
+
+        return FileResponse(
+            self._file,
+            as_attachment=True,
+            filename=filename,
+            content_type=CSV_CONTENT_TYPE
+        )
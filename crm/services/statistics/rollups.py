@@ -0,0 +1,401 @@
+"""
+Materialized ticket statistics rollups.
+
+This module fills TicketStatistics with day/week/month/year rows per organization and per
+agent, refreshes them incrementally for periods touched by changed tickets, and combines
+the stored rows for closed periods with a live aggregate of the current open period.
+
+Each row describes the cohort of tickets created in the period, with status counts taken
+from the tickets' current status - the same semantics as the statistics dashboard.
+"""
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Max, Q
+from django.db.models.functions import Trunc
+from django.db.models import DateField
+from django.utils import timezone
+import logging
+
+from ...models import Ticket, TicketStatistics, AgentWorkLog
+from .aggregation import (
+    STATUS_KEYS, PRIORITY_KEYS, CATEGORY_KEYS, RESOLVED_STATUSES,
+    summary_aggregates, distribution_aggregates,
+    ticket_summary, ticket_distribution, agent_breakdown, agent_display_name,
+)
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Largest first - split_range uses the coarsest closed period that fits
+PERIOD_TYPES = ('year', 'month', 'week', 'day')
+
+# Rollup dimensions: name -> Ticket field
+DIMENSIONS = {
+    'organization': 'organization',
+    'agent': 'assigned_to',
+}
+
+# Tickets changed this long before the newest rollup row are recomputed again,
+# so a change committed while a refresh was running is never skipped
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def period_bounds(period_type, day):
+    """Return (start, end) dates of the period of the given type containing day"""
+    if period_type == 'day':
+        return day, day
+    if period_type == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period_type == 'month':
+        start = day.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    if period_type == 'year':
+        return day.replace(month=1, day=1), day.replace(month=12, day=31)
+    raise ValueError(f"Unknown period type: {period_type}")
+
+
+def split_range(date_from, date_to, today=None):
+    """
+    Split a date range into closed rollup periods and an open tail
+
+    Args:
+        date_from: First day of the range
+        date_to: Last day of the range
+        today: Current local date (defaults to timezone.localdate())
+
+    Returns:
+        tuple: (list of (period_type, period_start), live_from) - live_from is the first day
+               that has to be computed live, or None if the whole range is covered by rollups
+    """
+    today = today or timezone.localdate()
+    periods = []
+    cursor = date_from
+
+    while cursor <= date_to:
+        for period_type in PERIOD_TYPES:
+            start, end = period_bounds(period_type, cursor)
+            if start == cursor and end <= date_to and end < today:
+                periods.append((period_type, start))
+                cursor = end + timedelta(days=1)
+                break
+        else:
+            return periods, cursor
+
+    return periods, None
+
+
+def _day_start(day):
+    """Aware datetime of local midnight at the beginning of day"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _created_in(period_type, period_starts, field='created_at'):
+    """Q matching tickets created in any of the given periods (adjacent periods merged)"""
+    ranges = []
+    for start in sorted(period_starts):
+        _, end = period_bounds(period_type, start)
+        if ranges and ranges[-1][1] + timedelta(days=1) == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+
+    condition = Q()
+    for start, end in ranges:
+        condition |= Q(**{
+            f'{field}__gte': _day_start(start),
+            f'{field}__lt': _day_start(end + timedelta(days=1)),
+        })
+    return condition
+
+
+def _build_rows(period_type, period_starts):
+    """Compute TicketStatistics instances for the given periods (all periods if None)"""
+    tickets = Ticket.objects.all()
+    work_logs = AgentWorkLog.objects.all()
+    if period_starts is not None:
+        tickets = tickets.filter(_created_in(period_type, period_starts))
+        work_logs = work_logs.filter(_created_in(period_type, period_starts, 'ticket__created_at'))
+
+    aggregates = summary_aggregates()
+    aggregates.update(distribution_aggregates())
+
+    rows = []
+    for dimension, field in DIMENSIONS.items():
+        dimension_tickets = tickets
+        if dimension == 'agent':
+            dimension_tickets = tickets.filter(
+                assigned_to__isnull=False,
+                assigned_to__profile__isnull=False
+            )
+
+        # Average logged work time per ticket cohort, for the same grouping
+        work_field = 'agent' if dimension == 'agent' else 'ticket__organization'
+        work_times = {
+            (item['period'], item[work_field]): item['avg_time']
+            for item in work_logs.annotate(
+                period=Trunc('ticket__created_at', period_type, output_field=DateField())
+            ).values('period', work_field).annotate(
+                avg_time=Avg('work_time_minutes')
+            ).order_by()
+        }
+
+        results = dimension_tickets.annotate(
+            period=Trunc('created_at', period_type, output_field=DateField())
+        ).values('period', field).annotate(**aggregates).order_by()
+
+        for item in results:
+            period_start = item['period']
+            _, period_end = period_bounds(period_type, period_start)
+            avg_resolution = item['avg_resolution']
+            rows.append(TicketStatistics(
+                period_type=period_type,
+                period_start=period_start,
+                period_end=period_end,
+                organization_id=item[field] if dimension == 'organization' else None,
+                agent_id=item[field] if dimension == 'agent' else None,
+                tickets_opened=item['total'],
+                tickets_closed=item['status_closed'],
+                tickets_resolved=item['status_resolved'],
+                tickets_assigned=item['assigned'],
+                tickets_with_resolution_time=item['tickets_with_resolution_time'],
+                tickets_with_actual_time=item['tickets_with_actual_time'],
+                avg_resolution_time=avg_resolution.total_seconds() / 60 if avg_resolution else 0,
+                avg_agent_work_time=work_times.get((period_start, item[field])) or 0,
+                avg_actual_resolution_time=float(item['avg_actual']) if item['avg_actual'] is not None else None,
+                status_distribution={key: item[f'status_{key}'] for key in STATUS_KEYS if item[f'status_{key}']},
+                priority_distribution={key: item[f'priority_{key}'] for key in PRIORITY_KEYS if item[f'priority_{key}']},
+                category_distribution={key: item[f'category_{key}'] for key in CATEGORY_KEYS if item[f'category_{key}']},
+            ))
+
+    return rows
+
+
+def _touched_periods(since):
+    """Return {period_type: set(period_start)} for tickets changed after since"""
+    created_days = Ticket.objects.filter(
+        updated_at__gt=since
+    ).annotate(
+        day=Trunc('created_at', 'day', output_field=DateField())
+    ).values_list('day', flat=True).distinct().order_by()
+
+    touched = {period_type: set() for period_type in PERIOD_TYPES}
+    for day in created_days:
+        for period_type in PERIOD_TYPES:
+            touched[period_type].add(period_bounds(period_type, day)[0])
+    return touched
+
+
+def refresh_rollups(full=False):
+    """
+    Refresh TicketStatistics rows
+
+    Only periods containing the creation date of tickets changed since the last refresh
+    are recomputed. A full rebuild runs when requested or when no rows exist yet; it is
+    also the way to pick up deleted tickets and edited work logs.
+
+    Args:
+        full: Recompute every period from scratch
+
+    Returns:
+        int: Number of rows written
+    """
+    last_refresh = TicketStatistics.objects.aggregate(last=Max('updated_at'))['last']
+
+    if full or last_refresh is None:
+        touched = {period_type: None for period_type in PERIOD_TYPES}
+        logger.info("Rebuilding all ticket statistics rollups")
+    else:
+        touched = _touched_periods(last_refresh - REFRESH_OVERLAP)
+        logger.info(f"Refreshing ticket statistics rollups for {len(touched['day'])} changed day(s)")
+
+    written = 0
+    for period_type, period_starts in touched.items():
+        if period_starts is not None and not period_starts:
+            continue
+
+        rows = _build_rows(period_type, period_starts)
+
+        with transaction.atomic():
+            stale = TicketStatistics.objects.filter(period_type=period_type)
+            if period_starts is not None:
+                stale = stale.filter(period_start__in=period_starts)
+            stale.delete()
+            TicketStatistics.objects.bulk_create(rows, batch_size=500)
+
+        written += len(rows)
+
+    logger.info(f"Ticket statistics rollups refreshed: {written} row(s) written")
+    return written
+
+
+class _Totals:
+    """Accumulates rollup rows and live aggregates into one summary"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.resolution_hours = 0.0
+        self.actual_hours = 0.0
+
+    def add_row(self, row):
+        """Add a TicketStatistics row"""
+        self.counts['total'] += row.tickets_opened
+        self.counts['assigned'] += row.tickets_assigned
+        self.counts['tickets_with_resolution_time'] += row.tickets_with_resolution_time
+        self.counts['tickets_with_actual_time'] += row.tickets_with_actual_time
+        self.resolution_hours += row.avg_resolution_time / 60 * row.tickets_with_resolution_time
+        self.actual_hours += (row.avg_actual_resolution_time or 0) * row.tickets_with_actual_time
+        for prefix, distribution in (('status', row.status_distribution),
+                                     ('priority', row.priority_distribution),
+                                     ('category', row.category_distribution)):
+            for key, count in distribution.items():
+                self.counts[f'{prefix}_{key}'] += count
+
+    def add_live(self, summary, distribution=None):
+        """Add the output of ticket_summary (and optionally ticket_distribution)"""
+        for key in ('total', 'assigned', 'tickets_with_resolution_time', 'tickets_with_actual_time'):
+            self.counts[key] += summary[key]
+        self.resolution_hours += summary['avg_resolution_hours'] * summary['tickets_with_resolution_time']
+        self.actual_hours += (summary['avg_actual_hours'] or 0) * summary['tickets_with_actual_time']
+        for status in STATUS_KEYS:
+            self.counts[f'status_{status}'] += summary[status]
+        for prefix, values in (distribution or {}).items():
+            for key, count in values.items():
+                self.counts[f'{prefix}_{key}'] += count
+
+    def summary(self):
+        """Summary in the format returned by ticket_summary"""
+        with_resolution = self.counts['tickets_with_resolution_time']
+        with_actual = self.counts['tickets_with_actual_time']
+        summary = {
+            'total': self.counts['total'],
+            'assigned': self.counts['assigned'],
+            'avg_resolution_hours': self.resolution_hours / with_resolution if with_resolution else 0,
+            'tickets_with_resolution_time': with_resolution,
+            'avg_actual_hours': (self.actual_hours / with_actual) if with_actual and self.actual_hours else None,
+            'tickets_with_actual_time': with_actual,
+        }
+        for status in STATUS_KEYS:
+            summary[status] = self.counts[f'status_{status}']
+        return summary
+
+    def distribution(self):
+        """Distribution in the format returned by ticket_distribution"""
+        return {
+            'priority': {key: self.counts[f'priority_{key}'] for key in PRIORITY_KEYS if self.counts[f'priority_{key}']},
+            'category': {key: self.counts[f'category_{key}'] for key in CATEGORY_KEYS if self.counts[f'category_{key}']},
+        }
+
+
+def _periods_query(periods):
+    """Q matching TicketStatistics rows of the given (period_type, period_start) pairs"""
+    condition = Q()
+    by_type = {}
+    for period_type, period_start in periods:
+        by_type.setdefault(period_type, []).append(period_start)
+    for period_type, starts in by_type.items():
+        condition |= Q(period_type=period_type, period_start__in=starts)
+    return condition
+
+
+def summarize_range(tickets, date_from, date_to, organization_ids=None, include_agents=False):
+    """
+    Summarize tickets created between date_from and date_to using rollups where possible
+
+    Closed periods are read from TicketStatistics organization rows, the open period is
+    aggregated live from the tickets queryset. Only valid when tickets is filtered by date
+    range and organization alone - agent and on-duty filters need a fully live query.
+
+    Args:
+        tickets: Ticket queryset already filtered to the date range and organizations
+        date_from: First day of the range
+        date_to: Last day of the range
+        organization_ids: Organizations in scope (None for all)
+        include_agents: Also build the agent breakdown from agent rows (only valid for all organizations)
+
+    Returns:
+        tuple: (summary, distribution, agents) in the formats of ticket_summary, ticket_distribution
+               and agent_breakdown (agents is None unless include_agents), or None when the
+               rollups have not been built yet
+    """
+    if not TicketStatistics.objects.exists():
+        return None
+
+    periods, live_from = split_range(date_from, date_to)
+
+    totals = _Totals()
+    agent_totals = {}
+
+    if periods:
+        rows = TicketStatistics.objects.filter(_periods_query(periods))
+        organization_rows = rows.filter(organization__isnull=False, agent__isnull=True)
+        if organization_ids is not None:
+            organization_rows = organization_rows.filter(organization_id__in=organization_ids)
+        for row in organization_rows:
+            totals.add_row(row)
+
+        if include_agents:
+            for row in rows.filter(agent__isnull=False, organization__isnull=True):
+                agent_totals.setdefault(row.agent_id, _Totals()).add_row(row)
+
+    if live_from is not None:
+        live_tickets = tickets.filter(created_at__gte=_day_start(live_from))
+        totals.add_live(ticket_summary(live_tickets), ticket_distribution(live_tickets))
+
+        if include_agents:
+            for agent in agent_breakdown(live_tickets):
+                agent_totals.setdefault(agent['agent_id'], _Totals()).add_live({
+                    'total': agent['ticket_count'],
+                    'assigned': agent['ticket_count'],
+                    'tickets_with_resolution_time': agent['tickets_with_resolution_time'],
+                    'tickets_with_actual_time': agent['tickets_with_actual_time'],
+                    'avg_resolution_hours': agent['avg_resolution_time'],
+                    'avg_actual_hours': agent['avg_actual_resolution_time'],
+                    # Only the resolved/closed split matters for the agent breakdown
+                    **{status: 0 for status in STATUS_KEYS},
+                    'resolved': agent['resolved_count'],
+                })
+
+    agents = None
+    if include_agents:
+        agents = _agent_list(agent_totals)
+
+    return totals.summary(), totals.distribution(), agents
+
+
+def _agent_list(agent_totals):
+    """Turn per-agent totals into the list format returned by agent_breakdown"""
+    from django.contrib.auth.models import User
+
+    names = {
+        user['id']: agent_display_name(user['first_name'], user['last_name'], user['username'])
+        for user in User.objects.filter(id__in=agent_totals.keys()).values(
+            'id', 'username', 'first_name', 'last_name'
+        )
+    }
+
+    agents = []
+    for agent_id, agent_total in agent_totals.items():
+        summary = agent_total.summary()
+        ticket_count = summary['total']
+        if not ticket_count or agent_id not in names:
+            continue
+        resolved_count = sum(summary[status] for status in RESOLVED_STATUSES)
+        agents.append({
+            'agent_id': agent_id,
+            'agent_name': names[agent_id],
+            'ticket_count': ticket_count,
+            'resolved_count': resolved_count,
+            'resolution_rate': (resolved_count / ticket_count) * 100,
+            'avg_resolution_time': summary['avg_resolution_hours'],
+            'tickets_with_resolution_time': summary['tickets_with_resolution_time'],
+            'avg_actual_resolution_time': summary['avg_actual_hours'],
+            'tickets_with_actual_time': summary['tickets_with_actual_time'],
+        })
+
+    agents.sort(key=lambda agent: (-agent['ticket_count'], agent['agent_id']))
+    return agents
@@ -0,0 +1,67 @@
+"""
+Batch recomputation of AgentWorkLog working time.
+
+AgentWorkLog.work_time_minutes is computed when a log is stopped, using the WorkHours
+schedule of that moment. When WorkHours change, historical logs are re-costed here in
+chunks: start and end times are loaded as plain columns, all working times of a chunk are
+computed against one schedule and the changed rows are written back with bulk_update.
+"""
+
+from itertools import islice
+import logging
+
+from ...models import AgentWorkLog
+from ..business_calendar import get_work_schedule
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Differences below this (in minutes) are rounding noise, not a changed schedule
+TOLERANCE_MINUTES = 0.01
+
+
+def recompute_work_log_minutes(work_logs=None, chunk_size=2000, dry_run=False):
+    """
+    Recompute work_time_minutes of finished work logs with the current WorkHours
+
+    Args:
+        work_logs: AgentWorkLog queryset to process (all logs by default)
+        chunk_size: Rows loaded and written per batch
+        dry_run: Only count the rows that would change
+
+    Returns:
+        tuple: (checked_count, changed_count)
+    """
+    if work_logs is None:
+        work_logs = AgentWorkLog.objects.all()
+
+    schedule = get_work_schedule()
+    rows = work_logs.filter(
+        end_time__isnull=False
+    ).order_by('id').values_list(
+        'id', 'start_time', 'end_time', 'work_time_minutes'
+    ).iterator(chunk_size=chunk_size)
+
+    checked = 0
+    changed = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        ids, starts, ends, current = zip(*chunk)
+        minutes = schedule.work_minutes_many(zip(starts, ends))
+
+        stale = [
+            AgentWorkLog(id=log_id, work_time_minutes=new_minutes)
+            for log_id, old_minutes, new_minutes in zip(ids, current, minutes)
+            if abs((old_minutes or 0) - new_minutes) > TOLERANCE_MINUTES
+        ]
+        if stale and not dry_run:
+            AgentWorkLog.objects.bulk_update(stale, ['work_time_minutes'])
+
+        checked += len(chunk)
+        changed += len(stale)
+
+    logger.info(f"Recomputed work time of {checked} work logs, {changed} changed{' (dry run)' if dry_run else ''}")
+    return checked, changed
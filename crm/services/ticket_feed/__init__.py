@@ -0,0 +1,18 @@
+"""
+Ticket feed services package for the CRM application.
+
+This package provides incremental ticket board updates: cursors over ticket changes,
+tombstones of deleted tickets, the status counts shown next to the board and the
+in-process event hub behind the Server-Sent Events stream.
+"""
+
+from .delta import (
+    CursorExpired,
+    encode_cursor,
+    decode_cursor,
+    current_cursor,
+    record_removed_ticket,
+    status_counts,
+    ticket_changes,
+)
+from .hub import hub, subscriber_scope, ticket_event
@@ -0,0 +1,234 @@
+"""
+Incremental ticket board updates.
+
+Ticket boards keep a cursor - the (updated_at, id) of the newest change they have seen,
+plus the time the cursor was issued and the last tombstone they have seen - and ask only
+for tickets changed after it. A poll without changes is a single range read on the
+updated_at index.
+
+updated_at is stamped when the ticket is saved, before its transaction commits, so a
+change can become visible after a later-stamped one was already read. Every delta therefore
+re-reads the CHANGE_OVERLAP before the cursor as well; the board replaces rows it already has.
+
+Changes are only looked for among the tickets the user may see (SubscriberScope), so a
+board never learns about tickets of other organizations.
+
+Deleted tickets leave no row to find, so they are kept as tombstones in the cache for
+TOMBSTONE_TTL: one key per tombstone, numbered in sequence. A ticket moved to another
+organization leaves a tombstone for its old organization too. A cursor older than
+TOMBSTONE_TTL can no longer be answered and the board has to reload the full list.
+Tombstones must be visible to every worker process, so this needs a shared cache (see
+CACHES) - with a per-process LocMemCache boards polling another worker miss deletions.
+"""
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+import logging
+import time
+
+from ...models import Ticket
+from ..access.versions import new_version
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+CURSOR_SALT = 'crm.ticket_board.cursor'
+
+# Changed tickets returned per request; the board asks again right away when there are more
+DELTA_LIMIT = 200
+
+# Changes stamped this long before the cursor are read again (transactions committing late)
+CHANGE_OVERLAP = timedelta(seconds=15)
+
+# Number of the newest tombstone; a hint only, the tombstone keys themselves claim numbers
+TOMBSTONE_SEQUENCE_KEY = 'crm:ticket_feed:removed:seq'
+TOMBSTONE_KEY = 'crm:ticket_feed:removed:{}'
+TOMBSTONE_TTL = timedelta(hours=24)
+# More deletions since a cursor than this and the board reloads the full list
+MAX_TOMBSTONES = 1000
+# Numbers past the sequence key that are checked too (it can lag behind concurrent writers)
+TOMBSTONE_LOOKAHEAD = 4
+
+STATUS_KEYS = tuple(key for key, _ in Ticket.STATUS_CHOICES)
+
+
+class CursorExpired(Exception):
+    """The cursor is invalid or too old to compute a delta from"""
+
+
+def encode_cursor(updated_at, ticket_id, issued_at=None, removed_seq=0):
+    """Sign a board cursor"""
+    issued_at = issued_at if issued_at is not None else time.time()
+    return signing.dumps(
+        [updated_at.isoformat() if updated_at else None, ticket_id, issued_at, removed_seq],
+        salt=CURSOR_SALT,
+        compress=True
+    )
+
+
+def decode_cursor(token):
+    """
+    Read a board cursor
+
+    Returns:
+        tuple: (updated_at or None, ticket_id, issued_at, removed_seq)
+
+    Raises:
+        CursorExpired: When the token is invalid or older than the tombstone retention
+    """
+    try:
+        updated_at, ticket_id, issued_at, removed_seq = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise CursorExpired('Invalid cursor')
+
+    if time.time() - issued_at > TOMBSTONE_TTL.total_seconds():
+        raise CursorExpired('Cursor older than the tombstone retention')
+
+    return (parse_datetime(updated_at) if updated_at else None), ticket_id, issued_at, removed_seq
+
+
+def _tombstone_sequence():
+    """Number of the newest tombstone (0 when none was recorded or the key was lost)"""
+    return cache.get(TOMBSTONE_SEQUENCE_KEY, 0)
+
+
+def current_cursor():
+    """Cursor pointing at the newest ticket change (for a freshly rendered board)"""
+    removed_seq = _tombstone_sequence()
+    latest = Ticket.objects.order_by('-updated_at', '-id').values_list('updated_at', 'id').first()
+    if latest:
+        return encode_cursor(*latest, removed_seq=removed_seq)
+    return encode_cursor(None, 0, removed_seq=removed_seq)
+
+
+def record_removed_ticket(ticket_id, organization_id, created_by_id):
+    """
+    Remember that a ticket left the boards of an organization (deleted or moved)
+
+    Args:
+        ticket_id: Id of the ticket
+        organization_id, created_by_id: Scope the ticket was visible in, so only boards that
+                                        could see it are told
+    """
+    tombstone = {
+        'ticket_id': ticket_id,
+        'organization_id': organization_id,
+        'created_by_id': created_by_id,
+    }
+    sequence = cache.get(TOMBSTONE_SEQUENCE_KEY)
+    if sequence is None:
+        # A lost counter restarts far ahead of every cursor, so boards reload instead of
+        # missing tombstones stored under reused numbers
+        sequence = new_version()
+    # add() claims a number atomically with every backend (the database cache's incr() is
+    # a read and a write), so concurrent deletions never share one
+    sequence += 1
+    while not cache.add(TOMBSTONE_KEY.format(sequence), tombstone, int(TOMBSTONE_TTL.total_seconds())):
+        sequence += 1
+    cache.set(TOMBSTONE_SEQUENCE_KEY, sequence, None)
+
+
+def _removed_since(removed_seq, scope):
+    """
+    Ids of tickets removed from the scope after a cursor
+
+    The sequence key is written after the tombstone, and concurrent writers may set it out of
+    order, so a few numbers past it are read as well.
+
+    Returns:
+        tuple: (set of ticket ids, number of the newest tombstone read)
+
+    Raises:
+        CursorExpired: When the tombstones since the cursor are no longer all available
+    """
+    newest = _tombstone_sequence()
+    if newest == 0 and removed_seq:
+        raise CursorExpired('Tombstone counter was lost')
+    if newest - removed_seq > MAX_TOMBSTONES:
+        raise CursorExpired('Too many tickets removed since the cursor')
+
+    numbers = range(removed_seq + 1, max(newest, removed_seq) + TOMBSTONE_LOOKAHEAD + 1)
+    found = cache.get_many([TOMBSTONE_KEY.format(sequence) for sequence in numbers])
+    removed = set()
+    for sequence in numbers:
+        tombstone = found.get(TOMBSTONE_KEY.format(sequence))
+        if tombstone is None:
+            continue
+        newest = max(newest, sequence)
+        if scope is None or scope.allows(tombstone):
+            removed.add(tombstone['ticket_id'])
+    return removed, max(newest, removed_seq)
+
+
+def status_counts(tickets):
+    """Number of tickets per status in a single query"""
+    data = tickets.aggregate(**{
+        status: Count('id', filter=Q(status=status)) for status in STATUS_KEYS
+    })
+    return {status: data[status] for status in STATUS_KEYS}
+
+
+def ticket_changes(visible_tickets, cursor, scope=None, limit=DELTA_LIMIT):
+    """
+    Tickets changed after a cursor
+
+    Changes are read from the tickets in the user's scope in (updated_at, id) order and
+    then checked against visible_tickets, so a ticket that moved out of the board (other
+    status or priority filter) is reported as removed. Changes within CHANGE_OVERLAP before
+    the cursor are returned again.
+
+    Args:
+        visible_tickets: Queryset of the tickets the board shows (scope and filters applied)
+        cursor: Token from encode_cursor / a previous delta
+        scope: SubscriberScope of the user (None - all tickets)
+        limit: Maximum number of changed tickets after the cursor
+
+    Returns:
+        dict: 'changed' (Ticket list), 'removed' (id list), 'cursor' (new token) and
+              'has_more' (more changes are waiting)
+
+    Raises:
+        CursorExpired: When the board has to reload the full list
+    """
+    updated_at, last_id, issued_at, removed_seq = decode_cursor(cursor)
+    issued_now = time.time()
+
+    changes = Ticket.objects.order_by('updated_at', 'id')
+    if scope is not None:
+        changes = changes.filter(scope.ticket_filter())
+
+    late_ids = []
+    if updated_at is not None:
+        after_cursor = Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=last_id)
+        late_ids = list(
+            changes.filter(updated_at__gte=updated_at - CHANGE_OVERLAP).exclude(after_cursor)
+            .values_list('id', flat=True)
+        )
+        changes = changes.filter(after_cursor)
+    rows = list(changes.values_list('id', 'updated_at')[:limit + 1])
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    removed, removed_seq = _removed_since(removed_seq, scope)
+    if removed:
+        # A ticket moved out of an organization can still be visible (e.g. to its creator)
+        removed.difference_update(visible_tickets.filter(id__in=removed).values_list('id', flat=True))
+
+    changed = []
+    changed_ids = late_ids + [ticket_id for ticket_id, _ in rows]
+    if changed_ids:
+        changed = list(visible_tickets.filter(id__in=changed_ids).order_by('-created_at'))
+        visible_ids = {ticket.id for ticket in changed}
+        removed.update(ticket_id for ticket_id in changed_ids if ticket_id not in visible_ids)
+    if rows:
+        last_id, updated_at = rows[-1][0], rows[-1][1]
+
+    return {
+        'changed': changed,
+        'removed': sorted(removed),
+        'cursor': encode_cursor(updated_at, last_id, issued_now, removed_seq),
+        'has_more': has_more,
+    }
@@ -0,0 +1,146 @@
+"""
+In-process broadcast of ticket events to Server-Sent Events subscribers.
+
+Ticket and TicketComment signals publish small events (ticket id, kind of change, status)
+from whatever thread saved the model; every open SSE stream owns an asyncio queue on the
+ASGI event loop and receives the events its user is allowed to see. Events are only a
+nudge: the board fetches the actual changes from the delta endpoint, so dropped events
+(full queue, another worker process) cost nothing but latency.
+"""
+
+from dataclasses import dataclass, field
+from django.db.models import Q
+import asyncio
+import logging
+import threading
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Events waiting per subscriber; more are dropped (one pending event already triggers a refresh)
+MAX_PENDING_EVENTS = 100
+
+# Roles limited to their organizations (see the board scope in ticket_display_views)
+ORGANIZATION_ROLES = ('agent', 'superagent')
+
+
+@dataclass(frozen=True)
+class SubscriberScope:
+    """Which ticket events a subscriber may receive"""
+
+    user_id: int
+    role: str
+    organization_ids: frozenset = field(default_factory=frozenset)
+
+    def allows(self, event):
+        if self.role == 'client':
+            return event['organization_id'] in self.organization_ids or event['created_by_id'] == self.user_id
+        if self.role in ORGANIZATION_ROLES:
+            return event['organization_id'] in self.organization_ids
+        return True
+
+    def ticket_filter(self):
+        """The same scope as a Ticket queryset filter"""
+        if self.role == 'client':
+            return Q(organization_id__in=self.organization_ids) | Q(created_by_id=self.user_id)
+        if self.role in ORGANIZATION_ROLES:
+            return Q(organization_id__in=self.organization_ids)
+        return Q()
+
+
+def subscriber_scope(user):
+    """Build the event scope of a user (runs database queries - call from sync code)"""
+    profile = getattr(user, 'profile', None)
+    if profile is None:
+        # Accounts without a profile (e.g. a bare superuser) get no organization scope
+        return SubscriberScope(user_id=user.id, role='admin' if user.is_superuser else 'client')
+    role = profile.role
+    organization_ids = frozenset(profile.organizations.values_list('id', flat=True))
+    return SubscriberScope(user_id=user.id, role=role, organization_ids=organization_ids)
+
+
+class Subscription:
+    """Queue of events for one SSE stream, bound to the event loop that reads it"""
+
+    def __init__(self, scope, loop):
+        self.scope = scope
+        self.loop = loop
+        self.queue = asyncio.Queue(MAX_PENDING_EVENTS)
+
+    def _deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout):
+        """Next event, or None after timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class TicketEventHub:
+    """Thread-safe fan-out of ticket events to subscriptions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self, scope):
+        """Register a subscription on the running event loop"""
+        subscription = Subscription(scope, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def publish(self, event):
+        """
+        Send an event to every subscription whose scope allows it
+
+        Safe to call from any thread; delivery happens on each subscription's event loop.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            if not subscription.scope.allows(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:
+                # Event loop already closed - the stream is gone
+                self.unsubscribe(subscription)
+
+
+hub = TicketEventHub()
+
+
+def ticket_event(ticket, kind):
+    """
+    Build the event describing a ticket change
+
+    Args:
+        ticket: Ticket instance (after saving)
+        kind: 'created', 'updated', 'status' or 'commented'
+
+    Returns:
+        dict: Event with the fields subscriber scopes are checked against
+    """
+    return {
+        'kind': kind,
+        'ticket_id': ticket.pk,
+        'status': ticket.status,
+        'organization_id': ticket.organization_id,
+        'created_by_id': ticket.created_by_id,
+    }
@@ -1,11 +1,14 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from .models import UserProfile
 from django.utils import timezone
 import logging
 from django.core.cache import cache
+from django.db import transaction
 from django.contrib.auth.signals import user_logged_in, user_logged_out
-from .models import ActivityLog
+from .models import ActivityLog, WorkHours, Holiday, Ticket, TicketComment
+from .models import GroupSettings, GroupViewPermission, UserViewPermission, ViewPermission, TrustedDevice
+from django.contrib.auth.models import Group, User
 
 logger = logging.getLogger(__name__)
 
@@ -86,3 +89,154 @@ def user_logged_in_handler(sender, request, user, **kwargs):
             trusted_ips.append(ip)
             request.session['trusted_admin_ips'] = trusted_ips
             logger.debug(f"Added IP {ip} to trusted admin IPs for this session")
+
+
+@receiver([post_save, post_delete], sender=WorkHours)
+@receiver([post_save, post_delete], sender=Holiday)
+def invalidate_work_schedule(sender, **kwargs):
+    """Reload the cached work schedule after WorkHours or Holiday changes"""
+    from .services.business_calendar import clear_work_schedule_cache
+    clear_work_schedule_cache()
+
+
+def _reindex_after_commit(ticket_id):
+    """Refresh a ticket's search document once the current transaction commits"""
+    def reindex():
+        from .services.search import index_tickets
+        try:
+            index_tickets([ticket_id])
+        except Exception as e:
+            # A stale search document must never break saving the ticket
+            logger.error(f"Failed to update search index for ticket {ticket_id}: {e}")
+    transaction.on_commit(reindex)
+
+
+def _publish_after_commit(ticket, kind):
+    """Push a ticket event to live subscribers once the current transaction commits"""
+    from .services.ticket_feed import hub, ticket_event
+    event = ticket_event(ticket, kind)
+    transaction.on_commit(lambda: hub.publish(event))
+
+
+def _record_removal_after_commit(ticket_id, organization_id, created_by_id):
+    """Leave a ticket board tombstone once the current transaction commits"""
+    def record_removal():
+        from .services.ticket_feed import record_removed_ticket
+        record_removed_ticket(ticket_id, organization_id, created_by_id)
+    transaction.on_commit(record_removal)
+
+
+@receiver(post_save, sender=Ticket)
+def index_ticket(sender, instance, **kwargs):
+    """Keep the search index in sync with ticket title and description"""
+    _reindex_after_commit(instance.pk)
+
+
+@receiver(post_save, sender=Ticket)
+def publish_ticket_change(sender, instance, created, **kwargs):
+    """Notify live ticket boards about created and changed tickets"""
+    if created:
+        kind = 'created'
+    elif getattr(instance, '_previous_status', instance.status) != instance.status:
+        kind = 'status'
+    else:
+        kind = 'updated'
+    _publish_after_commit(instance, kind)
+
+    previous_organization_id = getattr(instance, '_previous_organization_id', instance.organization_id)
+    if previous_organization_id != instance.organization_id:
+        # Boards of the old organization drop the ticket
+        _record_removal_after_commit(instance.pk, previous_organization_id, instance.created_by_id)
+
+
+@receiver([post_save, post_delete], sender=TicketComment)
+def index_ticket_comment(sender, instance, **kwargs):
+    """Comments are searchable as part of their ticket"""
+    _reindex_after_commit(instance.ticket_id)
+
+
+@receiver(post_save, sender=TicketComment)
+def publish_ticket_comment(sender, instance, created, **kwargs):
+    """Notify live ticket boards about new comments"""
+    if created:
+        _publish_after_commit(instance.ticket, 'commented')
+
+
+@receiver(post_delete, sender=Ticket)
+def unindex_ticket(sender, instance, **kwargs):
+    """Drop deleted tickets from the search index and from ticket boards"""
+    _reindex_after_commit(instance.pk)
+    _record_removal_after_commit(instance.pk, instance.organization_id, instance.created_by_id)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+@receiver([post_save, post_delete], sender=User)
+def invalidate_profile_access(sender, instance, **kwargs):
+    """Rebuild the access snapshot after profile or account changes"""
+    from .services.access import invalidate_user_access
+    invalidate_user_access(instance.user_id if sender is UserProfile else instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserViewPermission)
+def invalidate_user_view_access(sender, instance, **kwargs):
+    """Rebuild the access snapshot after user view permission changes"""
+    from .services.access import invalidate_user_access
+    invalidate_user_access(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_membership_access(sender, instance, action, reverse, pk_set, **kwargs):
+    """Rebuild access snapshots of users added to or removed from groups"""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    from .services.access import invalidate_all_access, invalidate_user_access
+    if not reverse:
+        invalidate_user_access(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            invalidate_user_access(user_id)
+    else:
+        # group.user_set.clear() does not say which users were removed
+        invalidate_all_access()
+
+
+@receiver([post_save, post_delete], sender=GroupSettings)
+@receiver([post_save, post_delete], sender=GroupViewPermission)
+@receiver([post_save, post_delete], sender=ViewPermission)
+@receiver(post_delete, sender=Group)
+def invalidate_group_access(sender, **kwargs):
+    """Group-level settings and permissions affect every member - rebuild all snapshots"""
+    from .services.access import invalidate_all_access
+    invalidate_all_access()
+
+
+@receiver([post_save, post_delete], sender=TrustedDevice)
+def invalidate_trusted_device_checks(sender, instance, **kwargs):
+    """Drop cached trusted-device answers after a device is added, renewed or revoked"""
+    from .services.access import invalidate_trusted_devices
+    invalidate_trusted_devices(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_notification_staff(sender, instance, update_fields=None, **kwargs):
+    """Role changes decide who hears about new tickets of every organization"""
+    if update_fields is not None and 'role' not in update_fields:
+        return
+    from .services.email.stakeholders import invalidate_organization_staff
+    invalidate_organization_staff()
+
+
+@receiver(m2m_changed, sender=UserProfile.organizations.through)
+def invalidate_notification_staff_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Agents joining or leaving organizations change who hears about their tickets"""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    from .services.email.stakeholders import invalidate_organization_staff
+    if reverse:
+        # organization.members.add(...) - one organization changed
+        invalidate_organization_staff([instance.pk])
+    elif pk_set:
+        invalidate_organization_staff(pk_set)
+    else:
+        # profile.organizations.clear() does not say which organizations were left
+        invalidate_organization_staff()
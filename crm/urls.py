@@ -10,7 +10,7 @@ from .views import (
     ticket_close, ticket_reopen, ticket_assign_to_me,
     activity_logs, activity_log_detail,
     pending_approvals, approve_user, reject_user,
-    ticket_display_view, get_tickets_update
+    ticket_display_view, get_tickets_update, get_tickets_delta, ticket_events
 )
 from .views.auth_views import (
     unlock_user, HTMLEmailPasswordResetView, EnhancedPasswordResetConfirmView, 
@@ -23,6 +23,7 @@ from . import views
 from .views import secure_file_views, log_views  # Add log_views import here
 from django.contrib.auth import views as auth_views
 from .views.statistics_views import statistics_dashboard, update_agent_work_log, generate_statistics_report, generate_organization_report
+from .views.report_job_views import report_job_create, report_job_status, report_job_download
 from .views.tickets.unassignment_views import ticket_unassign
 from .views.tickets.assignment_views import ticket_assign_to_other
 from .views.two_factor_views import setup_2fa, setup_2fa_success, disable_2fa, verify_2fa, recovery_code
@@ -122,8 +123,13 @@ urlpatterns = [
     path('statistics/update-work-log/', update_agent_work_log, name='update_work_log'),
     path('statistics/generate-report/', generate_statistics_report, name='generate_statistics_report'),
     path('statistics/organization-report/', generate_organization_report, name='generate_organization_report'),
+    path('statistics/report-jobs/', report_job_create, name='report_job_create'),
+    path('statistics/report-jobs/<int:job_id>/', report_job_status, name='report_job_status'),
+    path('statistics/report-jobs/<int:job_id>/download/', report_job_download, name='report_job_download'),
 
     path('get_tickets_update/', get_tickets_update, name='get_tickets_update'),
+    path('get_tickets_delta/', get_tickets_delta, name='get_tickets_delta'),
+    path('tickets/events/', ticket_events, name='ticket_events'),
 
     # Ticket solution confirmation
     path('tickets/<int:pk>/confirm-solution/', ticket_confirm_solution, name='ticket_confirm_solution'),
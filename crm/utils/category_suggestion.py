@@ -2,7 +2,10 @@
 Module for automatic category suggestion based on ticket content
 """
 import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
 from difflib import SequenceMatcher
+from functools import lru_cache
 
 # Keywords for each category (in Polish)
 CATEGORY_KEYWORDS = {
@@ -155,6 +158,118 @@ def preprocess_text(text):
     
     return words
 
+# Similarity a word needs to count as a fuzzy match of a keyword
+FUZZY_THRESHOLD = 0.8
+
+class KeywordIndex:
+    """
+    Keyword lookup structures built once at import
+
+    Exact matches are a dictionary lookup of the word (and of its form without diacritics).
+    For fuzzy matches only keywords that can reach the similarity threshold are compared
+    with SequenceMatcher: its ratio 2*M/T is at most twice the number of characters the two
+    strings share over T. Shared characters are counted for all keywords at once through an
+    inverted index of (character, occurrence) pairs, so keywords with too few common
+    characters are skipped without changing the result.
+    """
+
+    def __init__(self, category_keywords, threshold=FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self.categories = list(category_keywords)
+        # word -> categories where it is a keyword (original / without diacritics)
+        self.exact = {}
+        self.exact_normalized = {}
+        # (category, keyword) pairs ordered by length; the inverted indexes point into this
+        # list, so each posting list is ordered by keyword length as well
+        self.keywords = []
+        self.lengths = []
+        self.postings = {}
+        self.normalized_postings = {}
+        for category, keywords in category_keywords.items():
+            for keyword in keywords:
+                normalized = normalize_polish_chars(keyword)
+                self.exact.setdefault(keyword, set()).add(category)
+                self.exact_normalized.setdefault(normalized, set()).add(category)
+                self.keywords.append((category, keyword))
+        self.keywords.sort(key=lambda entry: len(entry[1]))
+        for position, (category, keyword) in enumerate(self.keywords):
+            self.lengths.append(len(keyword))
+            for pair in self._char_pairs(keyword):
+                self.postings.setdefault(pair, []).append(position)
+            for pair in self._char_pairs(normalize_polish_chars(keyword)):
+                self.normalized_postings.setdefault(pair, []).append(position)
+
+    @staticmethod
+    def _char_pairs(text):
+        """(character, n-th occurrence) pairs - two texts share as many pairs as characters"""
+        seen = Counter()
+        pairs = []
+        for char in text:
+            seen[char] += 1
+            pairs.append((char, seen[char]))
+        return pairs
+
+    def _length_range(self, length):
+        """
+        Positions [start, end) of the keywords long enough and short enough to be similar
+
+        The ratio is also at most 2*min(length, keyword length)/T.
+        """
+        start = bisect_left(self.lengths, length * 2 / 3 - 1)
+        end = bisect_right(self.lengths, length * 3 / 2 + 1)
+        return start, end
+
+    def _shared_chars(self, word, postings, start, end):
+        """Number of characters each keyword in [start, end) shares with the word (keywords sharing none are left out)"""
+        shared = Counter()
+        for pair in self._char_pairs(word):
+            positions = postings.get(pair)
+            if positions:
+                shared.update(positions[bisect_left(positions, start):bisect_left(positions, end)])
+        return shared
+
+    def fuzzy_categories(self, word, skip=()):
+        """Categories (other than skip) with a keyword similar to the word"""
+        # Characters shared with the original or the normalized keyword, whichever is more
+        length = len(word)
+        start, end = self._length_range(length)
+        shared = self._shared_chars(word, self.postings, start, end) | self._shared_chars(
+            normalize_polish_chars(word), self.normalized_postings, start, end
+        )
+        candidates = [
+            position for position, count in shared.items()
+            if 2.0 * count / (length + self.lengths[position]) >= self.threshold
+        ]
+
+        found = set()
+        for position in candidates:
+            category, keyword = self.keywords[position]
+            if category in skip or category in found:
+                continue
+            if similar(word, keyword, threshold=self.threshold):
+                found.add(category)
+        return found
+
+    @lru_cache(maxsize=4096)
+    def word_matches(self, word):
+        """
+        Score contributions of one word
+
+        Returns:
+            tuple: (category, score) pairs in category order - 1.0 for an exact keyword,
+                   0.5 for a similar one
+        """
+        exact = self.exact.get(word, set()) | self.exact_normalized.get(normalize_polish_chars(word), set())
+        fuzzy = self.fuzzy_categories(word, skip=exact)
+        return tuple(
+            (category, 1.0 if category in exact else 0.5)
+            for category in self.categories
+            if category in exact or category in fuzzy
+        )
+
+KEYWORD_INDEX = KeywordIndex(CATEGORY_KEYWORDS)
+EXCEPTION_WORD_SET = frozenset(EXCEPTION_WORDS)
+
 def detect_category(title, description):
     """
     Analyzes the ticket title and description to suggest the most appropriate category
@@ -167,37 +282,22 @@ def detect_category(title, description):
     combined_text = f"{title} {description}"
     words = preprocess_text(combined_text)
     
-    # Also create normalized versions of words without Polish diacritical marks
-    normalized_words = [normalize_polish_chars(word) for word in words]
-    
     # Count matches for each category
     category_scores = {category: 0 for category in CATEGORY_KEYWORDS}
     match_details = {category: [] for category in CATEGORY_KEYWORDS}
     
-    # Check both original words and their normalized versions
-    for word, norm_word in zip(words, normalized_words):
+    for word in words:
         if len(word) < 3:  # Skip very short words
             continue
             
         # Skip exception words - to prevent false positives
-        if word.lower() in EXCEPTION_WORDS:
+        if word in EXCEPTION_WORD_SET:
             continue
-            
-        for category, keywords in CATEGORY_KEYWORDS.items():
-            # Normalize keywords for comparison
-            norm_keywords = [normalize_polish_chars(kw) for kw in keywords]
-            
-            # Check for exact matches (both original and normalized)
-            if word in keywords or norm_word in norm_keywords:
-                category_scores[category] += 1
-                match_details[category].append((word, 1.0))
-            else:
-                # Check for similar words (fuzzy matching)
-                for keyword in keywords:
-                    if similar(word, keyword, threshold=0.8):
-                        category_scores[category] += 0.5  # Lower score for fuzzy matches
-                        match_details[category].append((word, 0.5))
-                        break
+        
+        # Exact matches (original or without diacritics) score 1, similar words 0.5
+        for category, score in KEYWORD_INDEX.word_matches(word):
+            category_scores[category] += score
+            match_details[category].append((word, score))
     
     # Find category with highest score
     best_category = max(category_scores, key=category_scores.get)
@@ -222,7 +322,12 @@ def should_suggest_category(selected_category, title, description, confidence_th
     Returns:
         tuple: (should_suggest, suggested_category, confidence, match_details)
     """
-    suggested_category, confidence, match_details = detect_category(title, description)
+    # Trained model when available, keyword heuristic otherwise
+    from ..services.categorization import predict_category
+    prediction = predict_category(title, description)
+    if prediction is None:
+        prediction = detect_category(title, description)
+    suggested_category, confidence, match_details = prediction
     
     # Only suggest if confidence is high enough and different from selected
     should_suggest = (confidence >= confidence_threshold and 
@@ -38,7 +38,7 @@ from .organization_views import organization_list, organization_create, organiza
 from . import error_views
 
 # Import new ticket display views
-from .ticket_display_views import ticket_display_view, get_tickets_update
+from .ticket_display_views import ticket_display_view, get_tickets_update, get_tickets_delta, ticket_events
 
 # Import statistics views
 from .statistics_views import statistics_dashboard, update_agent_work_log, generate_statistics_report
@@ -75,6 +75,8 @@ __all__ = [
     'custom_password_change_view',
     'ticket_display_view',
     'get_tickets_update',
+    'get_tickets_delta',
+    'ticket_events',
     'statistics_dashboard',
     'update_agent_work_log',
     'generate_statistics_report'
@@ -6,6 +6,9 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
 from django.views.decorators.http import require_http_methods
+from django.db.models import Count, Max, Q
+from ..decorators import conditional_get
+import datetime
 
 
 @login_required
@@ -64,8 +67,57 @@ def user_contact_info(request, user_id):
         }, status=500)
 
 
+def _agent_tickets_queryset(request, agent_id):
+    """
+    Tickets of an agent filtered by the query params (date_from, date_to, organization, on_duty)
+
+    Raises:
+        ValueError: When a date is not in YYYY-MM-DD format
+    """
+    from ..models import Ticket
+    
+    date_from = request.GET.get('date_from', '')
+    date_to = request.GET.get('date_to', '')
+    
+    # Get agent's tickets
+    tickets = Ticket.objects.filter(assigned_to_id=agent_id)
+    
+    # Apply date filter if provided
+    if date_from:
+        tickets = tickets.filter(created_at__date__gte=datetime.datetime.strptime(date_from, '%Y-%m-%d').date())
+    if date_to:
+        tickets = tickets.filter(created_at__date__lte=datetime.datetime.strptime(date_to, '%Y-%m-%d').date())
+    
+    # Apply organization filter if provided
+    organization_id = request.GET.get('organization', '')
+    if organization_id:
+        tickets = tickets.filter(organization_id=organization_id)
+    
+    # Apply on_duty filter if provided
+    on_duty_filter = request.GET.get('on_duty', '')
+    if on_duty_filter == 'true':
+        tickets = tickets.filter(on_duty=True)
+    elif on_duty_filter == 'false':
+        tickets = tickets.filter(on_duty=False)
+    
+    return tickets
+
+
+def _agent_tickets_version(request, agent_id):
+    """Version stamp of an agent's ticket list: newest change and number of tickets"""
+    if request.user.profile.role not in ['admin', 'superagent']:
+        return None
+    try:
+        tickets = _agent_tickets_queryset(request, agent_id)
+    except ValueError:
+        return None
+    stamp = tickets.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return stamp['last_modified'], stamp['count']
+
+
 @login_required
 @require_http_methods(["GET"])
+@conditional_get(_agent_tickets_version)
 def agent_tickets(request, agent_id):
     """
     API endpoint to get tickets assigned to a specific agent
@@ -79,47 +131,14 @@ def agent_tickets(request, agent_id):
                 'error': 'Brak uprawnień do przeglądania szczegółów ticketów agentów'
             }, status=403)
         
-        # Import here to avoid circular imports
-        from ..models import Ticket
-        import datetime
-        
-        # Get date range from query parameters
-        date_from = request.GET.get('date_from', '')
-        date_to = request.GET.get('date_to', '')
-        
-        # Parse dates
         try:
-            if date_from:
-                date_from = datetime.datetime.strptime(date_from, '%Y-%m-%d').date()
-            if date_to:
-                date_to = datetime.datetime.strptime(date_to, '%Y-%m-%d').date()
+            tickets = _agent_tickets_queryset(request, agent_id)
         except ValueError:
             return JsonResponse({
                 'success': False,
                 'error': 'Nieprawidłowy format daty'
             }, status=400)
         
-        # Get agent's tickets
-        tickets = Ticket.objects.filter(assigned_to_id=agent_id)
-        
-        # Apply date filter if provided
-        if date_from:
-            tickets = tickets.filter(created_at__date__gte=date_from)
-        if date_to:
-            tickets = tickets.filter(created_at__date__lte=date_to)
-        
-        # Apply organization filter if provided
-        organization_id = request.GET.get('organization', '')
-        if organization_id:
-            tickets = tickets.filter(organization_id=organization_id)
-        
-        # Apply on_duty filter if provided
-        on_duty_filter = request.GET.get('on_duty', '')
-        if on_duty_filter == 'true':
-            tickets = tickets.filter(on_duty=True)
-        elif on_duty_filter == 'false':
-            tickets = tickets.filter(on_duty=False)
-        
         # Build ticket list
         ticket_list = []
         for ticket in tickets.order_by('-created_at'):
@@ -185,8 +204,57 @@ def toggle_theme(request):
         }, status=500)
 
 
+def _calendar_notes_queryset(request):
+    """
+    Calendar notes visible to the user in the start-end range of the query params
+    
+    Shows:
+    - User's own notes (private and public)
+    - Public notes from other users (if not client)
+
+    Raises:
+        KeyError: When start or end is missing
+        ValueError: When a date is not in YYYY-MM-DD format
+    """
+    from ..models import CalendarNote
+    
+    start_date = request.GET.get('start')
+    end_date = request.GET.get('end')
+    if not start_date or not end_date:
+        raise KeyError('start/end')
+    
+    start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
+    end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
+    
+    # Build query based on user role
+    if request.user.profile.role == 'client':
+        # Clients see only their own notes
+        return CalendarNote.objects.filter(
+            user=request.user,
+            date__gte=start_date,
+            date__lte=end_date
+        )
+    # Non-clients see their own notes + public notes from others
+    return CalendarNote.objects.filter(
+        Q(user=request.user) | Q(is_private=False),
+        date__gte=start_date,
+        date__lte=end_date
+    )
+
+
+def _calendar_notes_version(request):
+    """Version stamp of the visible notes in the range: newest change and number of notes"""
+    try:
+        notes = _calendar_notes_queryset(request)
+    except (KeyError, ValueError):
+        return None
+    stamp = notes.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return stamp['last_modified'], stamp['count']
+
+
 @login_required
 @require_http_methods(["GET"])
+@conditional_get(_calendar_notes_version)
 def calendar_notes_api(request):
     """
     API endpoint to get calendar notes for a specific date range
@@ -195,47 +263,20 @@ def calendar_notes_api(request):
     - Public notes from other users (if not client)
     """
     try:
-        from ..models import CalendarNote
-        from datetime import datetime
-        from django.db.models import Q
-        
-        # Get date range from query parameters
-        start_date = request.GET.get('start')
-        end_date = request.GET.get('end')
-        
-        if not start_date or not end_date:
+        try:
+            notes = _calendar_notes_queryset(request)
+        except KeyError:
             return JsonResponse({
                 'success': False,
                 'error': 'Brak wymaganych parametrów daty'
             }, status=400)
-        
-        # Parse dates
-        try:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         except ValueError:
             return JsonResponse({
                 'success': False,
                 'error': 'Nieprawidłowy format daty'
             }, status=400)
         
-        # Build query based on user role
-        if request.user.profile.role == 'client':
-            # Clients see only their own notes
-            notes = CalendarNote.objects.filter(
-                user=request.user,
-                date__gte=start_date,
-                date__lte=end_date
-            )
-        else:
-            # Non-clients see their own notes + public notes from others
-            notes = CalendarNote.objects.filter(
-                Q(user=request.user) | Q(is_private=False),
-                date__gte=start_date,
-                date__lte=end_date
-            )
-        
-        notes = notes.order_by('date')
+        notes = notes.select_related('user').order_by('date')
         
         # Build notes list
         notes_list = []
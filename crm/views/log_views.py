@@ -12,6 +12,7 @@ from collections import defaultdict
 import logging
 
 from ..models import ActivityLog
+from ..services.device import get_device
 from .error_views import log_not_found, logs_access_forbidden
 from .helpers import log_activity  # Import the log_activity function
 
@@ -58,8 +59,7 @@ def activity_logs(request):
         per_page = request.GET.get('per_page_mobile', '15')
     
     # Detect mobile devices and limit to 10 per page
-    user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-    is_mobile = any(mobile in user_agent for mobile in ['mobile', 'android', 'iphone', 'ipad', 'tablet'])
+    is_mobile = get_device(request).is_handheld
     
     try:
         per_page = int(per_page)
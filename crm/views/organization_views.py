@@ -8,6 +8,7 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from ..models import UserProfile, Organization, Ticket
 from ..forms import OrganizationForm
 from .error_views import organization_not_found, organization_access_forbidden, forbidden_access
+from ..services.device import get_device
 
 
 @login_required
@@ -46,8 +47,7 @@ def organization_list(request):
     per_page = request.GET.get('per_page', '20')
     
     # Detect mobile devices and limit to 10 per page
-    user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-    is_mobile = any(mobile in user_agent for mobile in ['mobile', 'android', 'iphone', 'ipad', 'tablet'])
+    is_mobile = get_device(request).is_handheld
     
     try:
         per_page = int(per_page)
@@ -0,0 +1,97 @@
+"""
+Views for background statistics report jobs
+"""
+from django.http import FileResponse, JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+import logging
+
+from ..models import ReportJob
+from ..services.reports import REPORT_PARAMS, submit_report_job, can_access_report_job
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+def _job_data(job):
+    """JSON representation of a job for the polling endpoint"""
+    data = {
+        'id': job.id,
+        'report_type': job.report_type,
+        'job_status': job.status,
+        'job_status_display': job.get_status_display(),
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': reverse('report_job_status', args=[job.id]),
+    }
+    if job.status == 'done':
+        data['filename'] = job.filename
+        data['download_url'] = reverse('report_job_download', args=[job.id])
+        data['expires_at'] = job.expires_at.isoformat()
+    elif job.status == 'failed':
+        data['message'] = job.error_message
+    return data
+
+
+def _get_job(request, job_id):
+    """Job visible to the current user, or None"""
+    job = ReportJob.objects.filter(id=job_id).first()
+    if job is None or not can_access_report_job(request.user, job):
+        return None
+    return job
+
+
+@login_required
+@require_http_methods(["POST"])
+def report_job_create(request):
+    """Queue a statistics report (or reuse a matching one) and return its job"""
+    if request.user.profile.role not in ['admin', 'superagent']:
+        return JsonResponse({'status': 'error', 'message': 'Brak uprawnień'}, status=403)
+    
+    report_type = request.POST.get('report_type', 'statistics')
+    if report_type not in REPORT_PARAMS:
+        return JsonResponse({'status': 'error', 'message': 'Nieznany typ raportu'}, status=400)
+    
+    if not request.POST.get('period_start') or not request.POST.get('period_end'):
+        return JsonResponse({'status': 'error', 'message': 'Wymagane są daty początkowa i końcowa'}, status=400)
+    
+    job, reused = submit_report_job(request.user, report_type, request.POST)
+    
+    return JsonResponse({
+        'status': 'success',
+        'reused': reused,
+        'job': _job_data(job),
+    }, status=200 if reused else 202)
+
+
+@login_required
+@require_http_methods(["GET"])
+def report_job_status(request, job_id):
+    """Polling endpoint for a report job"""
+    job = _get_job(request, job_id)
+    if job is None:
+        return JsonResponse({'status': 'error', 'message': 'Zadanie raportu nie zostało znalezione'}, status=404)
+    
+    return JsonResponse({'status': 'success', 'job': _job_data(job)})
+
+
+@login_required
+@require_http_methods(["GET"])
+def report_job_download(request, job_id):
+    """Download the file of a finished report job"""
+    job = _get_job(request, job_id)
+    if job is None:
+        return JsonResponse({'status': 'error', 'message': 'Zadanie raportu nie zostało znalezione'}, status=404)
+    
+    if not job.is_available():
+        return JsonResponse({'status': 'error', 'message': 'Raport nie jest gotowy lub wygasł'}, status=410 if job.status == 'done' else 409)
+    
+    logger.info(f"User {request.user.username} downloading report job {job.id}: {job.filename}")
+    
+    return FileResponse(
+        open(job.artifact_path, 'rb'),
+        as_attachment=True,
+        filename=job.filename,
+        content_type=job.content_type
+    )
@@ -1,29 +1,64 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden, JsonResponse
-from django.db.models import Count, Avg, F, ExpressionWrapper, fields, Q, Sum
+from django.db.models import Count, Avg, Q, Sum, Case, When, Value, IntegerField
 from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncYear, TruncHour
 from django.utils import timezone
 import datetime
 from datetime import timedelta
 import json
 import logging
-import csv
-import io
-from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+from itertools import groupby
+from operator import attrgetter
+from openpyxl.styles import Font, PatternFill
 
 from ..models import (
     Ticket, ActivityLog, UserProfile, 
-    Organization, TicketStatistics, AgentWorkLog, WorkHours
+    Organization, TicketStatistics, AgentWorkLog
 )
 from ..views.error_views import forbidden_access
+from ..services.statistics import (
+    ticket_summary, ticket_distribution, agent_breakdown, agent_work_summary, summarize_range
+)
+from ..services.business_calendar import get_work_schedule
+from ..services.statistics.export import StreamingSheet, CsvSpool, xlsx_response
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Labels used in report files
+STATUS_LABELS = {'new': 'Nowy', 'in_progress': 'W trakcie', 'unresolved': 'Nierozwiązany', 'resolved': 'Rozwiązany', 'closed': 'Zamknięty'}
+PRIORITY_LABELS = {'low': 'Niski', 'medium': 'Średni', 'high': 'Wysoki', 'critical': 'Krytyczny'}
+CATEGORY_LABELS = {'hardware': 'Sprzęt', 'software': 'Oprogramowanie', 'network': 'Sieć', 'account': 'Konto', 'other': 'Inne'}
+
+# Ticket columns loaded for the per-agent ticket listing in reports
+REPORT_TICKET_FIELDS = (
+    'id', 'title', 'status', 'priority', 'category', 'on_duty', 'assigned_to_id',
+    'created_at', 'resolved_at', 'closed_at', 'actual_resolution_time'
+)
+
+# Cell styles for XLSX reports (status/priority badge colors match the web UI)
+_WHITE_BOLD = Font(color="FFFFFF", bold=True)
+REPORT_STYLES = {
+    'header': {'font': Font(bold=True, size=14)},
+    'subheader': {'font': Font(bold=True, size=12)},
+    'bold': {'font': Font(bold=True)},
+    'bold_italic': {'font': Font(bold=True, italic=True)},
+    'muted_italic': {'font': Font(italic=True, color="6c757d")},
+    'table_header': {'font': Font(bold=True), 'fill': PatternFill(start_color="e9ecef", end_color="e9ecef", fill_type="solid")},
+    'status_new': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="007bff", end_color="007bff", fill_type="solid")},
+    'status_in_progress': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="17a2b8", end_color="17a2b8", fill_type="solid")},
+    'status_unresolved': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="ffc107", end_color="ffc107", fill_type="solid")},
+    'status_resolved': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="28a745", end_color="28a745", fill_type="solid")},
+    'status_closed': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="6c757d", end_color="6c757d", fill_type="solid")},
+    'priority_low': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="6c757d", end_color="6c757d", fill_type="solid")},
+    'priority_medium': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="17a2b8", end_color="17a2b8", fill_type="solid")},
+    'priority_high': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="ffc107", end_color="ffc107", fill_type="solid")},
+    'priority_critical': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="dc3545", end_color="dc3545", fill_type="solid")},
+    'on_duty_yes': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="28a745", end_color="28a745", fill_type="solid")},
+    'on_duty_no': {'font': _WHITE_BOLD, 'fill': PatternFill(start_color="dc3545", end_color="dc3545", fill_type="solid")},
+}
+
 @login_required
 def statistics_dashboard(request):
     """View for displaying statistics dashboard"""
@@ -123,74 +158,55 @@ def statistics_dashboard(request):
         elif on_duty_filter == 'false':
             tickets = tickets.filter(on_duty=False)
     
-    # Count tickets by status
-    new_tickets = tickets.filter(status='new').count()
-    in_progress_tickets = tickets.filter(status='in_progress').count()
-    
-    # Verify the filter value for unresolved tickets - first check if we need to use a different key
-    # Some systems might use 'waiting' or 'reopened' as status names
-    unresolved_count = tickets.filter(status='unresolved').count()
-    
-    # Debug logging for troubleshooting
-    logger.info(f"Statistics: Found {unresolved_count} unresolved tickets")
-    if unresolved_count == 0:
-        # Check for tickets with similar statuses to see if we're missing something
-        for status_check in ['waiting', 'reopened', 'problem', 'stuck']:
-            alt_count = tickets.filter(status=status_check).count()
-            if alt_count > 0:
-                logger.info(f"Statistics: Found {alt_count} tickets with status '{status_check}'")
-
-    unresolved_tickets = unresolved_count
-    resolved_tickets = tickets.filter(status='resolved').count()
-    closed_tickets = tickets.filter(status='closed').count()
-    total_tickets = tickets.count()
-    assigned_tickets = tickets.exclude(assigned_to__isnull=True).count()
-    
-    # Debug logging to verify totals
-    logger.info(f"Statistics: Total tickets: {total_tickets}, Assigned tickets: {assigned_tickets}, Sum of statuses: {new_tickets + in_progress_tickets + unresolved_tickets + resolved_tickets + closed_tickets}")
-    
-    # Calculate ticket resolution metrics
-    avg_resolution_time = tickets.exclude(
-        resolved_at__isnull=True
-    ).aggregate(
-        avg_time=Avg(
-            ExpressionWrapper(
-                F('resolved_at') - F('created_at'),
-                output_field=fields.DurationField()
-            )
+    # Headline numbers - closed periods come from TicketStatistics rollups and only the
+    # open period is aggregated live. Agent and on-duty filters are not part of the
+    # rollups, so those fall back to a single live conditional-aggregation query.
+    rollup = None
+    if not agent_filter and on_duty_filter not in ('true', 'false'):
+        if role == 'admin':
+            organization_ids = [org_filter] if org_filter else None
+        else:
+            organization_ids = list(user_orgs.values_list('id', flat=True))
+            if org_filter:
+                organization_ids = [org_id for org_id in organization_ids if str(org_id) == str(org_filter)]
+        rollup = summarize_range(
+            tickets, date_from, date_to,
+            organization_ids=organization_ids,
+            include_agents=(role == 'admin' and not org_filter)
         )
-    )['avg_time']
     
-    if avg_resolution_time:
-        avg_resolution_hours = avg_resolution_time.total_seconds() / 3600
+    if rollup:
+        summary, distribution, rollup_agents = rollup
     else:
-        avg_resolution_hours = 0
+        summary = ticket_summary(tickets)
+        distribution = ticket_distribution(tickets)
+        rollup_agents = None
+    
+    new_tickets = summary['new']
+    in_progress_tickets = summary['in_progress']
+    unresolved_tickets = summary['unresolved']
+    resolved_tickets = summary['resolved']
+    closed_tickets = summary['closed']
+    total_tickets = summary['total']
+    assigned_tickets = summary['assigned']
+    avg_resolution_hours = summary['avg_resolution_hours']
+    avg_actual_hours = summary['avg_actual_hours']
+    tickets_with_actual_time = summary['tickets_with_actual_time']
     
-    # Calculate average actual resolution time (rzeczywisty czas wykonania)
-    avg_actual_resolution_time = tickets.exclude(
-        actual_resolution_time__isnull=True
-    ).aggregate(
-        avg_actual_time=Avg('actual_resolution_time')
-    )['avg_actual_time']
-    
-    if avg_actual_resolution_time:
-        avg_actual_hours = float(avg_actual_resolution_time)
-    else:
-        avg_actual_hours = None
+    # Debug logging to verify totals
+    logger.info(f"Statistics: Total tickets: {total_tickets}, Assigned tickets: {assigned_tickets}, Sum of statuses: {new_tickets + in_progress_tickets + unresolved_tickets + resolved_tickets + closed_tickets}")
     
-    # Count tickets with actual resolution time (for percentage calculation)
-    tickets_with_actual_time = tickets.exclude(actual_resolution_time__isnull=True).count()
     tickets_with_actual_time_percentage = (tickets_with_actual_time / total_tickets * 100) if total_tickets > 0 else 0
     
-    # Get priority distribution
-    priority_distribution = tickets.values('priority').annotate(
-        count=Count('id')
-    ).order_by('priority')
-    
-    # Get category distribution
-    category_distribution = tickets.values('category').annotate(
-        count=Count('id')
-    ).order_by('category')
+    # Get priority and category distribution
+    priority_distribution = [
+        {'priority': priority, 'count': count}
+        for priority, count in sorted(distribution['priority'].items())
+    ]
+    category_distribution = [
+        {'category': category, 'count': count}
+        for category, count in sorted(distribution['category'].items())
+    ]
     
     # Get tickets by creation date
     # The period defines the viewed range, so we use finer granularity for the chart:
@@ -220,78 +236,11 @@ def statistics_dashboard(request):
             count=Count('id')
         ).order_by('date')
     
-    # Get agent performance metrics - for agents with assigned tickets
+    # Get agent performance metrics - single GROUP BY over agents with assigned tickets
     agent_performance = []
     
     if role in ['admin', 'superagent']:
-        agents_with_tickets = tickets.values(
-            'assigned_to'
-        ).exclude(
-            assigned_to__isnull=True
-        ).annotate(
-            ticket_count=Count('id')
-        ).order_by('-ticket_count')
-        
-        for agent_data in agents_with_tickets:
-            agent_id = agent_data['assigned_to']
-            if agent_id:
-                try:
-                    agent_user = UserProfile.objects.get(user_id=agent_id).user
-                    agent_tickets = tickets.filter(assigned_to_id=agent_id)
-                    
-                    agent_resolved = agent_tickets.filter(status__in=['resolved', 'closed']).count()
-                    agent_total = agent_tickets.count()
-                    
-                    if agent_total > 0:
-                        resolution_rate = (agent_resolved / agent_total) * 100
-                    else:
-                        resolution_rate = 0
-                    
-                    # Calculate average resolution time for this agent
-                    agent_avg_time = agent_tickets.exclude(
-                        resolved_at__isnull=True
-                    ).aggregate(
-                        avg_time=Avg(
-                            ExpressionWrapper(
-                                F('resolved_at') - F('created_at'),
-                                output_field=fields.DurationField()
-                            )
-                        )
-                    )['avg_time']
-                    
-                    if agent_avg_time:
-                        agent_avg_hours = agent_avg_time.total_seconds() / 3600
-                    else:
-                        agent_avg_hours = 0
-                    
-                    # Calculate average actual resolution time for this agent
-                    agent_actual_avg_time = agent_tickets.exclude(
-                        actual_resolution_time__isnull=True
-                    ).aggregate(
-                        avg_actual_time=Avg('actual_resolution_time')
-                    )['avg_actual_time']
-                    
-                    if agent_actual_avg_time:
-                        agent_actual_avg_hours = float(agent_actual_avg_time)
-                    else:
-                        agent_actual_avg_hours = None
-                    
-                    # Count tickets with actual time for this agent
-                    agent_tickets_with_actual_time = agent_tickets.exclude(actual_resolution_time__isnull=True).count()
-                    
-                    agent_performance.append({
-                        'agent_id': agent_id,  # Add this line
-                        'agent_name': f"{agent_user.first_name} {agent_user.last_name}" if agent_user.first_name else agent_user.username,
-                        'ticket_count': agent_total,
-                        'resolved_count': agent_resolved,
-                        'resolution_rate': resolution_rate,
-                        'avg_resolution_time': agent_avg_hours,
-                        'avg_actual_resolution_time': agent_actual_avg_hours,
-                        'tickets_with_actual_time': agent_tickets_with_actual_time
-                    })
-                except UserProfile.DoesNotExist:
-                    # Skip if agent profile doesn't exist
-                    pass
+        agent_performance = rollup_agents if rollup_agents is not None else agent_breakdown(tickets)
     
     # Get organizations for filter dropdown
     organizations = []
@@ -321,33 +270,7 @@ def statistics_dashboard(request):
             start_time__date__lte=date_to
         )
         
-        agent_work_summary = agent_logs.values('agent').annotate(
-            total_time=Sum('work_time_minutes'),
-            ticket_count=Count('ticket', distinct=True)
-        )
-        
-        for summary in agent_work_summary:
-            agent_id = summary['agent']
-            try:
-                agent_user = UserProfile.objects.get(user_id=agent_id).user
-                agent_name = f"{agent_user.first_name} {agent_user.last_name}" if agent_user.first_name else agent_user.username
-                
-                total_minutes = summary['total_time'] or 0
-                ticket_count = summary['ticket_count']
-                
-                if ticket_count > 0:
-                    avg_minutes_per_ticket = total_minutes / ticket_count
-                else:
-                    avg_minutes_per_ticket = 0
-                
-                agent_work_time_stats[agent_id] = {
-                    'agent_name': agent_name,
-                    'total_minutes': total_minutes,
-                    'avg_minutes_per_ticket': avg_minutes_per_ticket,
-                    'ticket_count': ticket_count
-                }
-            except UserProfile.DoesNotExist:
-                pass
+        agent_work_time_stats = agent_work_summary(agent_logs)
     
     # Format data for JSON serialization in charts
     priority_data = list(priority_distribution)
@@ -401,7 +324,7 @@ def statistics_dashboard(request):
         'agent_filter': agent_filter,
         'on_duty_filter': on_duty_filter,
         'agent_work_time_stats': agent_work_time_stats,
-        'debug_unresolved_count': unresolved_count,  # Keep this for debugging
+        'debug_unresolved_count': unresolved_tickets,  # Keep this for debugging
     }
     
     return render(request, 'crm/statistics/statistics_dashboard.html', context)
@@ -477,7 +400,7 @@ def update_agent_work_log(request):
         open_log.end_time = now
         
         # Calculate work time considering only work hours
-        work_minutes = calculate_work_minutes(open_log.start_time, now)
+        work_minutes = get_work_schedule().work_minutes(open_log.start_time, now)
         open_log.work_time_minutes = work_minutes
         
         if notes:
@@ -493,122 +416,24 @@ def update_agent_work_log(request):
     
     return JsonResponse({'status': 'error', 'message': 'Invalid action'}, status=400)
 
-def calculate_work_minutes(start_time, end_time):
-    """Calculate working minutes between two timestamps, considering only work hours"""
-    # Get work hours configuration
-    work_hours = WorkHours.objects.all()
-    
-    # If no work hours defined, use 8:00-16:00 Mon-Fri as default
-    if not work_hours.exists():
-        default_work_hours = {}
-        for day in range(5):  # Monday to Friday
-            default_work_hours[day] = [(datetime.time(8, 0), datetime.time(16, 0))]
-    else:
-        # Organize work hours by day
-        default_work_hours = {}
-        for wh in work_hours:
-            if wh.is_working_day:
-                if wh.day_of_week not in default_work_hours:
-                    default_work_hours[wh.day_of_week] = []
-                default_work_hours[wh.day_of_week].append((wh.start_time, wh.end_time))
-    
-    # If start and end are on the same day, calculate directly
-    if start_time.date() == end_time.date():
-        day_of_week = start_time.weekday()
-        if day_of_week in default_work_hours:
-            # Check each work period in this day
-            total_minutes = 0
-            for start_hour, end_hour in default_work_hours[day_of_week]:
-                period_start = datetime.datetime.combine(
-                    start_time.date(), 
-                    start_hour,
-                    tzinfo=start_time.tzinfo
-                )
-                period_end = datetime.datetime.combine(
-                    start_time.date(), 
-                    end_hour,
-                    tzinfo=start_time.tzinfo
-                )
-                
-                # Find overlap between work period and log period
-                overlap_start = max(period_start, start_time)
-                overlap_end = min(period_end, end_time)
-                
-                if overlap_end > overlap_start:
-                    overlap_minutes = (overlap_end - overlap_start).total_seconds() / 60
-                    total_minutes += overlap_minutes
-            
-            return total_minutes
-        else:
-            # Not a working day
-            return 0
-    else:
-        # If spanning multiple days, calculate day by day
-        current_date = start_time.date()
-        end_date = end_time.date()
-        total_minutes = 0
-        
-        while current_date <= end_date:
-            if current_date == start_time.date():
-                # First day - from start_time to end of work day
-                day_start = start_time
-                day_end = datetime.datetime.combine(
-                    current_date,
-                    datetime.time(23, 59, 59),
-                    tzinfo=start_time.tzinfo
-                )
-            elif current_date == end_date:
-                # Last day - from start of work day to end_time
-                day_start = datetime.datetime.combine(
-                    current_date,
-                    datetime.time(0, 0),
-                    tzinfo=start_time.tzinfo
-                )
-                day_end = end_time
-            else:
-                # Middle days - full day
-                day_start = datetime.datetime.combine(
-                    current_date,
-                    datetime.time(0, 0),
-                    tzinfo=start_time.tzinfo
-                )
-                day_end = datetime.datetime.combine(
-                    current_date,
-                    datetime.time(23, 59, 59),
-                    tzinfo=start_time.tzinfo
-                )
-            
-            # Calculate minutes for this day
-            day_of_week = current_date.weekday()
-            if day_of_week in default_work_hours:
-                for start_hour, end_hour in default_work_hours[day_of_week]:
-                    period_start = datetime.datetime.combine(
-                        current_date, 
-                        start_hour,
-                        tzinfo=start_time.tzinfo
-                    )
-                    period_end = datetime.datetime.combine(
-                        current_date, 
-                        end_hour,
-                        tzinfo=start_time.tzinfo
-                    )
-                    
-                    overlap_start = max(period_start, day_start)
-                    overlap_end = min(period_end, day_end)
-                    
-                    if overlap_end > overlap_start:
-                        overlap_minutes = (overlap_end - overlap_start).total_seconds() / 60
-                        total_minutes += overlap_minutes
-            
-            current_date += timedelta(days=1)
-        
-        return total_minutes
-
 @login_required
 def generate_statistics_report(request):
     """Generate and download statistics report"""
-    user = request.user
+    return build_statistics_report(request.user, request.POST)
+
+def build_statistics_report(user, params):
+    """
+    Build the statistics report file for a user
+    
+    Shared by the download view and the background report jobs.
+    
+    Args:
+        user: User requesting the report
+        params: Report parameters (request.POST or a dict with the same keys)
     
+    Returns:
+        FileResponse with the report, or JsonResponse describing the error
+    """
     logger.info(f"Report generation started by user: {user.username} (role: {user.profile.role})")
     
     # Only admin and superagent can generate reports
@@ -617,13 +442,13 @@ def generate_statistics_report(request):
         return JsonResponse({'status': 'error', 'message': 'Permission denied'}, status=403)
     
     try:
-        period_type = request.POST.get('period_type', 'month')
-        period_start = request.POST.get('period_start')
-        period_end = request.POST.get('period_end')
-        organization_id = request.POST.get('organization')
-        agent_id = request.POST.get('agent')
-        on_duty_filter = request.POST.get('on_duty', '')  # on_duty filter
-        report_format = request.POST.get('format', 'xlsx')  # xlsx or csv
+        period_type = params.get('period_type', 'month')
+        period_start = params.get('period_start')
+        period_end = params.get('period_end')
+        organization_id = params.get('organization')
+        agent_id = params.get('agent')
+        on_duty_filter = params.get('on_duty', '')  # on_duty filter
+        report_format = params.get('format', 'xlsx')  # xlsx or csv
         
         logger.info(f"Report parameters: period_type={period_type}, period_start={period_start}, period_end={period_end}, organization_id={organization_id}, agent_id={agent_id}, on_duty={on_duty_filter}, format={report_format}")
         
@@ -652,17 +477,13 @@ def generate_statistics_report(request):
             created_at__date__lte=period_end_date
         )
         
-        initial_count = tickets_query.count()
-        logger.info(f"Initial tickets count for date range: {initial_count}")
-        
         # Apply organization filter if specified
         organization = None
         if organization_id:
             try:
                 organization = Organization.objects.get(id=organization_id)
                 tickets_query = tickets_query.filter(organization=organization)
-                org_filtered_count = tickets_query.count()
-                logger.info(f"After organization filter ({organization.name}): {org_filtered_count} tickets")
+                logger.info(f"Applied organization filter: {organization.name}")
             except Organization.DoesNotExist:
                 logger.error(f"Organization not found: {organization_id}")
                 return JsonResponse({'status': 'error', 'message': 'Organizacja nie została znaleziona'}, status=400)
@@ -676,8 +497,7 @@ def generate_statistics_report(request):
             try:
                 agent = UserProfile.objects.get(user_id=agent_id).user
                 tickets_query = tickets_query.filter(assigned_to=agent)
-                agent_filtered_count = tickets_query.count()
-                logger.info(f"After agent filter ({agent.username}): {agent_filtered_count} tickets")
+                logger.info(f"Applied agent filter: {agent.username}")
             except UserProfile.DoesNotExist:
                 logger.error(f"Agent not found: {agent_id}")
                 return JsonResponse({'status': 'error', 'message': 'Agent nie został znaleziony'}, status=400)
@@ -689,22 +509,25 @@ def generate_statistics_report(request):
         if on_duty_filter:
             if on_duty_filter == 'true':
                 tickets_query = tickets_query.filter(on_duty=True)
-                logger.info(f"After on_duty=True filter: {tickets_query.count()} tickets")
+                logger.info("Applied on_duty=True filter")
             elif on_duty_filter == 'false':
                 tickets_query = tickets_query.filter(on_duty=False)
-                logger.info(f"After on_duty=False filter: {tickets_query.count()} tickets")
+                logger.info("Applied on_duty=False filter")
         
-        # Calculate statistics
+        # Calculate statistics - single conditional-aggregation query
         logger.info("Calculating ticket statistics...")
         try:
-            tickets_opened = tickets_query.count()
-            tickets_closed = tickets_query.filter(status='closed').count()
-            tickets_resolved = tickets_query.filter(status='resolved').count()
-            tickets_new = tickets_query.filter(status='new').count()
-            tickets_in_progress = tickets_query.filter(status='in_progress').count()
-            tickets_unresolved = tickets_query.filter(status='unresolved').count()
+            summary = ticket_summary(tickets_query)
+            tickets_opened = summary['total']
+            tickets_closed = summary['closed']
+            tickets_resolved = summary['resolved']
+            tickets_new = summary['new']
+            tickets_in_progress = summary['in_progress']
+            tickets_unresolved = summary['unresolved']
+            avg_resolution_time = summary['avg_resolution_hours']
             
             logger.info(f"Ticket counts: total={tickets_opened}, new={tickets_new}, in_progress={tickets_in_progress}, unresolved={tickets_unresolved}, resolved={tickets_resolved}, closed={tickets_closed}")
+            logger.info(f"Average resolution time: {avg_resolution_time} hours")
             
             # Verify total
             sum_statuses = tickets_new + tickets_in_progress + tickets_unresolved + tickets_resolved + tickets_closed
@@ -717,144 +540,39 @@ def generate_statistics_report(request):
             logger.error(f"Error calculating basic statistics: {e}")
             return JsonResponse({'status': 'error', 'message': f'Błąd obliczania statystyk: {str(e)}'}, status=500)
         
-        # Calculate average resolution time
-        logger.info("Calculating average resolution time...")
-        try:
-            resolution_time_data = tickets_query.exclude(
-                resolved_at__isnull=True
-            ).aggregate(
-                avg_time=Avg(
-                    ExpressionWrapper(
-                        F('resolved_at') - F('created_at'),
-                        output_field=fields.DurationField()
-                    )
-                )
-            )
-            avg_resolution_time = 0
-            if resolution_time_data['avg_time']:
-                avg_resolution_time = resolution_time_data['avg_time'].total_seconds() / 3600  # Convert to hours
-            
-            logger.info(f"Average resolution time: {avg_resolution_time} hours")
-        except Exception as e:
-            logger.error(f"Error calculating resolution time: {e}")
-            avg_resolution_time = 0
-        
-        # Calculate priority distribution
-        logger.info("Calculating priority distribution...")
+        # Calculate priority and category distribution
+        logger.info("Calculating priority and category distribution...")
         try:
-            priority_counts = tickets_query.values('priority').annotate(count=Count('id'))
-            priority_distribution = {item['priority']: item['count'] for item in priority_counts}
+            distribution = ticket_distribution(tickets_query)
+            priority_distribution = distribution['priority']
+            category_distribution = distribution['category']
             logger.info(f"Priority distribution: {priority_distribution}")
-        except Exception as e:
-            logger.error(f"Error calculating priority distribution: {e}")
-            priority_distribution = {}
-        
-        # Calculate category distribution
-        logger.info("Calculating category distribution...")
-        try:
-            category_counts = tickets_query.values('category').annotate(count=Count('id'))
-            category_distribution = {item['category']: item['count'] for item in category_counts}
             logger.info(f"Category distribution: {category_distribution}")
         except Exception as e:
-            logger.error(f"Error calculating category distribution: {e}")
+            logger.error(f"Error calculating distribution: {e}")
+            priority_distribution = {}
             category_distribution = {}
         
         # Calculate average agent work time if agent work logs exist
         logger.info("Calculating agent work time...")
         try:
-            avg_agent_work_time = 0
-            if AgentWorkLog.objects.filter(ticket__in=tickets_query).exists():
-                agent_work_data = AgentWorkLog.objects.filter(
-                    ticket__in=tickets_query
-                ).aggregate(
-                    avg_time=Avg('work_time_minutes')
-                )
-                avg_agent_work_time = agent_work_data['avg_time'] or 0
+            agent_work_data = AgentWorkLog.objects.filter(
+                ticket__in=tickets_query
+            ).aggregate(
+                avg_time=Avg('work_time_minutes')
+            )
+            avg_agent_work_time = agent_work_data['avg_time'] or 0
             logger.info(f"Average agent work time: {avg_agent_work_time} minutes")
         except Exception as e:
             logger.error(f"Error calculating agent work time: {e}")
             avg_agent_work_time = 0
         
-        # Get agent performance data
+        # Get agent performance data - single GROUP BY over agents
         logger.info("Calculating agent performance...")
         agent_performance = []
         try:
             if user.profile.role in ['admin', 'superagent']:
-                agents_with_tickets = tickets_query.values(
-                    'assigned_to'
-                ).exclude(
-                    assigned_to__isnull=True
-                ).annotate(
-                    ticket_count=Count('id')
-                ).order_by('-ticket_count')
-                
-                logger.info(f"Found {len(agents_with_tickets)} agents with tickets")
-                
-                for agent_data in agents_with_tickets:
-                    agent_id = agent_data['assigned_to']
-                    if agent_id:
-                        try:
-                            agent_user = UserProfile.objects.get(user_id=agent_id).user
-                            agent_tickets = tickets_query.filter(assigned_to_id=agent_id)
-                            
-                            agent_resolved = agent_tickets.filter(status__in=['resolved', 'closed']).count()
-                            agent_total = agent_tickets.count()
-                            
-                            if agent_total > 0:
-                                resolution_rate = (agent_resolved / agent_total) * 100
-                            else:
-                                resolution_rate = 0
-                            
-
-                            # Calculate average resolution time for this agent
-                            agent_avg_time = agent_tickets.exclude(
-                                resolved_at__isnull=True
-                            ).aggregate(
-                                avg_time=Avg(
-                                    ExpressionWrapper(
-                                        F('resolved_at') - F('created_at'),
-                                        output_field=fields.DurationField()
-                                    )
-                                )
-                            )['avg_time']
-                            
-                            if agent_avg_time:
-                                agent_avg_hours = agent_avg_time.total_seconds() / 3600
-                            else:
-                                agent_avg_hours = 0
-                            
-                            # Calculate average actual resolution time for this agent
-                            agent_actual_avg_time = agent_tickets.exclude(
-                                actual_resolution_time__isnull=True
-                            ).aggregate(
-                                avg_actual_time=Avg('actual_resolution_time')
-                            )['avg_actual_time']
-                            
-                            if agent_actual_avg_time:
-                                agent_actual_avg_hours = float(agent_actual_avg_time)
-                            else:
-                                agent_actual_avg_hours = None
-                            
-                            # Count tickets with actual time for this agent
-                            agent_tickets_with_actual_time = agent_tickets.exclude(actual_resolution_time__isnull=True).count()
-
-                            agent_performance.append({
-                                'agent_id': agent_id,  # Add agent_id for ticket filtering
-                                'agent_name': f"{agent_user.first_name} {agent_user.last_name}" if agent_user.first_name else agent_user.username,
-                                'ticket_count': agent_total,
-                                'resolved_count': agent_resolved,
-                                'resolution_rate': resolution_rate,
-                                'avg_resolution_time': agent_avg_hours,
-                                'avg_actual_resolution_time': agent_actual_avg_hours,
-                                'tickets_with_actual_time': agent_tickets_with_actual_time
-                            })
-                            
-                            logger.debug(f"Agent {agent_user.username} (id={agent_id}): {agent_total} tickets, {resolution_rate}% resolution rate")
-                        except UserProfile.DoesNotExist:
-                            logger.warning(f"UserProfile not found for user_id: {agent_id}")
-                        except Exception as e:
-                            logger.error(f"Error processing agent {agent_id}: {e}")
-                
+                agent_performance = agent_breakdown(tickets_query)
                 logger.info(f"Processed {len(agent_performance)} agents for performance data")
         except Exception as e:
             logger.error(f"Error calculating agent performance: {e}")
@@ -869,7 +587,7 @@ def generate_statistics_report(request):
                     tickets_opened, tickets_closed, tickets_resolved, tickets_new, 
                     tickets_in_progress, tickets_unresolved, avg_resolution_time,
                     priority_distribution, category_distribution, agent_performance,
-                    on_duty_filter=on_duty_filter
+                    tickets_query=tickets_query
                 )
             else:  # xlsx
                 return _generate_excel_report(
@@ -877,7 +595,7 @@ def generate_statistics_report(request):
                     tickets_opened, tickets_closed, tickets_resolved, tickets_new,
                     tickets_in_progress, tickets_unresolved, avg_resolution_time,
                     priority_distribution, category_distribution, agent_performance,
-                    on_duty_filter=on_duty_filter
+                    tickets_query=tickets_query
                 )
         except ImportError as e:
             logger.error(f"Import error during report generation: {e}")
@@ -907,9 +625,9 @@ def _generate_csv_report(period_start, period_end, organization, agent,
                         tickets_opened, tickets_closed, tickets_resolved, tickets_new,
                         tickets_in_progress, tickets_unresolved, avg_resolution_time,
                         priority_distribution, category_distribution, agent_performance,
-                        on_duty_filter=''):
+                        tickets_query=None):
     """Generate CSV report"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    spool = CsvSpool()
     
     # Generate filename
     org_name = organization.name if organization else "Wszystkie"
@@ -917,9 +635,7 @@ def _generate_csv_report(period_start, period_end, organization, agent,
     filename = f"raport_statystyk_{period_start}_{period_end}_{org_name}_{agent_name}.csv"
     filename = filename.replace(" ", "_").replace("/", "_")
     
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    writer = csv.writer(response)
+    writer = spool.writer
     
     # Header information
     writer.writerow(['RAPORT STATYSTYK ZGŁOSZEŃ'])
@@ -944,24 +660,22 @@ def _generate_csv_report(period_start, period_end, organization, agent,
     # Priority distribution
     writer.writerow(['ROZKŁAD WEDŁUG PRIORYTETU'])
     writer.writerow(['Priorytet', 'Liczba zgłoszeń'])
-    priority_labels = {'low': 'Niski', 'medium': 'Średni', 'high': 'Wysoki', 'critical': 'Krytyczny'}
     for priority, count in priority_distribution.items():
-        writer.writerow([priority_labels.get(priority, priority), count])
+        writer.writerow([PRIORITY_LABELS.get(priority, priority), count])
     writer.writerow([''])
     
     # Category distribution
     writer.writerow(['ROZKŁAD WEDŁUG KATEGORII'])
     writer.writerow(['Kategoria', 'Liczba zgłoszeń'])
-    category_labels = {'hardware': 'Sprzęt', 'software': 'Oprogramowanie', 'network': 'Sieć', 'account': 'Konto', 'other': 'Inne'}
     for category, count in category_distribution.items():
-        writer.writerow([category_labels.get(category, category), count])
+        writer.writerow([CATEGORY_LABELS.get(category, category), count])
     writer.writerow([''])
     
     # Agent performance with tickets details
     if agent_performance:
         writer.writerow(['WYDAJNOŚĆ AGENTÓW'])
         writer.writerow(['Agent', 'Liczba zgłoszeń', 'Rozwiązanych', '% rozwiązanych', 'Śr. czas rozwiązania (godz.)', 'Śr. rzeczywisty czas (godz.)', 'Zgł. z rzecz. czasem'])
-        for ap in agent_performance:
+        for ap, agent_tickets in _agent_ticket_groups(tickets_query, agent_performance):
             avg_actual = f"{ap['avg_actual_resolution_time']:.2f}" if ap.get('avg_actual_resolution_time') else "Brak danych"
             tickets_actual = ap.get('tickets_with_actual_time', 0)
             
@@ -980,66 +694,76 @@ def _generate_csv_report(period_start, period_end, organization, agent,
             writer.writerow([f"  Zgłoszenia agenta: {ap['agent_name']}"])
             writer.writerow(['  ID', 'Tytuł', 'Status', 'Priorytet', 'Kategoria', 'Dyżur', 'Utworzono', 'Rozwiązano', 'Zamknięto', 'Rzecz. czas (h)'])
             
-            # Get agent's tickets in period
-            agent_id = ap.get('agent_id')
-            if agent_id:
-                # period_start and period_end are already date objects, use them directly
-                agent_tickets = Ticket.objects.filter(
-                    assigned_to_id=agent_id,
-                    created_at__date__gte=period_start,
-                    created_at__date__lte=period_end
-                )
-                # Apply on_duty filter to agent tickets detail
-                if on_duty_filter == 'true':
-                    agent_tickets = agent_tickets.filter(on_duty=True)
-                elif on_duty_filter == 'false':
-                    agent_tickets = agent_tickets.filter(on_duty=False)
-                agent_tickets = agent_tickets.order_by('-created_at')
-                
-                if agent_tickets.exists():
-                    status_labels = {'new': 'Nowy', 'in_progress': 'W trakcie', 'unresolved': 'Nierozwiązany', 'resolved': 'Rozwiązany', 'closed': 'Zamknięty'}
-                    priority_labels = {'low': 'Niski', 'medium': 'Średni', 'high': 'Wysoki', 'critical': 'Krytyczny'}
-                    category_labels = {'hardware': 'Sprzęt', 'software': 'Oprogramowanie', 'network': 'Sieć', 'account': 'Konto', 'other': 'Inne'}
-                    
-                    for ticket in agent_tickets:
-                        writer.writerow([
-                            f'  #{ticket.id}',
-                            ticket.title[:50] + ('...' if len(ticket.title) > 50 else ''),
-                            status_labels.get(ticket.status, ticket.status),
-                            priority_labels.get(ticket.priority, ticket.priority),
-                            category_labels.get(ticket.category, ticket.category),
-                            'Tak' if ticket.on_duty else 'Nie',
-                            ticket.created_at.strftime('%Y-%m-%d %H:%M'),
-                            ticket.resolved_at.strftime('%Y-%m-%d %H:%M') if ticket.resolved_at else '-',
-                            ticket.closed_at.strftime('%Y-%m-%d %H:%M') if ticket.closed_at else '-',
-                            f"{ticket.actual_resolution_time:.2f}" if ticket.actual_resolution_time else '-'
-                        ])
-                else:
-                    writer.writerow(['  ', 'Brak zgłoszeń w wybranym okresie'])
+            has_tickets = False
+            for ticket in agent_tickets:
+                has_tickets = True
+                writer.writerow([
+                    f'  #{ticket.id}',
+                    ticket.title[:50] + ('...' if len(ticket.title) > 50 else ''),
+                    STATUS_LABELS.get(ticket.status, ticket.status),
+                    PRIORITY_LABELS.get(ticket.priority, ticket.priority),
+                    CATEGORY_LABELS.get(ticket.category, ticket.category),
+                    'Tak' if ticket.on_duty else 'Nie',
+                    _format_datetime(ticket.created_at),
+                    _format_datetime(ticket.resolved_at),
+                    _format_datetime(ticket.closed_at),
+                    f"{ticket.actual_resolution_time:.2f}" if ticket.actual_resolution_time else '-'
+                ])
+            
+            if not has_tickets:
+                writer.writerow(['  ', 'Brak zgłoszeń w wybranym okresie'])
             
             writer.writerow([''])
     
-    return response
+    return spool.response(filename)
+
+def _agent_ticket_groups(tickets_query, agent_performance):
+    """
+    Yield (agent_data, tickets) pairs in agent_performance order
+    
+    All agents' tickets come from one streamed query ordered by agent position and
+    creation date, instead of a separate query per agent.
+    """
+    positions = {ap['agent_id']: index for index, ap in enumerate(agent_performance)}
+    if not positions:
+        return
+    
+    tickets = tickets_query.filter(
+        assigned_to_id__in=positions.keys()
+    ).order_by(
+        Case(
+            *[When(assigned_to_id=agent_id, then=Value(index)) for agent_id, index in positions.items()],
+            output_field=IntegerField()
+        ),
+        '-created_at'
+    ).only(*REPORT_TICKET_FIELDS)
+    
+    groups = groupby(tickets.iterator(chunk_size=2000), key=attrgetter('assigned_to_id'))
+    current = next(groups, None)
+    
+    for ap in agent_performance:
+        if current is not None and current[0] == ap['agent_id']:
+            yield ap, current[1]
+            current = next(groups, None)
+        else:
+            yield ap, iter(())
+
+
+def _format_datetime(value):
+    """Format a ticket timestamp for reports ('-' when empty)"""
+    return value.strftime('%Y-%m-%d %H:%M') if value else '-'
+
 
 def _generate_excel_report(period_start, period_end, organization, agent,
                           tickets_opened, tickets_closed, tickets_resolved, tickets_new,
                           tickets_in_progress, tickets_unresolved, avg_resolution_time,
                           priority_distribution, category_distribution, agent_performance,
-                          on_duty_filter=''):
-    """Generate Excel report with formatting"""
+                          tickets_query=None):
+    """Generate Excel report with formatting (streamed write-only workbook)"""
     logger.info("Starting Excel report generation...")
     
     try:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Raport Statystyk"
-        logger.info("Created Excel workbook")
-        
-        # Styles
-        header_font = Font(bold=True, size=14)
-        subheader_font = Font(bold=True, size=12)
-        bold_font = Font(bold=True)
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        sheet = StreamingSheet("Raport Statystyk", styles=REPORT_STYLES)
         
         # Generate filename
         org_name = organization.name if organization else "Wszystkie"
@@ -1052,30 +776,19 @@ def _generate_excel_report(period_start, period_end, organization, agent,
         logger.info(f"Report for organization: {org_name}, agent: {agent_name}")
         
         # Header information
-        ws['A1'] = 'RAPORT STATYSTYK ZGŁOSZEŃ'
-        ws['A1'].font = header_font
-        
-        row = 3
-        ws[f'A{row}'] = 'Okres:'
-        ws[f'B{row}'] = f"{period_start} - {period_end}"
-        row += 1
-        ws[f'A{row}'] = 'Organizacja:'
-        ws[f'B{row}'] = organization.name if organization else "Wszystkie"
-        row += 1
-        ws[f'A{row}'] = 'Agent:'
-        ws[f'B{row}'] = agent.username if agent else "Wszyscy"
-        row += 1
-        ws[f'A{row}'] = 'Data generacji:'
-        ws[f'B{row}'] = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        row += 3
+        sheet.append([('RAPORT STATYSTYK ZGŁOSZEŃ', 'header')])
+        sheet.append()
+        sheet.append(['Okres:', f"{period_start} - {period_end}"])
+        sheet.append(['Organizacja:', organization.name if organization else "Wszystkie"])
+        sheet.append(['Agent:', agent.username if agent else "Wszyscy"])
+        sheet.append(['Data generacji:', timezone.now().strftime('%Y-%m-%d %H:%M:%S')])
+        sheet.append()
+        sheet.append()
         
         logger.info("Adding summary statistics to Excel...")
         
         # Summary statistics
-        ws[f'A{row}'] = 'PODSUMOWANIE'
-        ws[f'A{row}'].font = subheader_font
-        row += 1
+        sheet.append([('PODSUMOWANIE', 'subheader')])
         
         summary_data = [
             ('Łącznie zgłoszeń:', tickets_opened),
@@ -1088,235 +801,94 @@ def _generate_excel_report(period_start, period_end, organization, agent,
         ]
         
         for label, value in summary_data:
-            ws[f'A{row}'] = label
-            ws[f'B{row}'] = value
-            ws[f'A{row}'].font = bold_font
-            row += 1
+            sheet.append([(label, 'bold'), value])
         
-        row += 2
+        sheet.append()
+        sheet.append()
         
         logger.info("Adding priority distribution to Excel...")
         
         # Priority distribution
-        ws[f'A{row}'] = 'ROZKŁAD WEDŁUG PRIORYTETU'
-        ws[f'A{row}'].font = subheader_font
-        row += 1
-        
-        ws[f'A{row}'] = 'Priorytet'
-        ws[f'B{row}'] = 'Liczba zgłoszeń'
-        ws[f'A{row}'].font = bold_font
-        ws[f'B{row}'].font = bold_font
-        row += 1
-        
-        priority_labels = {'low': 'Niski', 'medium': 'Średni', 'high': 'Wysoki', 'critical': 'Krytyczny'}
+        sheet.append([('ROZKŁAD WEDŁUG PRIORYTETU', 'subheader')])
+        sheet.append([('Priorytet', 'bold'), ('Liczba zgłoszeń', 'bold')])
         for priority, count in priority_distribution.items():
-            ws[f'A{row}'] = priority_labels.get(priority, priority)
-            ws[f'B{row}'] = count
-            row += 1
+            sheet.append([PRIORITY_LABELS.get(priority, priority), count])
         
-        row += 2
+        sheet.append()
+        sheet.append()
         
         logger.info("Adding category distribution to Excel...")
         
         # Category distribution
-        ws[f'A{row}'] = 'ROZKŁAD WEDŁUG KATEGORII'
-        ws[f'A{row}'].font = subheader_font
-        row += 1
-        
-        ws[f'A{row}'] = 'Kategoria'
-        ws[f'B{row}'] = 'Liczba zgłoszeń'
-        ws[f'A{row}'].font = bold_font
-        ws[f'B{row}'].font = bold_font
-        row += 1
-        
-        category_labels = {'hardware': 'Sprzęt', 'software': 'Oprogramowanie', 'network': 'Sieć', 'account': 'Konto', 'other': 'Inne'}
+        sheet.append([('ROZKŁAD WEDŁUG KATEGORII', 'subheader')])
+        sheet.append([('Kategoria', 'bold'), ('Liczba zgłoszeń', 'bold')])
         for category, count in category_distribution.items():
-            ws[f'A{row}'] = category_labels.get(category, category)
-            ws[f'B{row}'] = count
-            row += 1
+            sheet.append([CATEGORY_LABELS.get(category, category), count])
         
         # Agent performance with tickets details
         if agent_performance:
-            row += 2
+            sheet.append()
+            sheet.append()
             logger.info(f"Adding agent performance data ({len(agent_performance)} agents) to Excel...")
             
-            ws[f'A{row}'] = 'WYDAJNOŚĆ AGENTÓW'
-            ws[f'A{row}'].font = subheader_font
-            row += 1
+            sheet.append([('WYDAJNOŚĆ AGENTÓW', 'subheader')])
             
             headers = ['Agent', 'Liczba zgłoszeń', 'Rozwiązanych', '% rozwiązanych', 'Śr. czas rozwiązania (godz.)', 'Śr. rzeczywisty czas (godz.)', 'Zgł. z rzecz. czasem']
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=row, column=col, value=header)
-                cell.font = bold_font
-            row += 1
-            
-            # Colors for status badges (using global PatternFill import)
-            status_colors = {
-                'new': PatternFill(start_color="007bff", end_color="007bff", fill_type="solid"),
-                'in_progress': PatternFill(start_color="17a2b8", end_color="17a2b8", fill_type="solid"),
-                'unresolved': PatternFill(start_color="ffc107", end_color="ffc107", fill_type="solid"),
-                'resolved': PatternFill(start_color="28a745", end_color="28a745", fill_type="solid"),
-                'closed': PatternFill(start_color="6c757d", end_color="6c757d", fill_type="solid")
-            }
-            
-            priority_colors = {
-                'low': PatternFill(start_color="6c757d", end_color="6c757d", fill_type="solid"),
-                'medium': PatternFill(start_color="17a2b8", end_color="17a2b8", fill_type="solid"),
-                'high': PatternFill(start_color="ffc107", end_color="ffc107", fill_type="solid"),
-                'critical': PatternFill(start_color="dc3545", end_color="dc3545", fill_type="solid")
-            }
-            
-            white_font = Font(color="FFFFFF", bold=True)
+            sheet.append([(header, 'bold') for header in headers])
             
-            logger.info(f"Excel Report - Processing {len(agent_performance)} agents")
+            ticket_headers = ['ID', 'Tytuł', 'Status', 'Priorytet', 'Kategoria', 'Dyżur', 'Utworzono', 'Rozwiązano', 'Zamknięto', 'Rzecz. czas (h)']
             
-            for ap in agent_performance:
-                logger.info(f"Agent {ap['agent_name']}: avg_actual_resolution_time = {ap.get('avg_actual_resolution_time')}, tickets_with_actual_time = {ap.get('tickets_with_actual_time', 0)}")
+            for ap, agent_tickets in _agent_ticket_groups(tickets_query, agent_performance):
                 avg_actual = f"{ap['avg_actual_resolution_time']:.2f}" if ap.get('avg_actual_resolution_time') else "Brak danych"
-                tickets_actual = ap.get('tickets_with_actual_time', 0)
                 
-                ws[f'A{row}'] = ap['agent_name']
-                ws[f'A{row}'].font = bold_font
-                ws[f'B{row}'] = ap['ticket_count']
-                ws[f'C{row}'] = ap['resolved_count']
-                ws[f'D{row}'] = f"{ap['resolution_rate']:.1f}%"
-                ws[f'E{row}'] = f"{ap['avg_resolution_time']:.2f}"
-                ws[f'F{row}'] = avg_actual
-                ws[f'G{row}'] = tickets_actual
-                row += 1
+                sheet.append([
+                    (ap['agent_name'], 'bold'),
+                    ap['ticket_count'],
+                    ap['resolved_count'],
+                    f"{ap['resolution_rate']:.1f}%",
+                    f"{ap['avg_resolution_time']:.2f}",
+                    avg_actual,
+                    ap.get('tickets_with_actual_time', 0),
+                ])
                 
                 # Add agent's tickets details
-                row += 1
-                ws[f'A{row}'] = f"Zgłoszenia agenta: {ap['agent_name']}"
-                ws[f'A{row}'].font = Font(bold=True, italic=True)
-                row += 1
+                sheet.append()
+                sheet.append([(f"Zgłoszenia agenta: {ap['agent_name']}", 'bold_italic')])
+                sheet.append([(header, 'table_header') for header in ticket_headers])
                 
-                ticket_headers = ['ID', 'Tytuł', 'Status', 'Priorytet', 'Kategoria', 'Dyżur', 'Utworzono', 'Rozwiązano', 'Zamknięto', 'Rzecz. czas (h)']
-                for col, header in enumerate(ticket_headers, 1):
-                    cell = ws.cell(row=row, column=col, value=header)
-                    cell.font = bold_font
-                    cell.fill = PatternFill(start_color="e9ecef", end_color="e9ecef", fill_type="solid")
-                row += 1
+                ticket_count = 0
+                for ticket in agent_tickets:
+                    ticket_count += 1
+                    sheet.append([
+                        f'#{ticket.id}',
+                        ticket.title[:50] + ('...' if len(ticket.title) > 50 else ''),
+                        (STATUS_LABELS.get(ticket.status, ticket.status), f'status_{ticket.status}' if ticket.status in STATUS_LABELS else None),
+                        (PRIORITY_LABELS.get(ticket.priority, ticket.priority), f'priority_{ticket.priority}' if ticket.priority in PRIORITY_LABELS else None),
+                        CATEGORY_LABELS.get(ticket.category, ticket.category),
+                        ('Tak', 'on_duty_yes') if ticket.on_duty else ('Nie', 'on_duty_no'),
+                        _format_datetime(ticket.created_at),
+                        _format_datetime(ticket.resolved_at),
+                        _format_datetime(ticket.closed_at),
+                        f"{ticket.actual_resolution_time:.2f}" if ticket.actual_resolution_time else '-',
+                    ])
                 
-                # Get agent's tickets in period
-                agent_id = ap.get('agent_id')
-                logger.info(f"Excel Report - Processing agent: {ap.get('agent_name')}, agent_id={agent_id}")
-                logger.info(f"Excel Report - Period: {period_start} to {period_end} (types: {type(period_start)}, {type(period_end)})")
-                
-                if agent_id:
-                    # period_start and period_end are already date objects, use them directly
-                    agent_tickets = Ticket.objects.filter(
-                        assigned_to_id=agent_id,
-                        created_at__date__gte=period_start,
-                        created_at__date__lte=period_end
-                    )
-                    # Apply on_duty filter to agent tickets detail
-                    if on_duty_filter == 'true':
-                        agent_tickets = agent_tickets.filter(on_duty=True)
-                    elif on_duty_filter == 'false':
-                        agent_tickets = agent_tickets.filter(on_duty=False)
-                    agent_tickets = agent_tickets.order_by('-created_at')
-                    
-                    logger.info(f"Excel Report - Found {agent_tickets.count()} tickets for agent {agent_id}")
-                    
-                    if agent_tickets.exists():
-                        logger.info(f"Excel Report - Writing {agent_tickets.count()} tickets to Excel")
-                        status_labels = {'new': 'Nowy', 'in_progress': 'W trakcie', 'unresolved': 'Nierozwiązany', 'resolved': 'Rozwiązany', 'closed': 'Zamknięty'}
-                        priority_labels = {'low': 'Niski', 'medium': 'Średni', 'high': 'Wysoki', 'critical': 'Krytyczny'}
-                        category_labels = {'hardware': 'Sprzęt', 'software': 'Oprogramowanie', 'network': 'Sieć', 'account': 'Konto', 'other': 'Inne'}
-                        
-                        for ticket in agent_tickets:
-                            ws[f'A{row}'] = f'#{ticket.id}'
-                            ws[f'B{row}'] = ticket.title[:50] + ('...' if len(ticket.title) > 50 else '')
-                            
-                            # Status with color
-                            status_cell = ws[f'C{row}']
-                            status_cell.value = status_labels.get(ticket.status, ticket.status)
-                            if ticket.status in status_colors:
-                                status_cell.fill = status_colors[ticket.status]
-                                status_cell.font = white_font
-                            
-                            # Priority with color
-                            priority_cell = ws[f'D{row}']
-                            priority_cell.value = priority_labels.get(ticket.priority, ticket.priority)
-                            if ticket.priority in priority_colors:
-                                priority_cell.fill = priority_colors[ticket.priority]
-                                priority_cell.font = white_font
-                            
-                            ws[f'E{row}'] = category_labels.get(ticket.category, ticket.category)
-                            
-                            # On Duty with color
-                            on_duty_cell = ws[f'F{row}']
-                            on_duty_cell.value = 'Tak' if ticket.on_duty else 'Nie'
-                            if ticket.on_duty:
-                                on_duty_cell.fill = PatternFill(start_color="28a745", end_color="28a745", fill_type="solid")
-                                on_duty_cell.font = white_font
-                            else:
-                                on_duty_cell.fill = PatternFill(start_color="dc3545", end_color="dc3545", fill_type="solid")
-                                on_duty_cell.font = white_font
-                            
-                            ws[f'G{row}'] = ticket.created_at.strftime('%Y-%m-%d %H:%M')
-                            ws[f'H{row}'] = ticket.resolved_at.strftime('%Y-%m-%d %H:%M') if ticket.resolved_at else '-'
-                            ws[f'I{row}'] = ticket.closed_at.strftime('%Y-%m-%d %H:%M') if ticket.closed_at else '-'
-                            ws[f'J{row}'] = f"{ticket.actual_resolution_time:.2f}" if ticket.actual_resolution_time else '-'
-                            row += 1
-                    else:
-                        logger.warning(f"Excel Report - No tickets found for agent {agent_id} in period")
-                        ws[f'A{row}'] = 'Brak zgłoszeń w wybranym okresie'
-                        ws[f'A{row}'].font = Font(italic=True, color="6c757d")
-                        row += 1
+                if ticket_count:
+                    logger.info(f"Excel Report - Wrote {ticket_count} tickets for agent {ap['agent_id']}")
                 else:
-                    logger.error(f"Excel Report - agent_id is missing! Agent data: {ap}")
-                    ws[f'A{row}'] = 'Błąd: Brak ID agenta'
-                    ws[f'A{row}'].font = Font(italic=True, color="dc3545")
-                    row += 1
+                    logger.warning(f"Excel Report - No tickets found for agent {ap['agent_id']} in period")
+                    sheet.append([('Brak zgłoszeń w wybranym okresie', 'muted_italic')])
                 
-                row += 1
-        
-        logger.info("Auto-adjusting column widths...")
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        logger.info("Preparing HTTP response...")
-        
-        # Create response with proper headers
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                sheet.append()
         
         # Generate clean filename
         filename = f"raport_statystyk_{period_start}_{period_end}_{org_name}_{agent_name}.xlsx"
+        logger.info(f"Saving Excel file with filename: {filename}")
         
-        # Set proper headers for file download
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response = xlsx_response([sheet], filename)
         response['Content-Description'] = 'File Transfer'
-        response['Content-Transfer-Encoding'] = 'binary'
         response['Cache-Control'] = 'must-revalidate, post-check=0, pre-check=0'
         response['Pragma'] = 'public'
         
-        logger.info(f"Saving Excel file with filename: {filename}")
-        
-        # Save workbook to response
-        try:
-            wb.save(response)
-            logger.info("Excel file saved to response successfully")
-        except Exception as save_error:
-            logger.error(f"Error saving workbook to response: {save_error}")
-            raise
-        
-        # Log response details
-        logger.info(f"Response content type: {response.get('Content-Type')}")
-        logger.info(f"Response content disposition: {response.get('Content-Disposition')}")
-        
         logger.info("Excel report generation completed successfully")
         return response
         
@@ -1335,8 +907,19 @@ def generate_organization_report(request):
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Metoda POST wymagana'}, status=405)
     
+    return build_organization_report(request.user, request.POST)
+
+
+def build_organization_report(user, params):
+    """
+    Build the organization report file for a user
+    
+    Shared by the download view and the background report jobs.
+    
+    Returns:
+        FileResponse with the report, or JsonResponse describing the error
+    """
     try:
-        user = request.user
         role = user.profile.role
         
         # Only admins and superagents can generate this report
@@ -1344,11 +927,11 @@ def generate_organization_report(request):
             return JsonResponse({'status': 'error', 'message': 'Brak uprawnień'}, status=403)
         
         # Parse dates
-        period_start = request.POST.get('period_start')
-        period_end = request.POST.get('period_end')
-        organization_id = request.POST.get('organization', '')
-        agent_id = request.POST.get('agent', '')
-        on_duty_filter = request.POST.get('on_duty', '')
+        period_start = params.get('period_start')
+        period_end = params.get('period_end')
+        organization_id = params.get('organization', '')
+        agent_id = params.get('agent', '')
+        on_duty_filter = params.get('on_duty', '')
         
         if not period_start or not period_end:
             return JsonResponse({'status': 'error', 'message': 'Wymagane są daty początkowa i końcowa'}, status=400)
@@ -1385,82 +968,44 @@ def generate_organization_report(request):
             elif on_duty_filter == 'false':
                 tickets_query = tickets_query.filter(on_duty=False)
         
-        # Group by organization and calculate average actual resolution time
-        org_stats = []
-        
+        # Group by organization in a single query (only organizations visible to the user)
         if role == 'admin':
             organizations = Organization.objects.all()
         else:  # superagent
             organizations = user.profile.organizations.all()
         
-        for org in organizations:
-            org_tickets = tickets_query.filter(organization=org)
-            
-            if org_tickets.exists():
-                total_time = org_tickets.aggregate(
-                    total_actual=Sum('actual_resolution_time')
-                )['total_actual']
-                
-                tickets_count = org_tickets.count()
-                
-                org_stats.append({
-                    'name': org.name,
-                    'total_actual_time': float(total_time) if total_time else 0,
-                    'tickets_count': tickets_count
-                })
-        
-        # Sort by total time (descending)
-        org_stats.sort(key=lambda x: x['total_actual_time'], reverse=True)
+        org_stats = tickets_query.filter(
+            organization__in=organizations
+        ).values(
+            'organization', 'organization__name'
+        ).annotate(
+            total_actual=Sum('actual_resolution_time'),
+            tickets_count=Count('id')
+        ).order_by('-total_actual', 'organization__name')
         
         # Generate Excel file
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Raport firm"
-        
-        # Styles
-        header_font = Font(bold=True, size=14)
-        subheader_font = Font(bold=True, size=12)
-        bold_font = Font(bold=True)
+        ws = StreamingSheet("Raport firm", styles=REPORT_STYLES)
         
         # Title
-        ws['A1'] = 'RAPORT RZECZYWISTYCH CZASÓW OBSŁUGI FIRM'
-        ws['A1'].font = header_font
-        ws.merge_cells('A1:C1')
+        ws.append([('RAPORT RZECZYWISTYCH CZASÓW OBSŁUGI FIRM', 'header')])
+        ws.merge('A1:C1')
+        ws.append()
         
         # Period info
-        ws['A3'] = f'Okres: {period_start_date} - {period_end_date}'
-        ws['A3'].font = bold_font
-        
-        ws['A4'] = f'Data generacji: {timezone.now().strftime("%Y-%m-%d %H:%M:%S")}'
+        ws.append([(f'Okres: {period_start_date} - {period_end_date}', 'bold')])
+        ws.append([f'Data generacji: {timezone.now().strftime("%Y-%m-%d %H:%M:%S")}'])
+        ws.append()
         
         # Headers
-        row = 6
-        headers = ['Firma', 'Suma rzeczywistego czasu (godz.)', 'Liczba zgłoszeń']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.font = bold_font
+        ws.append([(header, 'bold') for header in ['Firma', 'Suma rzeczywistego czasu (godz.)', 'Liczba zgłoszeń']])
         
         # Data
-        row += 1
-        for org_data in org_stats:
-            ws[f'A{row}'] = org_data['name']
-            ws[f'B{row}'] = f"{org_data['total_actual_time']:.2f}"
-            ws[f'C{row}'] = org_data['tickets_count']
-            row += 1
-        
-        # Auto-adjust column widths
-        for col_idx, column_cells in enumerate(ws.columns, 1):
-            length = max(len(str(cell.value or '')) for cell in column_cells if hasattr(cell, 'value'))
-            ws.column_dimensions[get_column_letter(col_idx)].width = min(length + 2, 50)
+        for org_data in org_stats.iterator():
+            total_time = float(org_data['total_actual']) if org_data['total_actual'] else 0
+            ws.append([org_data['organization__name'], f"{total_time:.2f}", org_data['tickets_count']])
         
-        # Prepare response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
         filename = f"raport_firm_{period_start_date}_{period_end_date}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
+        response = xlsx_response([ws], filename)
         logger.info(f"Organization report generated successfully: {filename}")
         
         return response
@@ -1,85 +1,107 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from ..models import Ticket
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from asgiref.sync import sync_to_async
+from ..decorators import conditional_get
+from ..services.search import filter_tickets, search_tickets
+from ..services.ticket_feed import (
+    CursorExpired, current_cursor, status_counts, ticket_changes, hub, subscriber_scope
+)
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Server-Sent Events stream timing (seconds)
+EVENTS_HEARTBEAT = 25  # comment line keeping proxies from closing an idle stream
+EVENTS_MAX_AGE = 300  # the stream ends and the browser reconnects, so streams of vanished clients do not linger
+EVENTS_RETRY_MS = 5000  # reconnect delay announced to the browser
+
 @login_required
 def ticket_display_view(request):
     """Widok wyświetlający listę zgłoszeń dla roli viewer"""
     tickets = Ticket.objects.all().order_by('-created_at')
     return render(request, 'crm/ticket_display.html', {
         'tickets': tickets,
+        'board_cursor': current_cursor(),
     })
 
+def _board_tickets(request):
+    """
+    Tickets shown on the board for the request's filters and the user's role
+
+    Returns:
+        tuple: (queryset, filtered) - filtered is True when any filter was given
+    """
+    status_filter = request.GET.get('status', '')
+    priority_filter = request.GET.get('priority', '')
+    organization_filter = request.GET.get('organization', '')
+    assigned_filter = request.GET.get('assigned', '')
+    
+    logger.debug(f"Filtry: status={status_filter}, priority={priority_filter}, org={organization_filter}, assigned={assigned_filter}")
+    
+    tickets = Ticket.objects.all().order_by('-created_at')
+    
+    # Apply filters
+    if status_filter:
+        tickets = tickets.filter(status=status_filter)
+    if priority_filter:
+        tickets = tickets.filter(priority=priority_filter)
+    if organization_filter:
+        tickets = tickets.filter(organization_id=organization_filter)
+    if assigned_filter == 'me':
+        tickets = tickets.filter(assigned_to=request.user)
+    elif assigned_filter == 'unassigned':
+        tickets = tickets.filter(assigned_to__isnull=True)
+    
+    # Filter based on user permissions
+    user = request.user
+    if user.profile.role == 'client':
+        # Client can only see tickets from their organizations or created by them
+        user_orgs = user.profile.organizations.all()
+        tickets = tickets.filter(
+            Q(organization__in=user_orgs) | Q(created_by=user)
+        ).distinct()
+    elif user.profile.role in ['agent', 'superagent']:
+        # Agent and Superagent can see tickets from their organizations
+        user_orgs = user.profile.organizations.all()
+        tickets = tickets.filter(organization__in=user_orgs)
+    
+    filtered = bool(status_filter or priority_filter or organization_filter or assigned_filter)
+    return tickets, filtered
+
+
+def _board_version(request):
+    """Version stamp of the board: newest change and number of visible tickets"""
+    tickets, _ = _board_tickets(request)
+    search_query = request.GET.get('search', '')
+    if search_query:
+        tickets = filter_tickets(tickets, search_query)
+    stamp = tickets.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return stamp['last_modified'], stamp['count']
+
+
 @login_required
+@conditional_get(_board_version)
 def get_tickets_update(request):
     """Endpoint do odświeżania listy zgłoszeń dla zalogowanych użytkowników"""
     logger.info(f"Otrzymano żądanie aktualizacji listy zgłoszeń od użytkownika: {request.user.username}")
     try:
-        # Get filter parameters from request
-        status_filter = request.GET.get('status', '')
-        priority_filter = request.GET.get('priority', '')
-        organization_filter = request.GET.get('organization', '')
-        assigned_filter = request.GET.get('assigned', '')
-        search_query = request.GET.get('search', '')
-        
-        logger.info(f"Filtry: status={status_filter}, priority={priority_filter}, org={organization_filter}, assigned={assigned_filter}, search={search_query}")
-        
-        # Base queryset
-        tickets = Ticket.objects.all().order_by('-created_at')
-        initial_count = tickets.count()
-        logger.info(f"Początkowa liczba zgłoszeń: {initial_count}")
-        
-        # Apply filters
-        if status_filter:
-            tickets = tickets.filter(status=status_filter)
-            logger.info(f"Po filtrze statusu '{status_filter}': {tickets.count()} zgłoszeń")
+        # Taken before reading the tickets, so changes made meanwhile are picked up by the next delta
+        cursor = current_cursor()
+        tickets, filtered = _board_tickets(request)
         
-        if priority_filter:
-            tickets = tickets.filter(priority=priority_filter)
-            logger.info(f"Po filtrze priorytetu '{priority_filter}': {tickets.count()} zgłoszeń")
-            
-        if organization_filter:
-            tickets = tickets.filter(organization_id=organization_filter)
-            logger.info(f"Po filtrze organizacji '{organization_filter}': {tickets.count()} zgłoszeń")
-            
-        if assigned_filter == 'me':
-            tickets = tickets.filter(assigned_to=request.user)
-            logger.info(f"Po filtrze 'przypisane do mnie': {tickets.count()} zgłoszeń")
-        elif assigned_filter == 'unassigned':
-            tickets = tickets.filter(assigned_to__isnull=True)
-            logger.info(f"Po filtrze 'nieprzypisane': {tickets.count()} zgłoszeń")
-            
+        # Full-text search runs within the user's scope and orders results by relevance
+        search_query = request.GET.get('search', '')
         if search_query:
-            tickets = tickets.filter(
-                Q(title__icontains=search_query) | 
-                Q(description__icontains=search_query) |
-                Q(id__icontains=search_query)
-            )
-            logger.info(f"Po filtrze wyszukiwania '{search_query}': {tickets.count()} zgłoszeń")
-        
-        # Filter based on user permissions
-        user = request.user
-        if user.profile.role == 'client':
-            # Client can only see tickets from their organizations or created by them
-            user_orgs = user.profile.organizations.all()
-            tickets = tickets.filter(
-                Q(organization__in=user_orgs) | Q(created_by=user)
-            ).distinct()
-            logger.info(f"Po filtrze uprawnień klienta: {tickets.count()} zgłoszeń")
-        elif user.profile.role in ['agent', 'superagent']:
-            # Agent and Superagent can see tickets from their organizations
-            user_orgs = user.profile.organizations.all()
-            tickets = tickets.filter(organization__in=user_orgs)
-            logger.info(f"Po filtrze uprawnień agenta/superagenta: {tickets.count()} zgłoszeń")
-        
-        final_count = tickets.count()
-        logger.info(f"Końcowa liczba zgłoszeń po wszystkich filtrach: {final_count}")
+            tickets = search_tickets(tickets, search_query)
+            filtered = True
         
         # Render the HTML partial
         try:
@@ -87,34 +109,27 @@ def get_tickets_update(request):
                 'tickets': tickets,
                 'user': request.user
             })
-            logger.info("Renderowanie HTML zakończone pomyślnie")
         except Exception as e:
             logger.error(f"Błąd renderowania HTML: {e}")
             raise
         
         # Prepare additional data for enhanced UI feedback
         try:
-            status_counts = {
-                'new': tickets.filter(status='new').count(),
-                'in_progress': tickets.filter(status='in_progress').count(),
-                'unresolved': tickets.filter(status='unresolved').count(),
-                'resolved': tickets.filter(status='resolved').count(),
-                'closed': tickets.filter(status='closed').count(),
-            }
-            logger.info(f"Liczby statusów: {status_counts}")
+            counts = status_counts(tickets)
         except Exception as e:
             logger.error(f"Błąd obliczania liczby statusów: {e}")
-            status_counts = {}
+            counts = {}
         
         # Return JSON response with HTML and metadata
         response_data = {
             'html': html,
-            'ticket_count': final_count,
-            'status_counts': status_counts,
-            'filtered': bool(status_filter or priority_filter or organization_filter or assigned_filter or search_query)
+            'ticket_count': sum(counts.values()) if counts else tickets.count(),
+            'status_counts': counts,
+            'filtered': filtered,
+            'cursor': cursor,
         }
         
-        logger.info("Wysyłanie odpowiedzi z aktualizacją")
+        logger.debug(f"Wysyłanie odpowiedzi z aktualizacją ({response_data['ticket_count']} zgłoszeń)")
         return JsonResponse(response_data)
     
     except Exception as e:
@@ -124,4 +139,104 @@ def get_tickets_update(request):
         return JsonResponse({
             'error': str(e),
             'details': 'Sprawdź logi serwera aby uzyskać więcej informacji'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+@login_required
+def get_tickets_delta(request):
+    """
+    Endpoint zwracający tylko zmiany na liście zgłoszeń od podanego kursora (since)
+
+    Odpowiedź zawiera zmienione zgłoszenia (gotowe fragmenty HTML), identyfikatory zgłoszeń
+    do usunięcia z listy i nowy kursor. Liczby statusów są liczone tylko gdy coś się zmieniło.
+    Przy nieważnym lub zbyt starym kursorze zwraca reset=True - klient pobiera wtedy pełną listę.
+    """
+    since = request.GET.get('since', '')
+    tickets, filtered = _board_tickets(request)
+    
+    try:
+        delta = ticket_changes(tickets, since, scope=subscriber_scope(request.user))
+    except CursorExpired:
+        logger.debug(f"Kursor listy zgłoszeń wygasł dla użytkownika {request.user.username}")
+        return JsonResponse({'reset': True})
+    
+    changed = [
+        {
+            'id': ticket.id,
+            'created_at': int(ticket.created_at.timestamp()),
+            'row_html': render_to_string('crm/includes/ticket_board_row.html', {'ticket': ticket}),
+            'card_html': render_to_string('crm/includes/ticket_board_card.html', {'ticket': ticket}),
+        }
+        for ticket in delta['changed']
+    ]
+    
+    response_data = {
+        'reset': False,
+        'changed': changed,
+        'removed': delta['removed'],
+        'cursor': delta['cursor'],
+        'has_more': delta['has_more'],
+        'filtered': filtered,
+    }
+    
+    if changed or delta['removed']:
+        counts = status_counts(tickets)
+        response_data['status_counts'] = counts
+        response_data['ticket_count'] = sum(counts.values())
+        logger.debug(f"Zmiany listy zgłoszeń: {len(changed)} zmienionych, {len(delta['removed'])} usuniętych")
+    
+    return JsonResponse(response_data)
+
+
+def _events_scope(request):
+    """Event scope of the logged-in user, None for anonymous requests"""
+    if not request.user.is_authenticated:
+        return None
+    return subscriber_scope(request.user)
+
+
+async def _event_stream(subscription):
+    """Format hub events as Server-Sent Events until EVENTS_MAX_AGE passes"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EVENTS_MAX_AGE
+    try:
+        yield f'retry: {EVENTS_RETRY_MS}\n\n'
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            event = await subscription.get(min(EVENTS_HEARTBEAT, remaining))
+            if event is None:
+                yield ': ping\n\n'
+                continue
+            data = json.dumps({'id': event['ticket_id'], 'kind': event['kind'], 'status': event['status']})
+            yield f'event: ticket\ndata: {data}\n\n'
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def ticket_events(request):
+    """
+    Strumień Server-Sent Events ze zmianami zgłoszeń widocznych dla użytkownika
+
+    Działa tylko pod serwerem ASGI (projekt_wdrozeniowy/asgi.py). Pod WSGI, przy wyłączonym
+    TICKET_EVENTS_ENABLED albo po przekroczeniu limitu połączeń zwraca 503 - klient zostaje
+    wtedy przy odpytywaniu get_tickets_delta.
+    """
+    if not isinstance(request, ASGIRequest) or not settings.TICKET_EVENTS_ENABLED:
+        return JsonResponse({'error': 'Strumień zdarzeń jest niedostępny', 'fallback': 'polling'}, status=503)
+    
+    # login_required does not wrap async views in this Django version
+    scope = await sync_to_async(_events_scope)(request)
+    if scope is None:
+        return JsonResponse({'error': 'Wymagane zalogowanie'}, status=401)
+    
+    if hub.subscriber_count >= settings.TICKET_EVENTS_MAX_SUBSCRIBERS:
+        logger.warning("Osiągnięto limit połączeń strumienia zdarzeń zgłoszeń")
+        return JsonResponse({'error': 'Zbyt wiele połączeń', 'fallback': 'polling'}, status=503)
+    
+    response = StreamingHttpResponse(_event_stream(hub.subscribe(scope)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Disable response buffering in nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -10,7 +10,9 @@ from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.contrib.auth.models import User
 from crm.models import Ticket, TicketCalendarAssignment, CalendarDuty
-from crm.decorators import role_required
+from crm.decorators import role_required, conditional_get
+from crm.services.business_calendar import get_business_calendar
+from django.db.models import Count, Max
 import logging
 
 logger = logging.getLogger(__name__)
@@ -59,11 +61,11 @@ def assign_ticket_to_calendar(request, ticket_id):
                 'error': 'Nie można przypisać zgłoszenia na przeszłą datę.'
             }, status=400)
         
-        # Validate date is not a weekend
-        if assigned_date.weekday() >= 5:  # Saturday = 5, Sunday = 6
+        # Validate date is a business day (not a weekend or holiday)
+        if not get_business_calendar().is_business_day(assigned_date):
             return JsonResponse({
                 'success': False,
-                'error': 'Nie można przypisać zgłoszenia na weekend. Wybierz dzień roboczy.'
+                'error': 'Nie można przypisać zgłoszenia na weekend ani dzień wolny od pracy. Wybierz dzień roboczy.'
             }, status=400)
         
         # Determine who to assign to
@@ -142,41 +144,82 @@ def assign_ticket_to_calendar(request, ticket_id):
         }, status=500)
 
 
+def _requested_month(request):
+    """
+    Year and month from the query params (default to current month)
+
+    Raises:
+        ValueError: When year or month is not a number
+    """
+    year = request.GET.get('year')
+    month = request.GET.get('month')
+    if year and month:
+        return int(year), int(month)
+    now = timezone.now()
+    return now.year, now.month
+
+
+def _open_assignments(year, month):
+    """Calendar assignments of a month, without resolved or closed tickets (no need to show them)"""
+    return TicketCalendarAssignment.objects.filter(
+        assigned_date__year=year,
+        assigned_date__month=month
+    ).exclude(
+        ticket__status__in=['resolved', 'closed']
+    )
+
+
+def _calendar_version(request):
+    """Version stamp of the calendar month: assignments (with their tickets) and duties"""
+    try:
+        year, month = _requested_month(request)
+    except ValueError:
+        return None
+    
+    assignments = _open_assignments(year, month)
+    if request.user.profile.role not in ['admin', 'superagent']:
+        assignments = assignments.filter(assigned_to=request.user)
+    assignment_stamp = assignments.aggregate(
+        count=Count('id'),
+        changed=Max('updated_at'),
+        ticket_changed=Max('ticket__updated_at')
+    )
+    duty_stamp = CalendarDuty.objects.filter(
+        duty_date__year=year,
+        duty_date__month=month
+    ).aggregate(count=Count('id'), changed=Max('updated_at'))
+    
+    last_modified = max(
+        filter(None, [assignment_stamp['changed'], assignment_stamp['ticket_changed'], duty_stamp['changed']]),
+        default=None
+    )
+    return last_modified, (
+        assignment_stamp['count'], assignment_stamp['changed'], assignment_stamp['ticket_changed'],
+        duty_stamp['count'], duty_stamp['changed']
+    )
+
+
 @login_required
 @role_required(['admin', 'superagent', 'agent'])
+@conditional_get(_calendar_version)
 def get_calendar_assignments(request):
     """
     Get calendar assignments for the current user and month.
     Used by the dashboard calendar widget.
     """
     try:
-        # Get year and month from query params (default to current month)
-        year = request.GET.get('year')
-        month = request.GET.get('month')
-        
-        if year and month:
-            try:
-                year = int(year)
-                month = int(month)
-            except ValueError:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Nieprawidłowy rok lub miesiąc.'
-                }, status=400)
-        else:
-            now = timezone.now()
-            year = now.year
-            month = now.month
+        try:
+            year, month = _requested_month(request)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Nieprawidłowy rok lub miesiąc.'
+            }, status=400)
         
         # Everyone sees only their own assignments
         # If admin wants to check someone else's calendar, they can use admin panel
-        # Exclude tickets that are resolved or closed - no need to show them in calendar
-        assignments = TicketCalendarAssignment.objects.filter(
-            assigned_to=request.user,
-            assigned_date__year=year,
-            assigned_date__month=month
-        ).exclude(
-            ticket__status__in=['resolved', 'closed']
+        assignments = _open_assignments(year, month).filter(
+            assigned_to=request.user
         ).select_related('ticket', 'assigned_by')
         
         # Group by date
@@ -200,12 +243,7 @@ def get_calendar_assignments(request):
         # Admin/Superagent sees ALL calendar assignments (for overview)
         all_assignments_by_date = {}
         if request.user.profile.role in ['admin', 'superagent']:
-            all_assignments = TicketCalendarAssignment.objects.filter(
-                assigned_date__year=year,
-                assigned_date__month=month
-            ).exclude(
-                ticket__status__in=['resolved', 'closed']
-            ).select_related('ticket', 'assigned_to', 'assigned_by')
+            all_assignments = _open_assignments(year, month).select_related('ticket', 'assigned_to', 'assigned_by')
             
             for assignment in all_assignments:
                 date_str = assignment.assigned_date.strftime('%Y-%m-%d')
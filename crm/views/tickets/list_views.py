@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from django.http import HttpResponse, HttpResponseForbidden
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.conf import settings
 from datetime import datetime, timedelta
 import logging
 import json
@@ -11,6 +12,9 @@ import json
 logger = logging.getLogger(__name__)
 
 from ...models import Organization, Ticket
+from ...services.search import filter_tickets
+from ...services.device import get_device
+from .pagination import cursor_paginate, supports_cursor
 
 @login_required
 def ticket_list(request):
@@ -83,10 +87,6 @@ def ticket_list(request):
         tickets = tickets.exclude(status='closed')
         logger.debug("Excluding closed tickets by default (no explicit status filters)")
     
-    # Debug: Count results before filtering
-    initial_count = tickets.count()
-    logger.debug(f"Initial ticket count before filters: {initial_count}")
-    
     # Zastosowanie filtrów (multi)
     if status_filters:
         tickets = tickets.filter(status__in=status_filters)
@@ -166,9 +166,9 @@ def ticket_list(request):
     if exclude_created_by == 'me':
         tickets = tickets.exclude(created_by=user)
     
-    # Filtrowanie po tytule zgłoszenia (case-insensitive, partial match)
+    # Filtrowanie po tytule zgłoszenia (pełnotekstowe, bez rozróżniania wielkości liter i polskich znaków)
     if ticket_title:
-        tickets = tickets.filter(title__icontains=ticket_title)
+        tickets = filter_tickets(tickets, ticket_title, title_only=True)
     
     # Filtrowanie po zakresie dat
     if date_from:
@@ -195,12 +195,6 @@ def ticket_list(request):
     except Exception as e:
         logger.debug(f"User {user.username} role {role} - could not get query string: {e}")
     
-    final_count = tickets.count()
-    logger.debug(f"Final ticket count after filters: {final_count}")
-    
-    # Zastosowanie sortowania
-    tickets = tickets.order_by(sort_by)
-    
     # Paginacja
     per_page = request.GET.get('per_page', '20')
     # Handle mobile per_page parameter
@@ -208,8 +202,7 @@ def ticket_list(request):
         per_page = request.GET.get('per_page_mobile', '20')
     
     # Detect mobile devices and limit to 10 per page
-    user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-    is_mobile = any(mobile in user_agent for mobile in ['mobile', 'android', 'iphone', 'ipad', 'tablet'])
+    is_mobile = get_device(request).is_handheld
     
     try:
         per_page = int(per_page)
@@ -221,15 +214,34 @@ def ticket_list(request):
     except (ValueError, TypeError):
         per_page = 10 if is_mobile else 20
     
-    paginator = Paginator(tickets, per_page)
-    page = request.GET.get('page', 1)
-    
-    try:
-        tickets_page = paginator.page(page)
-    except PageNotAnInteger:
-        tickets_page = paginator.page(1)
-    except EmptyPage:
-        tickets_page = paginator.page(paginator.num_pages)
+    # Tryb paginacji: 'cursor' (keyset - każda strona kosztuje tyle co pierwsza) lub 'page' (numery stron)
+    pagination_mode = request.GET.get('pagination') or settings.TICKET_LIST_PAGINATION
+    if pagination_mode != 'page' and not supports_cursor(sort_by):
+        pagination_mode = 'page'
+    
+    if pagination_mode == 'cursor':
+        tickets_page = cursor_paginate(
+            tickets,
+            sort_by,
+            per_page,
+            cursor=request.GET.get('cursor'),
+            with_count=request.GET.get('count', 'true').lower() != 'false'
+        )
+        total_tickets = tickets_page.count
+    else:
+        # Zastosowanie sortowania
+        tickets = tickets.order_by(sort_by)
+        
+        paginator = Paginator(tickets, per_page)
+        page = request.GET.get('page', 1)
+        
+        try:
+            tickets_page = paginator.page(page)
+        except PageNotAnInteger:
+            tickets_page = paginator.page(1)
+        except EmptyPage:
+            tickets_page = paginator.page(paginator.num_pages)
+        total_tickets = paginator.count
     
     # Przygotuj parametry URL dla zachowania filtrów w paginacji (pozwala na duplikaty)
     url_params = []  # lista par (key, value)
@@ -261,6 +273,10 @@ def ticket_list(request):
         url_params.append(('organization', v))
     if per_page != 20:
         url_params.append(('per_page', str(per_page)))
+    if request.GET.get('pagination'):
+        url_params.append(('pagination', pagination_mode))
+    if request.GET.get('count', '').lower() == 'false':
+        url_params.append(('count', 'false'))
     
     # Lista dostępnych opcji sortowania dla wyboru w interfejsie
     sort_options = [
@@ -314,7 +330,8 @@ def ticket_list(request):
         'all_organizations': all_organizations,  # Add all organizations for admin filter
         'per_page': per_page,
         'url_params': url_params,
-        'total_tickets': paginator.count,
+        'total_tickets': total_tickets,
+        'pagination_mode': pagination_mode,
         # pass choices for rendering
         'status_choices': status_choices,
         'priority_choices': priority_choices,
@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination for the ticket list
+
+Pages are selected with WHERE (sort column, id) > (last value, last id) instead of OFFSET,
+so every page costs the same as the first one. Cursors are signed tokens carrying the sort
+order and the boundary row, so they are opaque to the client and cannot be tampered with.
+"""
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+import logging
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Sort options supported in cursor mode (all columns are NOT NULL)
+CURSOR_SORT_FIELDS = {
+    'created_at', 'title', 'priority', 'status', 'category', 'organization__name',
+}
+
+# Counting stops here - beyond this the list shows "more than N"
+COUNT_LIMIT = 1000
+
+_CURSOR_SALT = 'crm.ticket_list.cursor'
+
+
+def supports_cursor(sort_by):
+    """Check if a sort_by value can be paginated with cursors"""
+    return sort_by.lstrip('-') in CURSOR_SORT_FIELDS
+
+
+def _encode(sort_by, value, pk, direction):
+    """Opaque token pointing at a boundary row"""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return signing.dumps([sort_by, value, pk, direction], salt=_CURSOR_SALT, compress=True)
+
+
+def _decode(token, sort_by):
+    """(value, pk, direction) from a token, or None if it is invalid or for another sort"""
+    try:
+        token_sort, value, pk, direction = signing.loads(token, salt=_CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        logger.warning("Invalid ticket list cursor ignored")
+        return None
+
+    if token_sort != sort_by or direction not in ('next', 'prev'):
+        return None
+    if sort_by.lstrip('-') == 'created_at':
+        value = parse_datetime(value)
+    return value, pk, direction
+
+
+class CursorPage:
+    """One page of rows with tokens for the neighbouring pages"""
+
+    def __init__(self, rows, next_cursor, previous_cursor, count, count_is_exact):
+        self.object_list = rows
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.count_is_exact = count_is_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def cursor_paginate(queryset, sort_by, per_page, cursor=None, with_count=True):
+    """
+    Return one page of queryset ordered by (sort_by, id)
+
+    Args:
+        queryset: Filtered, unordered queryset
+        sort_by: One of the supported sort options (with optional '-')
+        per_page: Rows per page
+        cursor: Token from a previous page (None for the first page)
+        with_count: Count matching rows up to COUNT_LIMIT
+
+    Returns:
+        CursorPage
+    """
+    field = sort_by.lstrip('-')
+    descending = sort_by.startswith('-')
+    id_order = '-id' if descending else 'id'
+
+    position = _decode(cursor, sort_by) if cursor else None
+    backwards = position is not None and position[2] == 'prev'
+
+    rows = queryset
+    if position is not None:
+        value, pk = position[0], position[1]
+        # Rows after the boundary in the direction of travel
+        after = (descending != backwards)
+        lookup = 'lt' if after else 'gt'
+        rows = rows.filter(
+            Q(**{f'{field}__{lookup}': value}) |
+            Q(**{field: value, f'id__{lookup}': pk})
+        )
+
+    if backwards:
+        rows = rows.order_by(*[
+            order[1:] if order.startswith('-') else f'-{order}' for order in (sort_by, id_order)
+        ])
+    else:
+        rows = rows.order_by(sort_by, id_order)
+
+    # One extra row tells if there is another page in the direction of travel
+    rows = list(rows[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        if has_more or backwards:
+            next_cursor = _encode(sort_by, _sort_value(last, field), last.pk, 'next')
+        if position is not None and (has_more or not backwards):
+            previous_cursor = _encode(sort_by, _sort_value(first, field), first.pk, 'prev')
+
+    count, count_is_exact = None, True
+    if with_count:
+        count = queryset.order_by()[:COUNT_LIMIT + 1].count()
+        count_is_exact = count <= COUNT_LIMIT
+        count = min(count, COUNT_LIMIT)
+
+    return CursorPage(rows, next_cursor, previous_cursor, count, count_is_exact)
+
+
+def _sort_value(row, field):
+    """Value of the sort column for a row (follows relations like organization__name)"""
+    value = row
+    for part in field.split('__'):
+        value = getattr(value, part)
+    return value
@@ -1,5 +1,9 @@
 """
 ASGI config for projekt_wdrozeniowy project.
+
+Serving through ASGI (e.g. `uvicorn projekt_wdrozeniowy.asgi:application`) enables the
+live ticket event stream (/tickets/events/). Under WSGI the stream answers 503 and ticket
+boards keep polling.
 """
 
 import os
@@ -63,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django_otp.middleware.OTPMiddleware',  # Add OTP middleware after auth
     'django.contrib.messages.middleware.MessageMiddleware',  # Moved up - must be before our custom middleware
+    'crm.middleware.DeviceDetectionMiddleware',  # Lazy request.device for views and templates
     'crm.middleware.ViewerRestrictMiddleware',
     'crm.middleware.EmailVerificationMiddleware',
     'crm.middleware.TwoFactorMiddleware',  # Add the new 2FA middleware
@@ -142,6 +143,22 @@ if 'mysql' in DATABASES['default']['ENGINE']:
         'write_timeout': 30,
     }
 
+# Cache shared by all worker processes (Passenger runs several). Access snapshots, trusted
+# device checks and notification recipients are invalidated through it, so a per-process
+# LocMemCache would leave the other workers with stale answers. The database cache needs
+# `python manage.py createcachetable`; Redis/Memcached can be set with CACHE_BACKEND/CACHE_LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CACHE_LOCATION', default='crm_cache'),
+        'OPTIONS': {
+            # Enough room for per-user entries; culling drops a third of the entries at once
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=100000, cast=int),
+            'CULL_FREQUENCY': 3,
+        },
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -226,6 +243,36 @@ EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)  # 10 seconds time
 # Test email settings
 TEST_EMAIL_RECIPIENT = config('TEST_EMAIL_RECIPIENT', default='')
 
+# Background report jobs (statistics reports generated outside the request)
+REPORT_JOBS_ROOT = config('REPORT_JOBS_ROOT', default=os.path.join(BASE_DIR, 'report_jobs'))  # Not under MEDIA_ROOT - files are served only through the download view
+REPORT_JOBS_WORKERS = config('REPORT_JOBS_WORKERS', default=2, cast=int)  # Worker threads per process
+REPORT_JOBS_TTL = config('REPORT_JOBS_TTL', default=3600, cast=int)  # 1 hour - identical requests reuse the finished report
+
+# Category suggestions (model trained by train_category_model; keyword heuristic when missing)
+CATEGORY_MODEL_PATH = config('CATEGORY_MODEL_PATH', default=os.path.join(BASE_DIR, 'category_model.json.gz'))
+
+# Email outbox (ticket notifications are queued in the database and sent by process_email_outbox)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int)  # Messages claimed by a worker at a time
+EMAIL_OUTBOX_DOMAIN_RATE = config('EMAIL_OUTBOX_DOMAIN_RATE', default=20, cast=int)  # Messages per minute per recipient domain
+EMAIL_OUTBOX_DOMAIN_RATES = {}  # Per-domain overrides, e.g. {'gmail.com': 10}
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_OUTBOX_RETRY_DELAY = config('EMAIL_OUTBOX_RETRY_DELAY', default=60, cast=int)  # Seconds before the first retry, doubled after each failure
+EMAIL_OUTBOX_RETENTION_DAYS = config('EMAIL_OUTBOX_RETENTION_DAYS', default=7, cast=int)  # Sent messages are kept this long
+
+# Ticket notification grouping: events on the same ticket within the window are sent as one email
+TICKET_NOTIFICATION_WINDOW = config('TICKET_NOTIFICATION_WINDOW', default=2, cast=int)  # Minutes (0 - send right away); users can override it
+TICKET_DIGEST_HOUR = config('TICKET_DIGEST_HOUR', default=7, cast=int)  # Local hour of the opt-in daily digest
+
+# Ticket list pagination: 'cursor' (keyset, constant cost per page) or 'page' (numbered pages with a full COUNT)
+TICKET_LIST_PAGINATION = config('TICKET_LIST_PAGINATION', default='cursor')
+
+# Ticket full-text search: 'auto' (FTS5 on SQLite, FULLTEXT on MySQL), 'sqlite', 'mysql' or 'none' (plain icontains)
+TICKET_SEARCH_BACKEND = config('TICKET_SEARCH_BACKEND', default='auto')
+
+# Live ticket events (Server-Sent Events) - served only when running under ASGI, otherwise boards keep polling
+TICKET_EVENTS_ENABLED = config('TICKET_EVENTS_ENABLED', default=True, cast=bool)
+TICKET_EVENTS_MAX_SUBSCRIBERS = config('TICKET_EVENTS_MAX_SUBSCRIBERS', default=500, cast=int)  # open streams per process
+
 # Security settings for production
 if not DEBUG:
     # HTTPS settings